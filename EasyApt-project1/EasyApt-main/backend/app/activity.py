@@ -0,0 +1,142 @@
+"""
+Session activity tracking for EasyApt
+Keeps last-active timestamps in memory and writes them to the user table in
+batches, so authenticated requests stay read-only instead of each one doing
+an UPDATE + COMMIT on the user row.
+"""
+
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import bindparam, update
+
+from .config import settings
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+# Sessions idle longer than this are rejected (enforced in auth)
+INACTIVITY_TIMEOUT_SECONDS = 300
+
+
+class ActivityTracker:
+    """
+    In-process map of user id -> last request time.
+
+    The inactivity timeout is enforced from this map. When a user has no
+    entry yet (fresh worker, restart) the caller passes the database value
+    as a fallback. Dirty entries are flushed every flush_interval_seconds,
+    so the stored last_active lags by at most one interval. Flushed entries
+    older than retain_seconds are dropped; the database value they were
+    written to gives the same answer, so the map only holds recent users.
+    """
+
+    def __init__(self, flush_interval_seconds: int = 30, retain_seconds: int = INACTIVITY_TIMEOUT_SECONDS):
+        self.flush_interval_seconds = flush_interval_seconds
+        self.retain_seconds = retain_seconds
+        self._last_active: Dict[int, datetime] = {}
+        self._dirty: Dict[int, datetime] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def touch(self, user_id: int, when: Optional[datetime] = None) -> datetime:
+        when = when or datetime.utcnow()
+        with self._lock:
+            self._last_active[user_id] = when
+            self._dirty[user_id] = when
+        return when
+
+    def last_active(self, user_id: int, fallback: Optional[datetime] = None) -> Optional[datetime]:
+        with self._lock:
+            seen = self._last_active.get(user_id)
+        if seen is None or (fallback is not None and fallback > seen):
+            return fallback
+        return seen
+
+    def inactive_seconds(self, user_id: int, fallback: Optional[datetime] = None) -> Optional[float]:
+        seen = self.last_active(user_id, fallback)
+        if seen is None:
+            return None
+        return (datetime.utcnow() - seen).total_seconds()
+
+    def forget(self, user_id: int) -> None:
+        with self._lock:
+            self._last_active.pop(user_id, None)
+            self._dirty.pop(user_id, None)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._last_active.clear()
+            self._dirty.clear()
+
+    def tracked(self) -> int:
+        with self._lock:
+            return len(self._last_active)
+
+    def _prune(self) -> None:
+        cutoff = datetime.utcnow() - timedelta(seconds=self.retain_seconds)
+        with self._lock:
+            stale = [
+                user_id for user_id, seen in self._last_active.items()
+                if seen < cutoff and user_id not in self._dirty
+            ]
+            for user_id in stale:
+                del self._last_active[user_id]
+
+    async def flush(self, db_engine=None) -> int:
+        """
+        Write pending timestamps to the user table in one batched UPDATE,
+        then drop flushed entries older than retain_seconds.
+        """
+        with self._lock:
+            pending, self._dirty = self._dirty, {}
+        if not pending:
+            self._prune()
+            return 0
+
+        if db_engine is None:
+            from .database import async_engine as db_engine
+
+        stmt = (
+            update(User.__table__)
+            .where(User.__table__.c.id == bindparam("user_id"))
+            .values(last_active=bindparam("seen_at"))
+        )
+        rows = [{"user_id": user_id, "seen_at": seen_at} for user_id, seen_at in pending.items()]
+        try:
+            async with db_engine.begin() as conn:
+                await conn.execute(stmt, rows)
+        except Exception as e:
+            logger.error(f"Failed to flush activity for {len(rows)} users: {e}")
+            with self._lock:
+                for user_id, seen_at in pending.items():
+                    self._dirty.setdefault(user_id, seen_at)
+            return 0
+        self._prune()
+        return len(rows)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+# Singleton instance
+activity_tracker = ActivityTracker(settings.ACTIVITY_FLUSH_INTERVAL_SECONDS)
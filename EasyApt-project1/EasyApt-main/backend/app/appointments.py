@@ -1,13 +1,39 @@
-from datetime import datetime, timezone
-from typing import List, Optional
-
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlmodel import SQLModel, Session, select
-
-from .database import get_session
-from .models import Provider, Appointment, User, PatientProfile, ProviderAppointment
-from .auth import get_current_user
-from .notification_service import notification_service
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import SQLModel, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .database import get_async_session
+from .models import Provider, Appointment, User, PatientProfile, PendingPaymentIntent, ProviderAppointment, Transaction
+from .auth import get_current_principal
+from .principal import Principal
+from .availability import availability_index
+from .pagination import Page, PageParams, page_of, paginate
+from . import provider_search
+from .provider_search import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT
+from .response_cache import cached_json, response_cache
+from .booking import AppointmentNotBooked, SlotConflict, has_overlap, lock_slots, release_slots, commit_booking
+from .payments import clear_pending_intents
+from .notification_outbox import (
+    batch_progress,
+    notification_dispatcher,
+    stage_booking_confirmation,
+    stage_cancellation,
+    stage_reschedule,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_AVAILABILITY_WINDOW = timedelta(days=31)
+# Browser revalidation interval for provider list/search responses
+PROVIDER_CACHE_MAX_AGE = 30
+SLOT_TAKEN_DETAIL = "This time slot is already booked for this provider."
+NOT_BOOKED_DETAIL = "Only booked appointments can be changed."
 
 router = APIRouter()
 
@@ -47,13 +73,47 @@ class AppointmentReschedule(SQLModel):
     end_time: datetime
 
 
+class BulkAppointmentChange(SQLModel):
+    action: Literal["cancel", "reschedule"]
+    start: datetime
+    end: datetime
+    # reschedule only: every appointment in the range moves by this much
+    shift_minutes: Optional[int] = None
+
+
+class BulkAppointmentOutcome(SQLModel):
+    appointment_id: int
+    status: str  # cancelled, rescheduled, conflict, not_booked
+    start_time: datetime
+    end_time: datetime
+    detail: Optional[str] = None
+
+
+class BulkAppointmentResult(SQLModel):
+    batch_id: str
+    action: str
+    total: int
+    succeeded: int
+    failed: int
+    notifications_queued: int
+    outcomes: List[BulkAppointmentOutcome]
+
+
+class AvailabilityRead(SQLModel):
+    provider_id: int
+    start: datetime
+    end: datetime
+    duration_minutes: int
+    slots: List[datetime]
+
+
 # ---------- PROVIDER ENDPOINTS ----------
 
 @router.post("/providers", response_model=ProviderRead)
-def create_provider(
+async def create_provider(
     provider_in: ProviderCreate,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_principal),
 ):
     """
     Create a provider (for now, allow any logged-in user).
@@ -65,57 +125,110 @@ def create_provider(
         location=provider_in.location,
     )
     session.add(provider)
-    session.commit()
-    session.refresh(provider)
+    await session.commit()
+    await session.refresh(provider)
+    response_cache.invalidate("providers")
     return provider
 
 
-@router.get("/providers", response_model=List[ProviderRead])
-def list_providers(
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+@router.get("/providers", response_model=Page[ProviderRead])
+async def list_providers(
+    request: Request,
+    page: PageParams = Depends(),
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_principal),
 ):
     """
-    List all providers (basic search for now).
+    List providers, oldest first, one page at a time.
+    Served from the response cache until a provider is created.
     """
-    providers = session.exec(select(Provider)).all()
-    return providers
+    async def build():
+        stmt = paginate(select(Provider), Provider.created_at, Provider.id, page)
+        providers, next_cursor = page_of(
+            (await session.exec(stmt)).all(), page, lambda p: (p.created_at, p.id)
+        )
+        return Page[ProviderRead](items=providers, next_cursor=next_cursor)
+
+    return await cached_json(
+        request, "providers", f"list:{page.limit}:{page.after}", build,
+        max_age=PROVIDER_CACHE_MAX_AGE, private=True,
+    )
 
 @router.get("/providers/search", response_model=List[Provider])
-def search_providers(
-    q: str = Query("", description="Search by provider name"),
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+async def search_providers(
+    request: Request,
+    q: str = Query("", description="Words or word prefixes of name, specialty or location"),
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_principal),
 ):
     """
-    Search providers by partial name match.
-    Used by the booking UI when the patient types a name.
+    Ranked provider search, served by the full-text / trigram index.
+    Used by the booking UI as the patient types.
     """
-    stmt = select(Provider)
-    if q:
-        stmt = stmt.where(Provider.name.ilike(f"%{q}%"))
-    stmt = stmt.order_by(Provider.name)
-    return session.exec(stmt).all()
+    key = f"search:{' '.join(provider_search.tokenize(q))}:{limit}"
+    return await cached_json(
+        request, "providers", key,
+        lambda: provider_search.search_providers(session, q, limit),
+        max_age=PROVIDER_CACHE_MAX_AGE, private=True,
+    )
 
 # ---------- APPOINTMENT ENDPOINTS ----------
 
+def _patient_name(full_name: Optional[str], email: str) -> str:
+    return full_name if full_name else email.split('@')[0]
+
+
+async def _load_appointment(session: AsyncSession, appointment_id: int):
+    """
+    The appointment with its provider's name and the patient's profile
+    name in one joined query: (appt, provider_name, patient_full_name),
+    or None.
+    """
+    stmt = (
+        select(Appointment, Provider.name, PatientProfile.full_name)
+        .outerjoin(Provider, Provider.id == Appointment.provider_id)
+        .outerjoin(PatientProfile, PatientProfile.user_id == Appointment.patient_id)
+        .where(Appointment.id == appointment_id)
+    )
+    return (await session.exec(stmt)).first()
+
+
 @router.post("/appointments/book", response_model=Appointment)
 async def book_appointment(
     booking: AppointmentBook,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_principal),
 ):
     """
     Book an appointment for the current patient with a provider.
     Checks for overlapping appointments for that provider.
     """
-    # Make sure provider exists
-    provider = session.get(Provider, booking.provider_id)
-    if provider is None:
+    # Provider plus the patient's name and phone for the confirmation, and
+    # whether a checkout is pending for this slot, in one round trip, read
+    # before the booking transaction so the outbox rows and ledger entry can
+    # be staged inside it
+    pending_checkouts = (
+        select(func.count())
+        .where(
+            PendingPaymentIntent.patient_id == current_user.id,
+            PendingPaymentIntent.provider_id == booking.provider_id,
+            PendingPaymentIntent.start_time == booking.start_time.isoformat(),
+        )
+        .scalar_subquery()
+    )
+    prefetch = (
+        select(Provider, PatientProfile.full_name, PatientProfile.phone, pending_checkouts)
+        .outerjoin(PatientProfile, PatientProfile.user_id == current_user.id)
+        .where(Provider.id == booking.provider_id)
+    )
+    row = (await session.exec(prefetch)).first()
+    if row is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Provider not found.",
         )
+    provider, full_name, phone, has_pending_checkout = row
 
     if booking.start_time >= booking.end_time:
         raise HTTPException(
@@ -123,21 +236,35 @@ async def book_appointment(
             detail="start_time must be before end_time.",
         )
 
-    # Check for overlapping appointments with this provider
-    print(f" Booking check: Provider {booking.provider_id}, Start: {booking.start_time}, End: {booking.end_time}")
-    overlap_stmt = select(Appointment).where(
-        Appointment.provider_id == booking.provider_id,
-        Appointment.status == "booked",
-        Appointment.start_time < booking.end_time,
-        Appointment.end_time > booking.start_time,
+    # Fast-path overlap check (index probe); the database constraint below
+    # is what actually closes the race between concurrent bookings.
+    logger.debug(
+        "Booking check",
+        extra={"provider_id": booking.provider_id, "start_time": booking.start_time, "end_time": booking.end_time},
     )
-    existing = session.exec(overlap_stmt).first()
-    if existing:
+    if await has_overlap(session, booking.provider_id, booking.start_time, booking.end_time):
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="This time slot is already booked for this provider.",
+            status_code=status.HTTP_409_CONFLICT,
+            detail=SLOT_TAKEN_DETAIL,
         )
 
+    patient_name = _patient_name(full_name, current_user.email)
+    patient_phone = phone or ""
+
+    def stage(booked: Appointment) -> None:
+        stage_booking_confirmation(
+            session, booked, current_user.email, patient_phone, patient_name, provider.name
+        )
+        # Ledger entry commits (or rolls back) together with the booking
+        session.add(Transaction(
+            user_id=current_user.id,
+            appointment_id=booked.id,
+            amount=provider.consultation_fee,
+            description=f"Appointment booking with {provider.name}",
+            transaction_type="booking",
+            status="completed"
+        ))
+
     appt = Appointment(
         patient_id=current_user.id,
         provider_id=booking.provider_id,
@@ -146,58 +273,30 @@ async def book_appointment(
         status="booked",
         reason=booking.reason,
     )
-    session.add(appt)
-    session.commit()
-    session.refresh(appt)
-    try:
-        from .models import Transaction
-        
-        transaction = Transaction(
-            user_id=current_user.id,
-            appointment_id=appt.id,
-            amount=provider.consultation_fee,
-            description=f"Appointment booking with {provider.name}",
-            transaction_type="booking",
-            status="completed"
-        )
-        session.add(transaction)
-        session.commit()
-        print(f" Transaction created for appointment {appt.id}")
-    except Exception as e:
-        print(f"⚠️ailed to create transaction: {e}")
+    if has_pending_checkout:
+        # The paid intent must not be handed out again for this slot
+        await clear_pending_intents(session, current_user.id, booking.provider_id, booking.start_time)
     try:
-        from .models import PatientProfile
-    
-        # Get patient profile for name and phone
-        profile_stmt = select(PatientProfile).where(PatientProfile.user_id == current_user.id)
-        profile = session.exec(profile_stmt).first()
-    
-        patient_name = profile.full_name if (profile and profile.full_name) else current_user.email.split('@')[0]
-        patient_phone = profile.phone if (profile and profile.phone) else ""
-    
-        # Send notification
-        await notification_service.send_booking_confirmation(
-            patient_phone=patient_phone,
-            patient_email=current_user.email,
-            patient_name=patient_name,
-            appointment_date=appt.start_time,
-            provider_name=provider.name
+        await commit_booking(session, appt, stage=stage)
+    except SlotConflict:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=SLOT_TAKEN_DETAIL,
         )
-        print(f" Notification sent to {current_user.email}")
-    except Exception as e:
-        # Log error but don't fail the booking
-        print(f"⚠️Failed to send notification: {e}")
+    availability_index.record_booking(appt)
+    notification_dispatcher.wake()
 
     return appt
 
-@router.get("/providers/{provider_id}/appointments", response_model=List[Appointment])
-def list_provider_appointments(
+@router.get("/providers/{provider_id}/appointments", response_model=Page[Appointment])
+async def list_provider_appointments(
     provider_id: int,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    page: PageParams = Depends(),
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_principal),
 ):
     """
-    Provider dashboard: list all upcoming appointments for a given provider.
+    Provider dashboard: list upcoming appointments for a given provider.
     Used by the booking UI to show which slots are already taken.
     """
     now = datetime.utcnow()
@@ -205,43 +304,91 @@ def list_provider_appointments(
         select(Appointment)
         .where(Appointment.provider_id == provider_id)
         .where(Appointment.start_time >= now)
-        .order_by(Appointment.start_time)
     )
-    appts = session.exec(stmt).all()
-    return appts
+    stmt = paginate(stmt, Appointment.start_time, Appointment.id, page)
+    appts, next_cursor = page_of(
+        (await session.exec(stmt)).all(), page, lambda a: (a.start_time, a.id)
+    )
+    return Page(items=appts, next_cursor=next_cursor)
 
 
+@router.get("/providers/{provider_id}/availability", response_model=AvailabilityRead)
+async def get_provider_availability(
+    provider_id: int,
+    start: datetime = Query(..., alias="from", description="Start of the window"),
+    end: datetime = Query(..., alias="to", description="End of the window"),
+    duration: int = Query(30, ge=5, le=480, description="Slot length in minutes"),
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_principal),
+):
+    """
+    Open slots for a provider between `from` and `to`.
+    Served from the in-memory availability index instead of a table scan.
+    """
+    provider = await session.get(Provider, provider_id)
+    if provider is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Provider not found.",
+        )
 
-@router.get("/appointments/my", response_model=List[Appointment])
-def list_my_appointments(
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="from must be before to.",
+        )
+
+    if end - start > MAX_AVAILABILITY_WINDOW:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Availability window cannot exceed 31 days.",
+        )
+
+    slots = await availability_index.free_slots(session, provider_id, start, end, duration)
+    return AvailabilityRead(
+        provider_id=provider_id,
+        start=start,
+        end=end,
+        duration_minutes=duration,
+        slots=slots,
+    )
+
+
+@router.get("/appointments/my", response_model=Page[Appointment])
+async def list_my_appointments(
+    page: PageParams = Depends(),
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_principal),
 ):
     """
-    List all appointments for the current logged-in patient.
+    List the current patient's appointments, latest first, one page at a time.
     """
     stmt = select(Appointment).where(Appointment.patient_id == current_user.id)
-    appts = session.exec(stmt).all()
-    return appts
+    stmt = paginate(stmt, Appointment.start_time, Appointment.id, page, descending=True)
+    appts, next_cursor = page_of(
+        (await session.exec(stmt)).all(), page, lambda a: (a.start_time, a.id)
+    )
+    return Page(items=appts, next_cursor=next_cursor)
 
 
 @router.put("/appointments/{appointment_id}/reschedule", response_model=Appointment)
 async def reschedule_appointment(
     appointment_id: int,
     body: AppointmentReschedule,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_principal),
 ):
     """
     Reschedule an existing appointment.
     Only the patient who owns it can reschedule.
     """
-    appt = session.get(Appointment, appointment_id)
-    if appt is None:
+    row = await _load_appointment(session, appointment_id)
+    if row is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Appointment not found.",
         )
+    appt, provider_name, full_name = row
 
     if appt.patient_id != current_user.id:
         raise HTTPException(
@@ -249,6 +396,12 @@ async def reschedule_appointment(
             detail="You can only reschedule your own appointments.",
         )
 
+    if appt.status != "booked":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=NOT_BOOKED_DETAIL,
+        )
+
     start = body.start_time
     end = body.end_time
 
@@ -260,50 +413,41 @@ async def reschedule_appointment(
     if start >= end:
         raise HTTPException(status_code=400, detail="start_time must be before end_time")
 
-    # Check for overlapping appointment with this provider
-    overlap_stmt = select(Appointment).where(
-        Appointment.provider_id == appt.provider_id,
-        Appointment.status == "booked",
-        Appointment.id != appt.id,
-        Appointment.start_time < end,
-        Appointment.end_time > start,
-    )
-    existing = session.exec(overlap_stmt).first()
-    if existing:
+    if await has_overlap(session, appt.provider_id, start, end, exclude_id=appt.id):
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="This time slot is already booked for this provider.",
+            status_code=status.HTTP_409_CONFLICT,
+            detail=SLOT_TAKEN_DETAIL,
         )
 
+    patient_name = _patient_name(full_name, current_user.email)
+
     old_start_time = appt.start_time
+    await release_slots(session, appt)
     appt.start_time = start
     appt.end_time = end
-    session.commit()
-    session.refresh(appt)
-
-    # Send reschedule email
+    # The reminder sweeper picks the appointment up again for its new time
+    appt.reminder_sent_at = None
     try:
-        from .models import PatientProfile
-    
-        # Get patient profile
-        profile_stmt = select(PatientProfile).where(PatientProfile.user_id == current_user.id)
-        profile = session.exec(profile_stmt).first()
-    
-        patient_name = profile.full_name if (profile and profile.full_name) else current_user.email.split('@')[0]
-    
-        # Get provider
-        provider = session.get(Provider, appt.provider_id)
-    
-        await notification_service.send_reschedule_email(
-            patient_email=current_user.email,
-            patient_name=patient_name,
-            old_date=old_start_time,
-            new_date=appt.start_time,
-            provider_name=provider.name if provider else "Your provider"
+        await commit_booking(
+            session,
+            appt,
+            stage=lambda moved: stage_reschedule(
+                session, moved, current_user.email, patient_name, old_start_time,
+                provider_name or "Your provider",
+            ),
+        )
+    except SlotConflict:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=SLOT_TAKEN_DETAIL,
+        )
+    except AppointmentNotBooked:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=NOT_BOOKED_DETAIL,
         )
-        print(f" Reschedule email sent to {current_user.email}")
-    except Exception as e:
-        print(f"⚠️Failed to send reschedule email: {e}")
+    availability_index.record_booking(appt)
+    notification_dispatcher.wake()
 
     return appt
 
@@ -311,18 +455,19 @@ async def reschedule_appointment(
 @router.delete("/appointments/{appointment_id}")
 async def cancel_appointment(
     appointment_id: int,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_principal),
 ):
     """
     Cancel an appointment (soft cancel by setting status).
     """
-    appt = session.get(Appointment, appointment_id)
-    if appt is None:
+    row = await _load_appointment(session, appointment_id)
+    if row is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Appointment not found.",
         )
+    appt, provider_name, full_name = row
 
     if appt.patient_id != current_user.id:
         raise HTTPException(
@@ -330,36 +475,189 @@ async def cancel_appointment(
             detail="You can only cancel your own appointments.",
         )
 
+    patient_name = _patient_name(full_name, current_user.email)
+
     appt.status = "cancelled"
-    session.commit()
-    try:
-        from .models import PatientProfile
-    
-        # Get patient profile
-        profile_stmt = select(PatientProfile).where(PatientProfile.user_id == current_user.id)
-        profile = session.exec(profile_stmt).first()
-    
-        patient_name = profile.full_name if (profile and profile.full_name) else current_user.email.split('@')[0]
-    
-        # Get provider
-        provider = session.get(Provider, appt.provider_id)
-    
-        await notification_service.send_cancellation_email(
-            patient_email=current_user.email,
-            patient_name=patient_name,
-            appointment_date=appt.start_time,
-            provider_name=provider.name if provider else "Your provider"
-        )
-        print(f" Cancellation email sent to {current_user.email}")
-    except Exception as e:
-        print(f"⚠️Failed to send cancellation email: {e}")
+    await release_slots(session, appt)
+    stage_cancellation(
+        session, appt, current_user.email, patient_name,
+        provider_name or "Your provider",
+    )
+    await session.commit()
+    availability_index.release(appt)
+    notification_dispatcher.wake()
 
     return {"message": "Appointment cancelled"}
 
-@router.get("/provider-dashboard-list", response_model=list[ProviderAppointment])
-def get_provider_dashboard(
-    current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
+@router.post("/providers/{provider_id}/appointments/bulk", response_model=BulkAppointmentResult)
+async def bulk_change_appointments(
+    provider_id: int,
+    body: BulkAppointmentChange,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_principal),
+):
+    """
+    Cancel or shift every booked appointment of a provider in [start, end),
+    e.g. when the provider is out sick. All changes and their patient
+    notifications are committed in one transaction; delivery happens in the
+    outbox workers and can be followed via /appointments/bulk/{batch_id}.
+    """
+    provider = await session.get(Provider, provider_id)
+    if provider is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Provider not found.",
+        )
+
+    if current_user.role not in ("staff", "admin") and provider.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only staff or the provider can change these appointments.",
+        )
+
+    start = body.start
+    end = body.end
+    if start.tzinfo is not None:
+        start = start.astimezone(timezone.utc).replace(tzinfo=None)
+    if end.tzinfo is not None:
+        end = end.astimezone(timezone.utc).replace(tzinfo=None)
+
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end.")
+    if end - start > MAX_AVAILABILITY_WINDOW:
+        raise HTTPException(status_code=400, detail="Bulk changes cannot span more than 31 days.")
+    if body.action == "reschedule" and not body.shift_minutes:
+        raise HTTPException(status_code=400, detail="shift_minutes is required to reschedule.")
+
+    # Appointments and their patients' contact details in one query
+    stmt = (
+        select(Appointment, User.email, PatientProfile.full_name)
+        .join(User, User.id == Appointment.patient_id)
+        .outerjoin(PatientProfile, PatientProfile.user_id == Appointment.patient_id)
+        .where(
+            Appointment.provider_id == provider_id,
+            Appointment.status == "booked",
+            Appointment.start_time >= start,
+            Appointment.start_time < end,
+        )
+        .order_by(Appointment.start_time)
+        # Reload rows already in the session so a stale status is not trusted
+        .execution_options(populate_existing=True)
+    )
+    rows = (await session.exec(stmt)).all()
+
+    batch_id = uuid.uuid4().hex
+    shift = timedelta(minutes=body.shift_minutes or 0)
+    # Move the appointment furthest in the shift direction first, so each
+    # one lands in time its batch neighbours have already vacated
+    if shift > timedelta(0):
+        rows = list(reversed(rows))
+
+    outcomes: List[BulkAppointmentOutcome] = []
+    changed: List[Appointment] = []
+    for appt, email, full_name in rows:
+        patient_name = full_name or email.split('@')[0]
+
+        if body.action == "cancel":
+            appt.status = "cancelled"
+            await release_slots(session, appt)
+            stage_cancellation(session, appt, email, patient_name, provider.name, batch_id)
+            changed.append(appt)
+            outcomes.append(BulkAppointmentOutcome(
+                appointment_id=appt.id, status="cancelled",
+                start_time=appt.start_time, end_time=appt.end_time,
+            ))
+            continue
+
+        old_start, old_end = appt.start_time, appt.end_time
+        new_start, new_end = old_start + shift, old_end + shift
+        if await has_overlap(session, provider_id, new_start, new_end, exclude_id=appt.id):
+            outcomes.append(BulkAppointmentOutcome(
+                appointment_id=appt.id, status="conflict",
+                start_time=old_start, end_time=old_end, detail=SLOT_TAKEN_DETAIL,
+            ))
+            continue
+
+        try:
+            # Savepoint per appointment: one conflict does not undo the batch
+            async with session.begin_nested():
+                # Re-read the status: a concurrent cancel must not be relocked
+                await session.refresh(appt, ["status"])
+                await release_slots(session, appt)
+                appt.start_time = new_start
+                appt.end_time = new_end
+                appt.reminder_sent_at = None
+                session.add(appt)
+                await session.flush()
+                await lock_slots(session, appt)
+        except (IntegrityError, SlotConflict):
+            await session.refresh(appt)
+            outcomes.append(BulkAppointmentOutcome(
+                appointment_id=appt.id, status="conflict",
+                start_time=appt.start_time, end_time=appt.end_time, detail=SLOT_TAKEN_DETAIL,
+            ))
+            continue
+        except AppointmentNotBooked:
+            await session.refresh(appt)
+            outcomes.append(BulkAppointmentOutcome(
+                appointment_id=appt.id, status="not_booked",
+                start_time=appt.start_time, end_time=appt.end_time, detail=NOT_BOOKED_DETAIL,
+            ))
+            continue
+
+        stage_reschedule(session, appt, email, patient_name, old_start, provider.name, batch_id)
+        changed.append(appt)
+        outcomes.append(BulkAppointmentOutcome(
+            appointment_id=appt.id, status="rescheduled",
+            start_time=new_start, end_time=new_end,
+        ))
+
+    await session.commit()
+    availability_index.invalidate(provider_id)
+    if changed:
+        notification_dispatcher.wake()
+
+    outcomes.sort(key=lambda o: o.appointment_id)
+    return BulkAppointmentResult(
+        batch_id=batch_id,
+        action=body.action,
+        total=len(outcomes),
+        succeeded=len(changed),
+        failed=len(outcomes) - len(changed),
+        notifications_queued=len(changed),
+        outcomes=outcomes,
+    )
+
+
+@router.get("/appointments/bulk/{batch_id}")
+async def bulk_change_progress(
+    batch_id: str,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_principal),
+):
+    """
+    Notification delivery progress for a bulk change.
+    """
+    if current_user.role not in ("provider", "staff", "admin"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only providers and staff can view bulk changes.",
+        )
+
+    progress = await batch_progress(session, batch_id)
+    if progress["total"] == 0:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Batch not found.",
+        )
+    return progress
+
+
+@router.get("/provider-dashboard-list", response_model=Page[ProviderAppointment])
+async def get_provider_dashboard(
+    page: PageParams = Depends(),
+    current_user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """
     Return all upcoming booked appointments for the current provider,
@@ -373,7 +671,7 @@ def get_provider_dashboard(
 
 # First, get the Provider record linked to this user
     provider_stmt = select(Provider).where(Provider.user_id == current_user.id)
-    provider = session.exec(provider_stmt).first()
+    provider = (await session.exec(provider_stmt)).first()
     
     if not provider:
         raise HTTPException(
@@ -406,9 +704,11 @@ def get_provider_dashboard(
             Appointment.provider_id == provider.id,
             Appointment.status == "booked",
         )
-        .order_by(Appointment.start_time)
     )
-    rows = session.exec(stmt).all()
+    stmt = paginate(stmt, Appointment.start_time, Appointment.id, page)
+    rows, next_cursor = page_of(
+        (await session.exec(stmt)).all(), page, lambda row: (row.start_time, row.id)
+    )
     results: list[ProviderAppointment] = []
     for row in rows:
         (
@@ -433,16 +733,16 @@ def get_provider_dashboard(
                 patient_id=patient_id,
             )
         )
-    return results
+    return Page(items=results, next_cursor=next_cursor)
 
 @router.put("/{appointment_id}/complete")
 async def mark_appointment_complete(
     appointment_id: int,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Mark an appointment as completed"""
-    appointment = session.get(Appointment, appointment_id)
+    appointment = await session.get(Appointment, appointment_id)
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
     
@@ -451,7 +751,9 @@ async def mark_appointment_complete(
     
     appointment.status = "completed"
     session.add(appointment)
-    session.commit()
-    session.refresh(appointment)
+    await release_slots(session, appointment)
+    await session.commit()
+    await session.refresh(appointment)
+    availability_index.release(appointment)
     
     return {"message": "Appointment marked as completed"}
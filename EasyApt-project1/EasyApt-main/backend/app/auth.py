@@ -12,18 +12,20 @@ import qrcode
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Form
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlmodel import SQLModel, Session, select
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from .notification_service import notification_service
+from .notification_outbox import notification_dispatcher, stage_account_created
 import logging
-from argon2 import PasswordHasher
-from argon2.exceptions import VerifyMismatchError, VerificationError, InvalidHash
 
 from .config import settings
-from .database import get_session
+from .database import get_async_session
 from .models import User, PatientProfile
 from .captcha_service import captcha_service
+from .activity import INACTIVITY_TIMEOUT_SECONDS, activity_tracker
+from .principal import Principal, principal_cache
+from .password_pool import password_hash_pool, PasswordHashPoolSaturated
+from . import password_schemes
 
 PASSWORD_POLICY = re.compile(r"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[^A-Za-z0-9]).{12,}$")
 
@@ -37,9 +39,7 @@ logger = logging.getLogger(__name__)
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
-INACTIVITY_TIMEOUT_SECONDS = 300
 
-ph = PasswordHasher()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 # Temporary token used only between password step and 2FA step
@@ -114,18 +114,33 @@ class BackupCodesResponse(SQLModel):
 # --- Helper functions ---
 
 def get_password_hash(password: str) -> str:
-    return ph.hash(password)
+    return password_schemes.hash_password(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return password_schemes.verify_password(plain_password, hashed_password)
+
+
+async def _run_password_hash(fn, *args):
     try:
-        return ph.verify(hashed_password, plain_password)
-    except (VerifyMismatchError, VerificationError, InvalidHash):
-        try:
-            pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
-            return pwd_context.verify(plain_password, hashed_password)
-        except Exception:
-            return False
+        return await password_hash_pool.run(fn, *args)
+    except PasswordHashPoolSaturated:
+        logger.warning("Password hash pool saturated; rejecting request")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many sign-in requests in progress. Please try again shortly.",
+            headers={"Retry-After": "1"},
+        )
+
+
+async def hash_password_async(password: str) -> str:
+    """get_password_hash on the password hash pool (429 when saturated)."""
+    return await _run_password_hash(get_password_hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the password hash pool (429 when saturated)."""
+    return await _run_password_hash(verify_password, plain_password, hashed_password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -162,17 +177,17 @@ def decode_temp_2fa_token(temp_token: str) -> int:
         raise credentials_exception
 
 
-def get_user_by_email(session: Session, email: str) -> Optional[User]:
+async def get_user_by_email(session: AsyncSession, email: str) -> Optional[User]:
     statement = select(User).where(User.email == email)
-    result = session.exec(statement)
+    result = await session.exec(statement)
     return result.first()
 
 
-def authenticate_user(session: Session, email: str, password: str) -> Optional[User]:
-    user = get_user_by_email(session, email)
+async def authenticate_user(session: AsyncSession, email: str, password: str) -> Optional[User]:
+    user = await get_user_by_email(session, email)
     if not user:
         return None
-    if not verify_password(password, user.password_hash):
+    if not await verify_password_async(password, user.password_hash):
         return None
     return user
 
@@ -214,7 +229,7 @@ def save_backup_codes(user: User, codes: list[str]) -> None:
     user.two_factor_backup_codes = json.dumps(codes)
 
 
-def verify_totp_or_backup_code(user: User, code: str, session: Session) -> bool:
+async def verify_totp_or_backup_code(user: User, code: str, session: AsyncSession) -> bool:
     code = code.strip().replace(" ", "")
 
     if user.two_factor_secret:
@@ -227,7 +242,7 @@ def verify_totp_or_backup_code(user: User, code: str, session: Session) -> bool:
         backup_codes.remove(code)
         save_backup_codes(user, backup_codes)
         session.add(user)
-        session.commit()
+        await session.commit()
         return True
 
     return False
@@ -235,10 +250,14 @@ def verify_totp_or_backup_code(user: User, code: str, session: Session) -> bool:
 
 # --- Dependencies ---
 
-def get_current_user(
+async def get_current_principal(
     token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session),
-) -> User:
+    session: AsyncSession = Depends(get_async_session),
+) -> Principal:
+    """
+    Resolve the caller from the bearer token. The user row is only loaded
+    when the principal cache has no fresh entry for this user.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials.",
@@ -254,29 +273,50 @@ def get_current_user(
     except (JWTError, ValueError):
         raise credentials_exception
 
-    user = session.get(User, user_id)
-    if user is None:
-        raise credentials_exception
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        user = await session.get(User, user_id)
+        if user is None:
+            raise credentials_exception
+        principal = Principal.from_user(user)
+        principal_cache.put(principal)
 
-    if user.last_active:
-        inactivity_seconds = (datetime.utcnow() - user.last_active).total_seconds()
+    # Enforced from the in-memory activity map; the stored last_active is
+    # only a fallback for users this worker hasn't seen yet.
+    inactivity_seconds = activity_tracker.inactive_seconds(principal.id, principal.last_active)
+    if inactivity_seconds is not None:
         if inactivity_seconds > INACTIVITY_TIMEOUT_SECONDS:
-            logger.warning(f"Session expired for {user.email} due to inactivity ({inactivity_seconds} seconds)")
+            logger.warning(f"Session expired for {principal.email} due to inactivity ({inactivity_seconds} seconds)")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Session expired due to inactivity. Please log in again.",
             )
 
-    user.last_active = datetime.utcnow()
-    session.commit()
+    activity_tracker.touch(principal.id)
+    return principal
+
+
+async def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_async_session),
+) -> User:
+    """Full user row, for routes that read or modify account settings."""
+    user = await session.get(User, principal.id)
+    if user is None:
+        principal_cache.invalidate(principal.id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 
 # --- Routes ---
 
 @router.post("/register", response_model=UserRead)
-async def register(user_in: UserCreate, session: Session = Depends(get_session)):
-    existing = get_user_by_email(session, user_in.email)
+async def register(user_in: UserCreate, session: AsyncSession = Depends(get_async_session)):
+    existing = await get_user_by_email(session, user_in.email)
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -291,21 +331,14 @@ async def register(user_in: UserCreate, session: Session = Depends(get_session))
 
     user = User(
         email=user_in.email,
-        password_hash=get_password_hash(user_in.password),
+        password_hash=await hash_password_async(user_in.password),
         role=user_in.role or "patient",
     )
     session.add(user)
-    session.commit()
-    session.refresh(user)
-
-    try:
-        from .smtp_mailer import send_account_created_email
-        send_account_created_email(
-            to_email=user.email,
-            name=user.email.split('@')[0]
-        )
-    except Exception as e:
-        print(f"Failed to send welcome email: {e}")
+    stage_account_created(session, user.email, user.email.split('@')[0])
+    await session.commit()
+    await session.refresh(user)
+    notification_dispatcher.wake()
 
     return user
 
@@ -315,7 +348,7 @@ async def login_start(
     request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     recaptcha_token: str = Form(None),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
     remote_ip = request.client.host if request.client else None
 
@@ -340,7 +373,7 @@ async def login_start(
             detail="CAPTCHA verification failed. Please try again."
     )
 
-    user = get_user_by_email(session, form_data.username)
+    user = await get_user_by_email(session, form_data.username)
 
     if not user:
         raise HTTPException(
@@ -356,18 +389,18 @@ async def login_start(
             detail=f"Account locked due to too many failed attempts. Try again in {int(remaining)} minutes.",
         )
 
-    if not verify_password(form_data.password, user.password_hash):
+    if not await verify_password_async(form_data.password, user.password_hash):
         user.failed_login_attempts += 1
 
         if user.failed_login_attempts >= 5:
             user.lockout_until = datetime.utcnow() + timedelta(minutes=15)
-            session.commit()
+            await session.commit()
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Account locked due to too many failed attempts. Locked for 15 minutes.",
             )
 
-        session.commit()
+        await session.commit()
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -375,9 +408,17 @@ async def login_start(
         )
 
     # Password is correct
+    if password_schemes.needs_rehash(user.password_hash):
+        user.password_hash = await hash_password_async(form_data.password)
+        logger.info(f"Upgraded password hash for user {user.id} to {password_schemes.CURRENT_SCHEME}")
+
     user.failed_login_attempts = 0
     user.lockout_until = None
-    session.commit()
+    if not user.two_factor_enabled:
+        # Written through so other workers see the fresh login immediately
+        user.last_active = activity_tracker.touch(user.id)
+    await session.commit()
+    principal_cache.invalidate(user.id)
 
     if user.two_factor_enabled:
         temp_token = create_temp_2fa_token(user)
@@ -386,9 +427,6 @@ async def login_start(
             temp_token=temp_token,
         )
 
-    user.last_active = datetime.utcnow()
-    session.commit()
-
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": str(user.id), "role": user.role},
@@ -405,10 +443,10 @@ async def login_start(
 @router.post("/login/verify-2fa", response_model=Token)
 async def login_verify_2fa(
     payload: Login2FARequest,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
     user_id = decode_temp_2fa_token(payload.temp_token)
-    user = session.get(User, user_id)
+    user = await session.get(User, user_id)
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found.")
@@ -423,17 +461,17 @@ async def login_verify_2fa(
             detail=f"Account locked due to too many failed attempts. Try again in {int(remaining)} minutes.",
         )
 
-    if not verify_totp_or_backup_code(user, payload.code, session):
+    if not await verify_totp_or_backup_code(user, payload.code, session):
         user.failed_login_attempts += 1
         if user.failed_login_attempts >= 5:
             user.lockout_until = datetime.utcnow() + timedelta(minutes=15)
-            session.commit()
+            await session.commit()
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Account locked due to too many failed attempts. Locked for 15 minutes.",
             )
 
-        session.commit()
+        await session.commit()
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid 2FA code.",
@@ -441,8 +479,9 @@ async def login_verify_2fa(
 
     user.failed_login_attempts = 0
     user.lockout_until = None
-    user.last_active = datetime.utcnow()
-    session.commit()
+    user.last_active = activity_tracker.touch(user.id)
+    await session.commit()
+    principal_cache.invalidate(user.id)
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -459,25 +498,25 @@ async def login(
     request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     recaptcha_token: str = Form(None),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
     return await login_start(request, form_data, recaptcha_token, session)
 
 
 @router.get("/2fa/status", response_model=TwoFactorStatusResponse)
-def get_two_factor_status(current_user: User = Depends(get_current_user)):
+async def get_two_factor_status(current_user: Principal = Depends(get_current_principal)):
     return TwoFactorStatusResponse(enabled=current_user.two_factor_enabled)
 
 
 @router.post("/2fa/setup/start", response_model=TwoFactorSetupStartResponse)
-def start_two_factor_setup(
-    session: Session = Depends(get_session),
+async def start_two_factor_setup(
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_user),
 ):
     secret = pyotp.random_base32()
     current_user.two_factor_temp_secret = secret
     session.add(current_user)
-    session.commit()
+    await session.commit()
 
     otpauth_url = pyotp.totp.TOTP(secret).provisioning_uri(
         name=current_user.email,
@@ -493,9 +532,9 @@ def start_two_factor_setup(
 
 
 @router.post("/2fa/setup/verify", response_model=BackupCodesResponse)
-def verify_two_factor_setup(
+async def verify_two_factor_setup(
     payload: TwoFactorSetupVerifyRequest,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_user),
 ):
     if not current_user.two_factor_temp_secret:
@@ -513,21 +552,22 @@ def verify_two_factor_setup(
     save_backup_codes(current_user, backup_codes)
 
     session.add(current_user)
-    session.commit()
+    await session.commit()
+    principal_cache.invalidate(current_user.id)
 
     return BackupCodesResponse(backup_codes=backup_codes)
 
 
 @router.post("/2fa/disable")
-def disable_two_factor(
+async def disable_two_factor(
     payload: TwoFactorDisableRequest,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_user),
 ):
     if not current_user.two_factor_enabled:
         raise HTTPException(status_code=400, detail="2FA is not enabled.")
 
-    if not verify_password(payload.password, current_user.password_hash):
+    if not await verify_password_async(payload.password, current_user.password_hash):
         raise HTTPException(status_code=401, detail="Incorrect password.")
 
     if not current_user.two_factor_secret:
@@ -543,14 +583,15 @@ def disable_two_factor(
     current_user.two_factor_backup_codes = None
 
     session.add(current_user)
-    session.commit()
+    await session.commit()
+    principal_cache.invalidate(current_user.id)
 
     return {"message": "2FA disabled successfully."}
 
 
 @router.post("/2fa/backup-codes/regenerate", response_model=BackupCodesResponse)
-def regenerate_backup_codes(
-    session: Session = Depends(get_session),
+async def regenerate_backup_codes(
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_user),
 ):
     if not current_user.two_factor_enabled:
@@ -559,31 +600,32 @@ def regenerate_backup_codes(
     backup_codes = generate_backup_codes()
     save_backup_codes(current_user, backup_codes)
     session.add(current_user)
-    session.commit()
+    await session.commit()
 
     return BackupCodesResponse(backup_codes=backup_codes)
 
 @router.post("/ping")
-def ping_session(current_user: User = Depends(get_current_user)):
+async def ping_session(current_user: Principal = Depends(get_current_principal)):
     """
     Refresh session activity for active users.
-    get_current_user already updates last_active.
+    get_current_user already records the activity in memory.
     """
+    last_active = activity_tracker.last_active(current_user.id, current_user.last_active)
     return {
         "message": "Session refreshed",
-        "last_active": current_user.last_active.isoformat() if current_user.last_active else None,
+        "last_active": last_active.isoformat() if last_active else None,
     }
 
 
 @router.get("/me", response_model=UserRead)
-def read_me(current_user: User = Depends(get_current_user)):
+async def read_me(current_user: User = Depends(get_current_user)):
     return current_user
 
 @router.get("/patients/{patient_id}/health")
 async def get_patient_health(
     patient_id: int,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get patient health information (providers only)"""
     
@@ -592,9 +634,9 @@ async def get_patient_health(
         raise HTTPException(status_code=403, detail="Access denied")
     
     # Get patient profile
-    profile = session.exec(
+    profile = (await session.exec(
         select(PatientProfile).where(PatientProfile.user_id == patient_id)
-    ).first()
+    )).first()
     
     if not profile:
         return {
@@ -0,0 +1,181 @@
+"""
+Provider availability engine for EasyApt
+Keeps a per-provider sorted index of booked intervals so open slots can be
+computed server-side without re-reading the appointment table on every request.
+"""
+
+import bisect
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .config import settings
+from .models import Appointment
+from .time_handler import TimeHandler
+
+Interval = Tuple[datetime, datetime]
+
+
+def to_naive_utc(dt: datetime) -> datetime:
+    """Normalize to the naive UTC datetimes stored in the appointment table."""
+    if dt.tzinfo is not None:
+        return dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+class ProviderSchedule:
+    """Booked intervals for one provider, kept sorted by start time."""
+
+    def __init__(self):
+        self._starts: List[datetime] = []
+        self._entries: List[Tuple[datetime, datetime, int]] = []
+        self._by_id: Dict[int, Tuple[datetime, datetime, int]] = {}
+        self._max_length = timedelta(0)
+        self.loaded_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, appointment_id: int, start: datetime, end: datetime) -> None:
+        self.remove(appointment_id)
+        entry = (start, end, appointment_id)
+        idx = bisect.bisect_right(self._entries, entry)
+        self._entries.insert(idx, entry)
+        self._starts.insert(idx, start)
+        self._by_id[appointment_id] = entry
+        if end - start > self._max_length:
+            self._max_length = end - start
+
+    def remove(self, appointment_id: int) -> None:
+        entry = self._by_id.pop(appointment_id, None)
+        if entry is None:
+            return
+        idx = bisect.bisect_left(self._entries, entry)
+        del self._entries[idx]
+        del self._starts[idx]
+
+    def busy_between(self, start: datetime, end: datetime) -> List[Interval]:
+        """Merged busy intervals that overlap [start, end)."""
+        # Nothing starting before (start - longest interval) can reach start,
+        # so the scan is bounded to the intervals near the window.
+        lo = bisect.bisect_left(self._starts, start - self._max_length)
+        hi = bisect.bisect_left(self._starts, end)
+        overlapping = [
+            (s, e) for s, e, _ in self._entries[lo:hi] if e > start
+        ]
+        return TimeHandler.merge_intervals(overlapping)
+
+
+class AvailabilityIndex:
+    """
+    Per-provider interval index built lazily from the Appointment table and
+    updated incrementally on book, reschedule and cancel.
+
+    Each worker process holds its own copy; schedules are rebuilt after
+    AVAILABILITY_INDEX_TTL_SECONDS so bookings made by other workers show up.
+
+    Loading reads the database outside the lock, so every change bumps a
+    per-provider version; a load that saw the version move may have missed
+    that change and is redone rather than cached.
+    """
+
+    MAX_LOAD_ATTEMPTS = 3
+
+    def __init__(self, max_age_seconds: int = 60):
+        self.max_age_seconds = max_age_seconds
+        self._schedules: Dict[int, ProviderSchedule] = {}
+        self._versions: Dict[int, int] = {}
+        self._generation = 0  # bumped by invalidate() of every provider
+        self._lock = threading.Lock()
+
+    def _version(self, provider_id: int) -> Tuple[int, int]:
+        return self._generation, self._versions.get(provider_id, 0)
+
+    def _changed(self, provider_id: int) -> None:
+        self._versions[provider_id] = self._versions.get(provider_id, 0) + 1
+
+    async def _load(self, session: AsyncSession, provider_id: int) -> ProviderSchedule:
+        stmt = (
+            select(Appointment.id, Appointment.start_time, Appointment.end_time)
+            .where(
+                Appointment.provider_id == provider_id,
+                Appointment.status == "booked",
+                Appointment.end_time > datetime.utcnow(),
+            )
+            .order_by(Appointment.start_time)
+        )
+        schedule = ProviderSchedule()
+        for appt_id, start, end in (await session.exec(stmt)).all():
+            schedule.add(appt_id, to_naive_utc(start), to_naive_utc(end))
+        return schedule
+
+    async def get_schedule(self, session: AsyncSession, provider_id: int) -> ProviderSchedule:
+        """Cached schedule, (re)loaded through a session that has no pending writes."""
+        with self._lock:
+            schedule = self._schedules.get(provider_id)
+            version = self._version(provider_id)
+        if schedule is not None and time.monotonic() - schedule.loaded_at < self.max_age_seconds:
+            return schedule
+
+        for _ in range(self.MAX_LOAD_ATTEMPTS):
+            schedule = await self._load(session, provider_id)
+            with self._lock:
+                current = self._version(provider_id)
+                if current == version:
+                    self._schedules[provider_id] = schedule
+                    return schedule
+            # A booking or cancellation landed while loading; read again in a
+            # new transaction so a snapshot (SQLite WAL) doesn't hide it. The
+            # caller's session only reads, so ending its transaction is safe.
+            version = current
+            await session.commit()
+        # Still racing: serve this load uncached, the next request rebuilds
+        return schedule
+
+    async def free_slots(
+        self,
+        session: AsyncSession,
+        provider_id: int,
+        start: datetime,
+        end: datetime,
+        duration_minutes: int,
+    ) -> List[datetime]:
+        start = to_naive_utc(start)
+        end = to_naive_utc(end)
+        schedule = await self.get_schedule(session, provider_id)
+        with self._lock:
+            busy = schedule.busy_between(start, end)
+        return TimeHandler.generate_available_slots(start, end, duration_minutes, busy)
+
+    def record_booking(self, appt: Appointment) -> None:
+        """Add or move an appointment in its provider's schedule, if loaded."""
+        with self._lock:
+            self._changed(appt.provider_id)
+            schedule = self._schedules.get(appt.provider_id)
+            if schedule is not None:
+                schedule.add(appt.id, to_naive_utc(appt.start_time), to_naive_utc(appt.end_time))
+
+    def release(self, appt: Appointment) -> None:
+        """Drop an appointment that is no longer booked (cancelled, completed)."""
+        with self._lock:
+            self._changed(appt.provider_id)
+            schedule = self._schedules.get(appt.provider_id)
+            if schedule is not None:
+                schedule.remove(appt.id)
+
+    def invalidate(self, provider_id: Optional[int] = None) -> None:
+        with self._lock:
+            if provider_id is None:
+                self._schedules.clear()
+                self._generation += 1
+            else:
+                self._schedules.pop(provider_id, None)
+                self._changed(provider_id)
+
+
+# Singleton instance
+availability_index = AvailabilityIndex(settings.AVAILABILITY_INDEX_TTL_SECONDS)
@@ -0,0 +1,149 @@
+"""
+Race-free booking helpers for EasyApt
+"No overlapping booked appointments per provider" is enforced by the database:
+PostgreSQL uses the appointment_no_overlap exclusion constraint, SQLite uses
+the AppointmentSlotLock table with a unique (provider_id, slot_start) key.
+"""
+
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import delete, insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .availability import to_naive_utc
+from .models import Appointment, AppointmentSlotLock
+
+OVERLAP_CONSTRAINTS = ("appointment_no_overlap", "appointmentslotlock")
+
+# Bucket size for SQLite slot locks. Only buckets an appointment fully
+# covers are locked; the partial buckets at the ends of an off-grid
+# appointment are settled by an overlap query instead (see lock_slots), so
+# back-to-back bookings such as 10:02-10:32 and 10:32-11:02 don't collide.
+SLOT_LOCK_MINUTES = 5
+
+
+class SlotConflict(Exception):
+    """Another booked appointment already holds (part of) this time range."""
+    pass
+
+
+class AppointmentNotBooked(Exception):
+    """Only booked appointments hold slots; this one is cancelled or completed."""
+    pass
+
+
+def _uses_slot_locks(session: AsyncSession) -> bool:
+    return session.get_bind().dialect.name == "sqlite"
+
+
+def _floor_to_grid(moment: datetime) -> datetime:
+    return moment.replace(
+        minute=moment.minute - moment.minute % SLOT_LOCK_MINUTES,
+        second=0,
+        microsecond=0,
+    )
+
+
+def _on_grid(moment: datetime) -> bool:
+    return _floor_to_grid(moment) == moment
+
+
+def _slot_starts(start: datetime, end: datetime):
+    """Starts of the lock buckets that lie entirely within [start, end)."""
+    step = timedelta(minutes=SLOT_LOCK_MINUTES)
+    start = to_naive_utc(start)
+    end = to_naive_utc(end)
+    current = _floor_to_grid(start)
+    if current < start:
+        current += step
+    while current + step <= end:
+        yield current
+        current += step
+
+
+async def has_overlap(
+    session: AsyncSession,
+    provider_id: int,
+    start: datetime,
+    end: datetime,
+    exclude_id: Optional[int] = None,
+) -> bool:
+    """Fast-path check; served by ix_appointment_provider_status_time."""
+    stmt = select(Appointment.id).where(
+        Appointment.provider_id == provider_id,
+        Appointment.status == "booked",
+        Appointment.start_time < end,
+        Appointment.end_time > start,
+    )
+    if exclude_id is not None:
+        stmt = stmt.where(Appointment.id != exclude_id)
+    return (await session.exec(stmt.limit(1))).first() is not None
+
+
+async def lock_slots(session: AsyncSession, appt: Appointment) -> None:
+    """
+    Insert slot-lock rows for a flushed, booked appointment, all in one
+    multi-row INSERT (nothing needs their ids back).
+
+    An appointment that starts or ends off the lock grid is also checked
+    against other bookings with an overlap query, raising SlotConflict.
+    That check is race-free because it runs after this transaction's first
+    write: SQLite admits one writer at a time, so no other booking can
+    commit between the check and ours.
+    """
+    if appt.status != "booked":
+        raise AppointmentNotBooked()
+    if not _uses_slot_locks(session):
+        return
+    rows = [
+        {"provider_id": appt.provider_id, "slot_start": slot_start, "appointment_id": appt.id}
+        for slot_start in _slot_starts(appt.start_time, appt.end_time)
+    ]
+    if rows:
+        await session.exec(insert(AppointmentSlotLock).values(rows))
+    if not (_on_grid(to_naive_utc(appt.start_time)) and _on_grid(to_naive_utc(appt.end_time))):
+        if await has_overlap(session, appt.provider_id, appt.start_time, appt.end_time, exclude_id=appt.id):
+            raise SlotConflict()
+
+
+async def release_slots(session: AsyncSession, appt: Appointment) -> None:
+    """Stage removal of an appointment's slot locks (cancel, complete, move)."""
+    if not _uses_slot_locks(session):
+        return
+    await session.exec(
+        delete(AppointmentSlotLock).where(AppointmentSlotLock.appointment_id == appt.id)
+    )
+
+
+async def commit_booking(
+    session: AsyncSession,
+    appt: Appointment,
+    stage: Optional[Callable[[Appointment], None]] = None,
+) -> None:
+    """
+    Flush a new or moved booking, take its slot locks and commit.
+    stage(appt) runs after the flush (appt.id is set) so dependent rows such
+    as outbox notifications land in the same transaction.
+    A constraint violation at any step is raised as SlotConflict; an
+    appointment that is not booked raises AppointmentNotBooked untouched.
+    """
+    if appt.status != "booked":
+        raise AppointmentNotBooked()
+    try:
+        session.add(appt)
+        await session.flush()
+        await lock_slots(session, appt)
+        if stage is not None:
+            stage(appt)
+        await session.commit()
+    except SlotConflict:
+        await session.rollback()
+        raise
+    except IntegrityError as e:
+        await session.rollback()
+        if any(name in str(e.orig).lower() for name in OVERLAP_CONSTRAINTS):
+            raise SlotConflict() from e
+        raise
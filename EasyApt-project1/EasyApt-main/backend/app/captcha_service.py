@@ -10,6 +10,8 @@ from typing import Optional, Dict
 from datetime import datetime, timedelta
 from collections import defaultdict
 
+from .instrumentation import track_external
+
 logger = logging.getLogger(__name__)
 
 
@@ -35,7 +37,8 @@ class CaptchaService:
             data["remoteip"] = remote_ip
         try:
             async with httpx.AsyncClient() as client:
-                response = await client.post(self.VERIFICATION_URL, data=data, timeout=10.0)
+                with track_external("hcaptcha"):
+                    response = await client.post(self.VERIFICATION_URL, data=data, timeout=10.0)
                 result = response.json()
                 # hCaptcha does not return an 'action' field like reCAPTCHA v3.
                 # Keep a consistent shape for the frontend/demo.
@@ -0,0 +1,199 @@
+"""
+Chatbot FAQ cache for EasyApt
+General questions ("what are flu symptoms", "how do I reschedule") are
+answered once by Groq and then served from memory. Questions are keyed on
+their normalized text. An optional character-trigram index can also match
+near-duplicate wording (CHATBOT_CACHE_SIMILARITY, off by default); a near
+match is refused whenever negations, numbers or qualifiers such as
+"pregnant" or "dose" differ, since those flip the medical answer. Anything
+that looks personal (possessives, numbers, emails) is never cached or
+served from the cache.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional, Set, Tuple
+
+from .config import settings
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+# Filler words that don't change what is being asked
+_FILLER = frozenset({"a", "an", "the", "please", "hi", "hello", "hey", "thanks", "thank"})
+
+# Signs the answer would be about this patient rather than general information
+_PERSONAL_WORDS = frozenset({
+    "me", "my", "mine", "myself", "our", "ours", "i'm", "im", "i've", "ive", "i'd", "i'll",
+})
+_PERSONAL_PATTERN = re.compile(r"\d|@|\bi (am|was|have|had|feel|felt)\b")
+
+
+# Words that change the answer even when the rest of the wording is close
+_NEGATIONS = frozenset({"not", "no", "never", "without", "none", "nor", "cannot"})
+_QUALIFIERS = frozenset({
+    "pregnant", "pregnancy", "breastfeeding", "nursing", "age", "aged", "old", "child", "children",
+    "kid", "kids", "baby", "babies", "infant", "infants", "toddler", "teen", "elderly", "adult", "adults",
+    "dose", "doses", "dosage", "overdose", "mg", "daily", "twice", "before", "after", "with", "while",
+})
+
+
+def normalize(question: str) -> str:
+    words = _WORD.findall(question.lower().replace("’", "'"))
+    return " ".join(w.strip("'") for w in words if w.strip("'") and w not in _FILLER)
+
+
+def is_personal(question: str) -> bool:
+    text = question.lower().replace("’", "'")
+    if _PERSONAL_PATTERN.search(text):
+        return True
+    return any(word in _PERSONAL_WORDS for word in _WORD.findall(text))
+
+
+def _qualifiers(key: str) -> FrozenSet[str]:
+    """The negations, numbers and qualifier words a near match must agree on."""
+    return frozenset(
+        word for word in key.split()
+        if word in _NEGATIONS or word in _QUALIFIERS or word.endswith("n't") or any(c.isdigit() for c in word)
+    )
+
+
+def _trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass
+class FaqEntry:
+    answer: str
+    expires_at: float  # time.time()
+    trigrams: Set[str]
+    hits: int = 0
+
+
+class ChatResponseCache:
+    """
+    Bounded LRU of chatbot answers with a TTL and per-entry hit counts.
+
+    similarity is the trigram Jaccard score (0-1) a new question needs to
+    reuse a cached answer when its normalized text is not an exact match;
+    0 (the default) serves exact normalized matches only.
+    """
+
+    def __init__(self, max_size: int = 500, ttl_seconds: int = 86400, similarity: float = 0.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self._entries: "OrderedDict[str, FaqEntry]" = OrderedDict()
+        self._postings: Dict[str, Set[str]] = defaultdict(set)  # trigram -> keys
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._postings.clear()
+            self.exact_hits = 0
+            self.similar_hits = 0
+            self.misses = 0
+            self.bypassed = 0
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        for gram in entry.trigrams:
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+
+    def _closest(self, key: str, now: float) -> Tuple[Optional[str], float]:
+        grams, qualifiers = _trigrams(key), _qualifiers(key)
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            for candidate in self._postings.get(gram, ()):
+                shared[candidate] += 1
+        best_key, best_score = None, 0.0
+        for candidate, overlap in shared.items():
+            entry = self._entries[candidate]
+            if entry.expires_at <= now or _qualifiers(candidate) != qualifiers:
+                continue
+            score = overlap / (len(grams) + len(entry.trigrams) - overlap)
+            if score > best_score:
+                best_key, best_score = candidate, score
+        return best_key, best_score
+
+    def get(self, question: str) -> Optional[str]:
+        if is_personal(question):
+            with self._lock:
+                self.bypassed += 1
+            return None
+        key = normalize(question)
+        if not key:
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                self._drop(key)
+                entry = None
+            if entry is not None:
+                self.exact_hits += 1
+            elif self.similarity > 0:
+                match, score = self._closest(key, now)
+                if match is not None and score >= self.similarity:
+                    key, entry = match, self._entries[match]
+                    self.similar_hits += 1
+            if entry is None:
+                self.misses += 1
+                return None
+            entry.hits += 1
+            self._entries.move_to_end(key)
+            return entry.answer
+
+    def put(self, question: str, answer: str) -> bool:
+        """Cache an answer; returns False when the question is not cacheable."""
+        if not answer or is_personal(question):
+            return False
+        key = normalize(question)
+        if not key:
+            return False
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            entry = FaqEntry(answer, time.time() + self.ttl_seconds, _trigrams(key))
+            self._entries[key] = entry
+            for gram in entry.trigrams:
+                self._postings[gram].add(key)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+        return True
+
+    def stats(self) -> dict:
+        # Counts only: this is served unauthenticated, so no question text
+        with self._lock:
+            lookups = self.exact_hits + self.similar_hits + self.misses
+            hits = self.exact_hits + self.similar_hits
+            return {
+                "entries": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "similarity": self.similarity,
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_ratio": round(hits / lookups, 4) if lookups else None,
+            }
+
+
+# Singleton instance
+chat_response_cache = ChatResponseCache(
+    max_size=settings.CHATBOT_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.CHATBOT_CACHE_TTL_SECONDS,
+    similarity=settings.CHATBOT_CACHE_SIMILARITY,
+)
@@ -0,0 +1,283 @@
+"""
+Groq chat gateway for EasyApt
+Chat completions go through the async Groq client, so a multi-second LLM
+call never blocks the event loop. A small limiter caps concurrent calls;
+a bounded number of callers wait in line and the rest are rejected at once.
+Every call is streamed, which also gives us time-to-first-token.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, List, Optional
+
+from groq import AsyncGroq
+
+from .config import settings
+from .instrumentation import record_external
+
+logger = logging.getLogger(__name__)
+
+
+class ChatGatewayBusy(Exception):
+    """All chat slots are taken and the wait queue is full (or the wait timed out)."""
+    pass
+
+
+class ChatLimiter:
+    """
+    At most max_concurrent holders; up to max_queue callers wait FIFO for a
+    slot. Waiters are plain futures on the caller's loop, so the limiter is
+    not tied to a single event loop.
+    """
+
+    def __init__(self, max_concurrent: int = 4, max_queue: int = 16, queue_timeout_seconds: float = 15.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> float:
+        """Wait for a slot; returns the seconds spent queued."""
+        with self._lock:
+            if self._active < self.max_concurrent and not self._waiters:
+                self._active += 1
+                return 0.0
+            if len(self._waiters) >= self.max_queue:
+                raise ChatGatewayBusy()
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+
+        queued_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout_seconds)
+        except asyncio.TimeoutError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            raise ChatGatewayBusy()
+        return time.perf_counter() - queued_at
+
+    def release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if not waiter.done():
+                    # Hand the slot straight to the next waiter
+                    waiter.get_loop().call_soon_threadsafe(self._grant, waiter)
+                    return
+            self._active -= 1
+
+    def _grant(self, waiter: asyncio.Future) -> None:
+        if waiter.done():
+            # Timed out between hand-off and wake-up; pass the slot on
+            self.release()
+        else:
+            waiter.set_result(None)
+
+
+class ChatMetrics:
+    """Counters for chat calls: time to first token, duration, queueing."""
+
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.completed = 0
+            self.errors = 0
+            self.rejected = 0
+            self.ttft_seconds_total = 0.0
+            self.ttft_seconds_max = 0.0
+            self.duration_seconds_total = 0.0
+            self.queue_wait_seconds_max = 0.0
+            self.recent_ttft: Deque[float] = deque(maxlen=self.window)
+
+    def record_completion(self, queue_wait: float, ttft: Optional[float], duration: float):
+        with self._lock:
+            self.completed += 1
+            self.duration_seconds_total += duration
+            self.queue_wait_seconds_max = max(self.queue_wait_seconds_max, queue_wait)
+            if ttft is not None:
+                self.ttft_seconds_total += ttft
+                self.ttft_seconds_max = max(self.ttft_seconds_max, ttft)
+                self.recent_ttft.append(ttft)
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def record_rejection(self):
+        with self._lock:
+            self.rejected += 1
+
+    def ttft_percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self.recent_ttft)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct))]
+
+
+class ChatGateway:
+    """Streams chat completions from Groq under the concurrency limiter."""
+
+    def __init__(self, client, model: str, limiter: ChatLimiter, temperature: float = 0.7, max_tokens: int = 500):
+        self.client = client
+        self.model = model
+        self.limiter = limiter
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.metrics = ChatMetrics()
+
+    @property
+    def available(self) -> bool:
+        return self.client is not None
+
+    async def open_stream(self, messages: List[dict]) -> "ChatStream":
+        """
+        Take a slot and start the completion; returns a ChatStream of text
+        deltas that frees the slot when exhausted or closed. Raises
+        ChatGatewayBusy (or the API error) before any text is produced, so
+        routes can still answer with a proper status code.
+        """
+        try:
+            queue_wait = await self.limiter.acquire()
+        except ChatGatewayBusy:
+            self.metrics.record_rejection()
+            raise
+
+        started = time.perf_counter()
+        try:
+            response = await self.client.chat.completions.create(
+                messages=messages,
+                model=self.model,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                stream=True,
+            )
+        except Exception:
+            self.limiter.release()
+            self.metrics.record_error()
+            record_external("groq", time.perf_counter() - started)
+            raise
+        return ChatStream(self, response, queue_wait, started)
+
+    async def complete(self, messages: List[dict]) -> str:
+        deltas = await self.open_stream(messages)
+        return "".join([delta async for delta in deltas])
+
+    def stats(self) -> dict:
+        m = self.metrics
+        completed = max(m.completed, 1)
+        p50, p95 = m.ttft_percentile(0.5), m.ttft_percentile(0.95)
+        return {
+            "available": self.available,
+            "model": self.model,
+            "max_concurrent": self.limiter.max_concurrent,
+            "max_queue": self.limiter.max_queue,
+            "active": self.limiter.active,
+            "queued": self.limiter.queued,
+            "completed_total": m.completed,
+            "errors_total": m.errors,
+            "rejected_total": m.rejected,
+            "ttft_seconds_avg": round(m.ttft_seconds_total / completed, 4),
+            "ttft_seconds_p50": round(p50, 4) if p50 is not None else None,
+            "ttft_seconds_p95": round(p95, 4) if p95 is not None else None,
+            "ttft_seconds_max": round(m.ttft_seconds_max, 4),
+            "duration_seconds_avg": round(m.duration_seconds_total / completed, 4),
+            "queue_wait_seconds_max": round(m.queue_wait_seconds_max, 4),
+        }
+
+
+class ChatStream:
+    """
+    Text deltas of one streamed completion, holding a limiter slot. The slot
+    and the upstream response are released by aclose(), which runs when the
+    deltas are exhausted or fail and is safe to call again, or before
+    iteration ever started (a client that disconnects before the first
+    chunk never runs the body of an async generator).
+    """
+
+    def __init__(self, gateway: ChatGateway, response, queue_wait: float, started: float):
+        self._gateway = gateway
+        self._response = response
+        self._deltas = self._read(queue_wait, started)
+        self._started = started
+        self._closed = False
+
+    async def _read(self, queue_wait: float, started: float) -> AsyncIterator[str]:
+        ttft = None
+        async for chunk in self._response:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            if ttft is None:
+                ttft = time.perf_counter() - started
+            yield delta
+        self._gateway.metrics.record_completion(queue_wait, ttft, time.perf_counter() - started)
+
+    def __aiter__(self) -> "ChatStream":
+        return self
+
+    async def __anext__(self) -> str:
+        if self._closed:
+            raise StopAsyncIteration
+        try:
+            return await self._deltas.__anext__()
+        except StopAsyncIteration:
+            await self.aclose()
+            raise
+        except Exception:
+            self._gateway.metrics.record_error()
+            await self.aclose()
+            raise
+
+    async def aclose(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            await self._deltas.aclose()
+            close = getattr(self._response, "close", None)
+            if close is not None:
+                await close()
+        finally:
+            self._gateway.limiter.release()
+            record_external("groq", time.perf_counter() - self._started)
+
+
+def _create_client():
+    try:
+        client = AsyncGroq(api_key=settings.GROQ_API_KEY)
+        logger.info(" Groq AI client initialized")
+        return client
+    except Exception as e:
+        logger.warning(f"Groq client not initialized: {e}")
+        return None
+
+
+# Singleton instance
+chat_gateway = ChatGateway(
+    client=_create_client(),
+    model=settings.CHATBOT_MODEL,
+    limiter=ChatLimiter(
+        max_concurrent=settings.CHATBOT_MAX_CONCURRENT,
+        max_queue=settings.CHATBOT_MAX_QUEUE,
+        queue_timeout_seconds=settings.CHATBOT_QUEUE_TIMEOUT_SECONDS,
+    ),
+)
@@ -3,26 +3,22 @@ AI Medical Assistant Chatbot using Groq
 Provides general health information with appropriate disclaimers
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from groq import Groq
-from .config import settings
-from .auth import get_current_user
-from .models import User
+from .auth import get_current_principal
+from .principal import Principal
+from .response_cache import cached_json
+from .chat_gateway import ChatGatewayBusy, ChatStream, chat_gateway
+from .chat_cache import chat_response_cache
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chatbot", tags=["chatbot"])
 
-# Initialize Groq client
-try:
-    client = Groq(api_key=settings.GROQ_API_KEY)
-    logger.info(" Groq AI client initialized")
-except Exception as e:
-    logger.warning(f"Groq client not initialized: {e}")
-    client = None
-
 class ChatMessage(BaseModel):
     message: str
 
@@ -65,64 +61,151 @@ Remember: Your goal is to educate and guide users to appropriate care, not repla
 
 MEDICAL_DISCLAIMER = """⚠️IMPORTANT: This information is for educational purposes only and is not a substitute for professional medical advice, diagnosis, or treatment. Always seek the advice of your physician or other qualified healthcare provider with any questions you may have regarding a medical condition. In case of emergency, call 911 immediately."""
 
+def _messages(user_message: str) -> list:
+    return [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": user_message
+        }
+    ]
+
+
+def _require_chat_service():
+    if not chat_gateway.available:
+        raise HTTPException(
+            status_code=503,
+            detail="AI chatbot service is currently unavailable. Please try again later."
+        )
+
+
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="The assistant is busy right now. Please try again in a moment.",
+        headers={"Retry-After": "5"},
+    )
+
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat(
     chat_message: ChatMessage,
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     AI chatbot endpoint using Groq
     Requires authentication - only logged-in users can access
     """
+    cached = chat_response_cache.get(chat_message.message)
+    if cached is not None:
+        return ChatResponse(response=cached, disclaimer=MEDICAL_DISCLAIMER)
     
-    if not client:
-        raise HTTPException(
-            status_code=503,
-            detail="AI chatbot service is currently unavailable. Please try again later."
-        )
+    _require_chat_service()
     
     try:
-        logger.info(f" Chatbot query from {current_user.email}: {chat_message.message[:50]}...")
-        
-        # Call Groq API with Llama 3 model
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": SYSTEM_PROMPT
-                },
-                {
-                    "role": "user",
-                    "content": chat_message.message
-                }
-            ],
-            model="llama-3.3-70b-versatile",  # Fast and intelligent model
-            temperature=0.7,  # Balanced creativity
-            max_tokens=500,  # Limit response length
-        )
+        logger.info("Chatbot query", extra={"user_id": current_user.id, "message_length": len(chat_message.message)})
         
-        # Extract response
-        response_text = chat_completion.choices[0].message.content
+        response_text = await chat_gateway.complete(_messages(chat_message.message))
+        chat_response_cache.put(chat_message.message, response_text)
         
-        logger.info(f" Chatbot response generated for {current_user.email}")
+        logger.info("Chatbot response generated", extra={"user_id": current_user.id})
         
         return ChatResponse(
             response=response_text,
             disclaimer=MEDICAL_DISCLAIMER
         )
         
+    except ChatGatewayBusy:
+        raise _busy()
+    except Exception as e:
+        logger.error(f" Chatbot error: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to generate response. Please try again."
+        )
+
+
+def _sse(data: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+class _ChatStreamResponse(StreamingResponse):
+    """Closes the chat stream when the response ends, however it ends."""
+    
+    def __init__(self, content, stream: ChatStream, **kwargs):
+        super().__init__(content, **kwargs)
+        self.stream = stream
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.stream.aclose()
+
+
+@router.post("/chat/stream")
+async def chat_stream(
+    chat_message: ChatMessage,
+    current_user: Principal = Depends(get_current_principal)
+):
+    """
+    Streaming variant of /chat as Server-Sent Events: one `data` event per
+    text delta, then a `done` event carrying the disclaimer (or `error`).
+    """
+    cached = chat_response_cache.get(chat_message.message)
+    if cached is not None:
+        return StreamingResponse(
+            iter([_sse({"delta": cached}), _sse({"disclaimer": MEDICAL_DISCLAIMER}, event="done")]),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache"},
+        )
+    
+    _require_chat_service()
+    
+    logger.info("Chatbot stream", extra={"user_id": current_user.id, "message_length": len(chat_message.message)})
+    try:
+        deltas = await chat_gateway.open_stream(_messages(chat_message.message))
+    except ChatGatewayBusy:
+        raise _busy()
     except Exception as e:
         logger.error(f" Chatbot error: {e}")
         raise HTTPException(
             status_code=500,
             detail="Failed to generate response. Please try again."
         )
+    
+    async def events():
+        parts = []
+        try:
+            async for delta in deltas:
+                parts.append(delta)
+                yield _sse({"delta": delta})
+            chat_response_cache.put(chat_message.message, "".join(parts))
+            yield _sse({"disclaimer": MEDICAL_DISCLAIMER}, event="done")
+        except Exception as e:
+            logger.error(f" Chatbot stream error: {e}")
+            yield _sse({"detail": "Failed to generate response. Please try again."}, event="error")
+        finally:
+            await deltas.aclose()
+    
+    return _ChatStreamResponse(
+        events(),
+        deltas,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.get("/health")
-async def chatbot_health():
+async def chatbot_health(request: Request):
     """Check if chatbot service is available"""
-    return {
-        "status": "available" if client else "unavailable",
-        "model": "llama-3.3-70b-versatile" if client else None,
-        "provider": "Groq"
-    }
+    async def build():
+        return {
+            "status": "available" if chat_gateway.available else "unavailable",
+            "model": chat_gateway.model if chat_gateway.available else None,
+            "provider": "Groq"
+        }
+    return await cached_json(request, "chatbot", "health", build, max_age=300)
@@ -4,7 +4,20 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 class Settings(BaseSettings):
     DATABASE_URL: str
     SECRET_KEY: str
+    
+    # Database engine / connection pool
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+    ACTIVITY_FLUSH_INTERVAL_SECONDS: int = 30
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10000
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 32
     BACKEND_CORS_ORIGINS: List[str] = ["http://theboys-web.eng.unt.edu"]
     
     # CAPTCHA settings
@@ -23,11 +36,33 @@ class Settings(BaseSettings):
     MAILTRAP_PORT: Optional[str] = None
     MAILTRAP_USERNAME: Optional[str] = None
     MAILTRAP_PASSWORD: Optional[str] = None
+    SMTP_POOL_MAX_CONNECTIONS: int = 4
+    SMTP_POOL_IDLE_TIMEOUT_SECONDS: float = 60.0
+    SMTP_POOL_NOOP_AFTER_SECONDS: float = 10.0
+    SMTP_POOL_ACQUIRE_TIMEOUT_SECONDS: float = 30.0
     
     # SMS settings
     TWILIO_ACCOUNT_SID: Optional[str] = None
     TWILIO_AUTH_TOKEN: Optional[str] = None
     TWILIO_PHONE_NUMBER: Optional[str] = None
+    TWILIO_API_BASE: str = "https://api.twilio.com"
+    
+    # Notification outbox dispatcher
+    NOTIFICATION_WORKERS: int = 2
+    NOTIFICATION_BATCH_SIZE: int = 20
+    NOTIFICATION_POLL_SECONDS: float = 2.0
+    NOTIFICATION_MAX_ATTEMPTS: int = 5
+    NOTIFICATION_CLAIM_TIMEOUT_SECONDS: int = 300
+    NOTIFICATION_RATE_PER_SECOND: float = 20.0
+    
+    # Reminder sweeper
+    REMINDER_LEAD_HOURS: int = 24
+    REMINDER_SWEEP_INTERVAL_SECONDS: int = 60
+    REMINDER_BATCH_SIZE: int = 200
+    
+    # Background scheduler leader election
+    RUN_SCHEDULER_IN_WEB: bool = True
+    SCHEDULER_LEASE_SECONDS: int = 30
     
     # Test mode settings
     TWILIO_TEST_MODE: str = "false"
@@ -39,6 +74,13 @@ class Settings(BaseSettings):
     
     # AI Chatbot
     GROQ_API_KEY: Optional[str] = None
+    CHATBOT_MODEL: str = "llama-3.3-70b-versatile"
+    CHATBOT_MAX_CONCURRENT: int = 4
+    CHATBOT_MAX_QUEUE: int = 16
+    CHATBOT_QUEUE_TIMEOUT_SECONDS: float = 15.0
+    CHATBOT_CACHE_MAX_ENTRIES: int = 500
+    CHATBOT_CACHE_TTL_SECONDS: int = 86400
+    CHATBOT_CACHE_SIMILARITY: float = 0.0  # >0 also reuses answers for near-duplicate wording
     
     # --- 2FA settings ---
     TOTP_ISSUER_NAME: str = "EasyApt"
@@ -46,6 +88,26 @@ class Settings(BaseSettings):
     # === Stripe Payment Settings ===
     STRIPE_SECRET_KEY: Optional[str] = None
     STRIPE_PUBLISHABLE_KEY: Optional[str] = None
+    STRIPE_API_BASE: str = "https://api.stripe.com"  # point at stripe_stub.py for load tests
+    STRIPE_TIMEOUT_SECONDS: float = 20.0
+    STRIPE_MAX_CONNECTIONS: int = 20
+    
+    # === Availability engine ===
+    AVAILABILITY_INDEX_TTL_SECONDS: int = 60
+    
+    # === Response cache ===
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1024
+    RESPONSE_CACHE_TTL_SECONDS: int = 60
+    RESPONSE_CACHE_DIR: str = ""  # shared by workers on one host when set
+    
+    # === Request instrumentation ===
+    SLOW_REQUEST_SECONDS: float = 1.0
+    SLOW_REQUEST_SAMPLE_RATE: float = 1.0  # fraction of slow requests logged with their SQL
+    
+    # === Logging ===
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: str = ""  # per-module overrides: "app.notification_outbox=DEBUG,httpx=WARNING"
+    LOG_FORMAT: str = "json"  # json | text
     
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
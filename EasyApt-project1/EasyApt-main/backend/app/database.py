@@ -1,13 +1,192 @@
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import URL, Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from .config import settings
 
-# For Postgres, connect_args can stay empty
-connect_args = {}
-engine = create_engine(
-    settings.DATABASE_URL,
-    echo=True,
-    connect_args=connect_args,
-)
+# Async drivers used for each backend in DATABASE_URL
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+class PoolMetrics:
+    """Connection pool counters: checkouts, time spent waiting, overflow."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.checkins = 0
+            self.connects = 0
+            self.wait_seconds_total = 0.0
+            self.wait_seconds_max = 0.0
+            self.overflow_peak = 0
+
+    def record_wait(self, seconds: float, overflow: int):
+        with self._lock:
+            self.wait_seconds_total += seconds
+            if seconds > self.wait_seconds_max:
+                self.wait_seconds_max = seconds
+            if overflow > self.overflow_peak:
+                self.overflow_peak = overflow
+
+    def record_checkout(self):
+        with self._lock:
+            self.checkouts += 1
+
+    def record_checkin(self):
+        with self._lock:
+            self.checkins += 1
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+
+pool_metrics = PoolMetrics()
+
+
+class _CheckoutTimingMixin:
+    """Records how long each pool checkout waited for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_metrics.record_wait(time.perf_counter() - start, max(self.overflow(), 0))
+
+
+class InstrumentedQueuePool(_CheckoutTimingMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+def _disable_driver_begin(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+
+
+def _begin(conn):
+    # Straight on the driver cursor, like the implicit BEGIN it replaces
+    cursor = conn.connection.cursor()
+    cursor.execute("BEGIN")
+    cursor.close()
+
+
+def enable_sqlite_transactions(sync_engine: Engine) -> None:
+    """
+    Let SQLAlchemy, not the sqlite driver, start transactions. Left to
+    itself the driver only emits BEGIN before DML, so a SAVEPOINT opens the
+    transaction and its RELEASE commits it, and begin_nested() batches
+    (bulk appointment changes) are not atomic.
+    """
+    event.listen(sync_engine, "connect", _disable_driver_begin)
+    event.listen(sync_engine, "begin", _begin)
+
+
+def _engine_args(url: URL, poolclass) -> dict:
+    is_sqlite = url.get_backend_name() == "sqlite"
+    in_memory = is_sqlite and url.database in (None, "", ":memory:")
+
+    engine_args = {
+        "echo": settings.DB_ECHO,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if is_sqlite:
+        engine_args["connect_args"] = {"check_same_thread": False}
+
+    # In-memory SQLite keeps SQLAlchemy's single-connection pool
+    if not in_memory:
+        engine_args.update(
+            poolclass=poolclass,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+    return engine_args
+
+
+def _instrument(sync_engine: Engine, url: URL) -> None:
+    if url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:"):
+        event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+
+    event.listen(sync_engine, "connect", lambda *args: pool_metrics.record_connect())
+    event.listen(sync_engine, "checkout", lambda *args: pool_metrics.record_checkout())
+    event.listen(sync_engine, "checkin", lambda *args: pool_metrics.record_checkin())
+
+
+def create_db_engine(database_url: str = None) -> Engine:
+    """Build a sync engine for DATABASE_URL with the pool settings from Settings."""
+    url = make_url(database_url or settings.DATABASE_URL)
+    engine = create_engine(url, **_engine_args(url, InstrumentedQueuePool))
+    _instrument(engine, url)
+    return engine
+
+
+def async_database_url(database_url: str = None) -> URL:
+    """DATABASE_URL rewritten to its async driver (aiosqlite / asyncpg)."""
+    url = make_url(database_url or settings.DATABASE_URL)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+def create_async_db_engine(database_url: str = None) -> AsyncEngine:
+    """Async counterpart of create_db_engine, used by the API routers."""
+    url = async_database_url(database_url)
+    engine = create_async_engine(url, **_engine_args(url, InstrumentedAsyncQueuePool))
+    _instrument(engine.sync_engine, url)
+    if url.get_backend_name() == "sqlite":
+        enable_sqlite_transactions(engine.sync_engine)
+    return engine
+
+
+def pool_status(db_engine=None) -> dict:
+    """Snapshot of pool gauges and counters for the health endpoint."""
+    db_engine = db_engine or async_engine
+    pool = getattr(db_engine, "sync_engine", db_engine).pool
+    status = {
+        "pool_class": type(pool).__name__,
+        "checkouts_total": pool_metrics.checkouts,
+        "checkins_total": pool_metrics.checkins,
+        "connections_opened_total": pool_metrics.connects,
+        "checkout_wait_seconds_total": round(pool_metrics.wait_seconds_total, 6),
+        "checkout_wait_seconds_max": round(pool_metrics.wait_seconds_max, 6),
+        "overflow_peak": pool_metrics.overflow_peak,
+    }
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+        )
+    return status
+
+
+# Sync engine for scripts and schema creation; routers use the async engine
+engine = create_db_engine()
+async_engine = create_async_db_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
 
 
 def init_db():
@@ -18,3 +197,9 @@ def get_session():
     """Dependency to get a database session for each request."""
     with Session(engine) as session:
         yield session
+
+
+async def get_async_session():
+    """Dependency to get an async database session for each request."""
+    async with AsyncSessionLocal() as session:
+        yield session
@@ -0,0 +1,236 @@
+"""
+Request instrumentation for EasyApt
+An ASGI middleware opens a per-request record in a contextvar; SQLAlchemy
+cursor events and external-call wrappers (Stripe, Groq, hCaptcha, Twilio,
+SMTP) add to whichever request is current. When the response has been sent
+the record is folded into per-route histograms, exposed by /metrics in the
+Prometheus text format. Requests slower than SLOW_REQUEST_SECONDS are
+logged (sampled) with their slowest SQL statements; parameters are never
+logged.
+"""
+
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+logger = logging.getLogger("app.slow_requests")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 20, 50, 100)
+MAX_CAPTURED_SQL = 50
+
+
+@dataclass
+class RequestRecord:
+    statements: int = 0
+    db_seconds: float = 0.0
+    external_seconds: Dict[str, float] = field(default_factory=dict)
+    sql: List[Tuple[float, str]] = field(default_factory=list)  # (seconds, statement)
+
+
+_current: ContextVar[Optional[RequestRecord]] = ContextVar("easyapt_request", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, Prometheus style."""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series: Dict[tuple, list] = {}  # labels -> [count per bucket..., count above last bucket, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for label_values, counts in series:
+            labels = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            sep = "," if labels else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{_format(bound)}"}} {cumulative}')
+            total = cumulative + counts[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {total}')
+            lines.append(f"{self.name}_sum{{{labels}}} {_format(counts[-1])}")
+            lines.append(f"{self.name}_count{{{labels}}} {total}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    def __init__(self):
+        route = ("method", "route")
+        self.request_seconds = Histogram(
+            "easyapt_http_request_duration_seconds", "Total request latency.",
+            route + ("status",), LATENCY_BUCKETS)
+        self.db_seconds = Histogram(
+            "easyapt_http_request_db_seconds", "Time spent executing SQL per request.",
+            route, LATENCY_BUCKETS)
+        self.external_seconds = Histogram(
+            "easyapt_http_request_external_seconds", "Time spent in external calls per request.",
+            route, LATENCY_BUCKETS)
+        self.statements = Histogram(
+            "easyapt_http_request_sql_statements", "SQL statements issued per request.",
+            route, STATEMENT_BUCKETS)
+        self.external_calls = Histogram(
+            "easyapt_external_call_seconds", "Latency of calls to external services.",
+            ("service",), LATENCY_BUCKETS)
+        self.slow_requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def histograms(self) -> List[Histogram]:
+        return [self.request_seconds, self.db_seconds, self.external_seconds, self.statements, self.external_calls]
+
+    def reset(self) -> None:
+        for histogram in self.histograms:
+            histogram.reset()
+        with self._lock:
+            self.slow_requests = 0
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for histogram in self.histograms:
+            lines.extend(histogram.render())
+        lines += [
+            "# HELP easyapt_slow_requests_total Requests slower than SLOW_REQUEST_SECONDS.",
+            "# TYPE easyapt_slow_requests_total counter",
+            f"easyapt_slow_requests_total {self.slow_requests}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+# ---------- SQL ----------
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("easyapt_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    record = _current.get()
+    starts = conn.info.get("easyapt_query_start")
+    if record is None or not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    record.statements += 1
+    record.db_seconds += elapsed
+    if len(record.sql) < MAX_CAPTURED_SQL:
+        record.sql.append((elapsed, statement))
+
+
+# ---------- External calls ----------
+
+def record_external(service: str, seconds: float) -> None:
+    """Add an external call's duration to the current request and the service histogram."""
+    metrics.external_calls.observe(seconds, service)
+    record = _current.get()
+    if record is not None:
+        record.external_seconds[service] = record.external_seconds.get(service, 0.0) + seconds
+
+
+@contextmanager
+def track_external(service: str):
+    """Time a block that calls an external service (works in sync and async code)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_external(service, time.perf_counter() - started)
+
+
+# ---------- Middleware ----------
+
+class InstrumentationMiddleware:
+    """Pure ASGI, so streamed responses are timed until their last byte."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        record = RequestRecord()
+        token = _current.set(record)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            self._observe(scope, record, status_code, time.perf_counter() - started)
+
+    @staticmethod
+    def _observe(scope, record: RequestRecord, status_code: int, seconds: float) -> None:
+        route = scope.get("route")
+        # Route templates, not raw paths, keep label cardinality bounded
+        path = getattr(route, "path", None) or "unmatched"
+        method = scope["method"]
+        external = sum(record.external_seconds.values())
+
+        metrics.request_seconds.observe(seconds, method, path, str(status_code))
+        metrics.db_seconds.observe(record.db_seconds, method, path)
+        metrics.external_seconds.observe(external, method, path)
+        metrics.statements.observe(record.statements, method, path)
+
+        if seconds < settings.SLOW_REQUEST_SECONDS:
+            return
+        with metrics._lock:
+            metrics.slow_requests += 1
+        if random.random() >= settings.SLOW_REQUEST_SAMPLE_RATE:
+            return
+        slowest = sorted(record.sql, key=lambda item: item[0], reverse=True)[:5]
+        logger.warning(
+            "Slow request %s %s: %.3fs total, %.3fs in %d SQL statements, external %s\n%s",
+            method, path, seconds, record.db_seconds, record.statements,
+            {k: round(v, 3) for k, v in record.external_seconds.items()} or "none",
+            "\n".join(f"  {elapsed * 1000:.1f} ms  {' '.join(sql.split())}" for elapsed, sql in slowest),
+        )
@@ -0,0 +1,128 @@
+"""
+Transaction ledger rollups for EasyApt
+Every insert, update or delete of a Transaction row also adjusts two small
+aggregate tables in the same database transaction:
+  - TransactionUserRollup: per user, by status and type
+  - TransactionDailyRollup: per UTC day, by status and type
+Summaries (the /transactions/summary endpoint and operations_monitor.py)
+read these instead of scanning app_transaction.
+
+The hooks are ORM mapper events, so they cover any session that writes a
+Transaction once this module is imported (app.transactions imports it).
+migrate_transaction_rollups.py backfills the tables from an existing ledger.
+"""
+
+from datetime import date
+from typing import Dict, Optional
+
+from sqlalchemy import event, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm.attributes import get_history
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .models import Transaction, TransactionDailyRollup, TransactionUserRollup
+
+ROLLUP_KEYS = {
+    TransactionUserRollup: ("user_id", "status", "transaction_type"),
+    TransactionDailyRollup: ("day", "status", "transaction_type"),
+}
+
+_UPSERT = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def _add(connection, model, key: dict, count: int, amount: float) -> None:
+    table = model.__table__
+    dialect_insert = _UPSERT.get(connection.dialect.name)
+    if dialect_insert is not None:
+        stmt = dialect_insert(table).values(**key, count=count, amount=amount)
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=list(ROLLUP_KEYS[model]),
+            set_={"count": table.c.count + count, "amount": table.c.amount + amount},
+        ))
+        return
+
+    where = [table.c[name] == value for name, value in key.items()]
+    result = connection.execute(
+        update(table).where(*where).values(count=table.c.count + count, amount=table.c.amount + amount)
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(**key, count=count, amount=amount))
+
+
+def _apply(connection, user_id: int, day: date, status: str, transaction_type: str, sign: int, amount: float) -> None:
+    _add(connection, TransactionUserRollup,
+         {"user_id": user_id, "status": status, "transaction_type": transaction_type}, sign, sign * amount)
+    _add(connection, TransactionDailyRollup,
+         {"day": day, "status": status, "transaction_type": transaction_type}, sign, sign * amount)
+
+
+@event.listens_for(Transaction, "after_insert")
+def _on_insert(mapper, connection, target: Transaction) -> None:
+    _apply(connection, target.user_id, target.created_at.date(), target.status,
+           target.transaction_type, 1, target.amount or 0.0)
+
+
+@event.listens_for(Transaction, "before_update")
+def _on_update(mapper, connection, target: Transaction) -> None:
+    fields = ("user_id", "created_at", "status", "transaction_type", "amount")
+    if not any(get_history(target, name).has_changes() for name in fields):
+        return
+    # The old values may never have been loaded; read them before the UPDATE runs
+    table = Transaction.__table__
+    old = connection.execute(
+        select(*(table.c[name] for name in fields)).where(table.c.id == target.id)
+    ).one()
+    _apply(connection, old.user_id, old.created_at.date(), old.status,
+           old.transaction_type, -1, old.amount or 0.0)
+    _on_insert(mapper, connection, target)
+
+
+@event.listens_for(Transaction, "after_delete")
+def _on_delete(mapper, connection, target: Transaction) -> None:
+    _apply(connection, target.user_id, target.created_at.date(), target.status,
+           target.transaction_type, -1, target.amount or 0.0)
+
+
+def _summarize(rows) -> dict:
+    by_status: Dict[str, dict] = {}
+    by_type: Dict[str, dict] = {}
+    count, amount = 0, 0.0
+    for status, transaction_type, row_count, row_amount in rows:
+        if not row_count:
+            continue
+        count += row_count
+        amount += row_amount
+        for group, name in ((by_status, status), (by_type, transaction_type)):
+            totals = group.setdefault(name, {"count": 0, "amount": 0.0})
+            totals["count"] += row_count
+            totals["amount"] = round(totals["amount"] + row_amount, 2)
+    return {"count": count, "amount": round(amount, 2), "by_status": by_status, "by_type": by_type}
+
+
+async def user_summary(session: AsyncSession, user_id: int) -> dict:
+    r = TransactionUserRollup
+    stmt = select(r.status, r.transaction_type, r.count, r.amount).where(r.user_id == user_id)
+    return _summarize((await session.exec(stmt)).all())
+
+
+async def daily_summary(session: AsyncSession, start: Optional[date] = None, end: Optional[date] = None) -> dict:
+    """All users' totals over [start, end] (inclusive), plus one entry per day."""
+    r = TransactionDailyRollup
+    stmt = select(r.day, r.status, r.transaction_type, r.count, r.amount)
+    if start is not None:
+        stmt = stmt.where(r.day >= start)
+    if end is not None:
+        stmt = stmt.where(r.day <= end)
+    rows = (await session.exec(stmt.order_by(r.day))).all()
+
+    summary = _summarize(row[1:] for row in rows)
+    by_day: Dict[date, dict] = {}
+    for day, _, _, row_count, row_amount in rows:
+        if not row_count:
+            continue
+        totals = by_day.setdefault(day, {"day": day, "count": 0, "amount": 0.0})
+        totals["count"] += row_count
+        totals["amount"] = round(totals["amount"] + row_amount, 2)
+    summary["by_day"] = list(by_day.values())
+    return summary
@@ -0,0 +1,173 @@
+"""
+Logging setup for EasyApt
+Request handlers only put records on an in-memory queue (QueueHandler); a
+QueueListener thread formats them and does the actual stdout write, so a
+slow or blocked stdout never stalls the event loop.
+
+Records are emitted as one JSON object per line (LOG_FORMAT=text for local
+reading). PHI is redacted before a record is queued: profile/contact fields
+passed via `extra=` are masked, and email addresses and phone numbers in
+the message text, traceback and stack are obscured.
+
+Levels: LOG_LEVEL for the root logger, LOG_LEVELS for overrides, e.g.
+LOG_LEVELS="app.notification_outbox=DEBUG,httpx=WARNING".
+"""
+
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from .config import settings
+
+# extra= keys whose values are never logged as-is
+PHI_FIELDS = frozenset({
+    "full_name", "date_of_birth", "phone", "insurance", "insurance_policy_number",
+    "blood_type", "allergies", "medications", "medical_conditions",
+    "emergency_contact_name", "emergency_contact_phone",
+    "email", "to", "to_email", "to_phone", "recipient", "patient_email",
+    "password", "token", "reason",
+})
+REDACTED = "[REDACTED]"
+
+_EMAIL = re.compile(r"\b([A-Za-z0-9._%+-])[A-Za-z0-9._%+-]*@([A-Za-z0-9.-]+\.[A-Za-z]{2,})\b")
+_PHONE = re.compile(r"\+\d{10,15}\b|\(?\b\d{3}\)?[\s.-]\d{3}[-.\s]\d{4}\b")
+
+# Attributes every LogRecord has; anything else came from extra=
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+def redact_text(text: str) -> str:
+    text = _EMAIL.sub(r"\1***@\2", text)
+    return _PHONE.sub(REDACTED, text)
+
+
+def redact_value(key: str, value):
+    if key in PHI_FIELDS and value not in (None, ""):
+        return REDACTED
+    if isinstance(value, dict):
+        return {k: redact_value(k, v) for k, v in value.items()}
+    if isinstance(value, str):
+        return redact_text(value)
+    return value
+
+
+class RedactingFilter(logging.Filter):
+    """Masks PHI in the message, traceback, stack and extra= fields, in place."""
+
+    _formatter = logging.Formatter()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.msg = redact_text(record.getMessage())
+        record.args = None
+        # Exception messages carry PHI too; keep only the redacted text
+        if record.exc_info:
+            record.exc_text = self._formatter.formatException(record.exc_info)
+            record.exc_info = None
+        if record.exc_text:
+            record.exc_text = redact_text(record.exc_text)
+        if record.stack_info:
+            record.stack_info = redact_text(record.stack_info)
+        for key in set(vars(record)) - _RECORD_ATTRS:
+            setattr(record, key, redact_value(key, getattr(record, key)))
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any extra= fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key in set(vars(record)) - _RECORD_ATTRS:
+            entry[key] = getattr(record, key)
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        if record.stack_info:
+            entry["stack_info"] = record.stack_info
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Queues a copy of the (already redacted) record as is. The stock prepare()
+    folds the traceback into the message; here it stays in exc_text so the
+    JSON formatter can emit it as its own field.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        return record
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Writes to whatever sys.stdout is at emit time (it may be replaced after setup)."""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    levels = {}
+    for item in spec.split(","):
+        name, sep, level = item.strip().partition("=")
+        if sep and name.strip():
+            levels[name.strip()] = logging.getLevelName(level.strip().upper())
+    return levels
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[_QueueHandler] = None
+
+
+def configure_logging() -> None:
+    """Install the queue handler on the root logger and start the listener (idempotent)."""
+    global _listener, _queue_handler
+    shutdown_logging()
+
+    output = _StdoutHandler()
+    if settings.LOG_FORMAT.lower() == "text":
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    else:
+        output.setFormatter(JsonFormatter())
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    _queue_handler = _QueueHandler(log_queue)
+    _queue_handler.addFilter(RedactingFilter())
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+
+    root = logging.getLogger()
+    root.addHandler(_queue_handler)
+    root.setLevel(logging.getLevelName(settings.LOG_LEVEL.upper()))
+    for name, level in parse_levels(settings.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and detach the handler."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
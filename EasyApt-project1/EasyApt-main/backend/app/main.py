@@ -1,19 +1,34 @@
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+import logging
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pathlib import Path
 
-from .database import init_db
+from .database import init_db, pool_status
 from . import models
 from .auth import router as auth_router
 from .profile import router as profile_router
 from .appointments import router as appointments_router
 from .chatbot import router as chatbot_router
-from .notification_service import notification_service
 from .appointment_store import init_db as init_appointments_db
 from .transactions import router as transactions_router
 from .payments import router as payments_router
+from .activity import activity_tracker
+from .notification_outbox import notification_dispatcher
+from .scheduler import scheduler_runner
+from .config import settings
+from .password_pool import password_hash_pool
+from .smtp_mailer import smtp_pool
+from .response_cache import response_cache
+from .static_assets import PAGES, StaticSite, file_response
+from .chat_gateway import chat_gateway
+from .chat_cache import chat_response_cache
+from .stripe_client import stripe_client
+from .instrumentation import InstrumentationMiddleware, metrics
+from .logging_config import configure_logging, shutdown_logging
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="EasyApt Healthcare Scheduling",  # Updated
@@ -30,20 +45,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency, SQL and external-call histograms (see /metrics)
+app.add_middleware(InstrumentationMiddleware)
+
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
+    configure_logging()
     init_db()
-    print(" Main database initialized")
+    logger.info("Main database initialized")
+    
+    activity_tracker.start()
+    notification_dispatcher.start()
     
     init_appointments_db()
-    print("Appointments database initialized")
-    print("Email notification scheduler started")
+    logger.info("Appointments database initialized")
+    
+    # Only the lease holder runs scheduled jobs; the rest just serve requests
+    if settings.RUN_SCHEDULER_IN_WEB:
+        scheduler_runner.start()
+        logger.info("Scheduler leader election started")
 
 @app.on_event("shutdown")
-def on_shutdown():
+async def on_shutdown():
     """Gracefully shutdown notification scheduler"""
-    notification_service.shutdown()
-    print(" Notification scheduler stopped")
+    await scheduler_runner.stop()
+    logger.info("Notification scheduler stopped")
+    
+    await notification_dispatcher.stop()
+    await activity_tracker.stop()
+    password_hash_pool.shutdown()
+    smtp_pool.close_all()
+    await stripe_client.close()
+    shutdown_logging()
 
 # Include API routers
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
@@ -65,53 +98,66 @@ def health_check():
     return {
         "status": "ok",
         "captcha_configured": bool(captcha_service.secret_key),
-        "email_scheduler": "running"
+        "email_scheduler": "running",
+        "scheduler_leader": scheduler_runner.is_leader
     }
 
-# Path to frontend directory
-frontend_path = Path(__file__).parent.parent.parent / "frontend"
+@app.get("/health/db")
+def database_health():
+    """Connection pool gauges: checkouts, wait time and overflow"""
+    return pool_status()
 
-# Mount static files (CSS, JS)
-app.mount("/css", StaticFiles(directory=str(frontend_path / "css")), name="css")
-app.mount("/js", StaticFiles(directory=str(frontend_path / "js")), name="js")
+@app.get("/health/auth")
+def auth_health():
+    """Password hash pool: in-flight work, hash latency and queue wait"""
+    return password_hash_pool.stats()
 
-# Serve HTML pages
-@app.get("/")
-async def serve_home():
-    return FileResponse(str(frontend_path / "index.html"))
-
-@app.get("/login.html")
-async def serve_login():
-    return FileResponse(str(frontend_path / "login.html"))
-
-@app.get("/register.html")
-async def serve_register():
-    return FileResponse(str(frontend_path / "register.html"))
+@app.get("/health/chatbot")
+def chatbot_gateway_health():
+    """Chat gateway: concurrency, queueing, time to first token and FAQ cache"""
+    return {**chat_gateway.stats(), "cache": chat_response_cache.stats()}
 
-@app.get("/profile.html")
-async def serve_profile():
-    return FileResponse(str(frontend_path / "profile.html"))
+@app.get("/health/payments")
+def payments_health():
+    """Stripe API client: request count, errors and average latency"""
+    return stripe_client.stats()
 
-@app.get("/appointments.html")
-async def serve_appointments():
-    return FileResponse(str(frontend_path / "appointments.html"))
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Request histograms in the Prometheus text exposition format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
-@app.get("/book-appointment.html")
-async def serve_book_appointment():
-    return FileResponse(str(frontend_path / "book-appointment.html"))
+@app.get("/health/cache")
+def cache_health():
+    """Response cache: entries, hit/miss counters and 304s served"""
+    return response_cache.stats()
 
-@app.get("/provider-dashboard.html")
-async def serve_provider_dashboard():
-    return FileResponse(str(frontend_path / "provider-dashboard.html"))
+# Path to frontend directory
+frontend_path = Path(__file__).parent.parent.parent / "frontend"
 
-@app.get("/chatbot.html")
-async def serve_chatbot():
-    return FileResponse(str(frontend_path / "chatbot.html"))
+# Frontend files are read, hashed and precompressed once at startup
+static_site = StaticSite(frontend_path)
+
+# Content-hashed CSS/JS referenced by the pages; cached forever
+@app.get("/assets/{asset_path:path}", include_in_schema=False)
+async def serve_asset(asset_path: str, request: Request):
+    asset = static_site.assets.get(f"/assets/{asset_path}")
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return file_response(request, asset)
+
+# Unhashed CSS/JS URLs keep working, revalidated by ETag
+@app.get("/css/{asset_path:path}", include_in_schema=False)
+@app.get("/js/{asset_path:path}", include_in_schema=False)
+async def serve_source_asset(asset_path: str, request: Request):
+    source = static_site.sources.get(request.url.path.lstrip("/"))
+    if source is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return file_response(request, source)
 
-@app.get("/transactions.html")
-async def serve_transactions():
-    return FileResponse(str(frontend_path / "transactions.html"))
+# Serve HTML pages
+async def serve_page(request: Request):
+    return file_response(request, static_site.pages[request.url.path])
 
-@app.get("/payment-checkout.html")
-async def serve_payment_checkout():
-    return FileResponse(str(frontend_path / "payment-checkout.html"))
+for page_path in PAGES:
+    app.add_api_route(page_path, serve_page, methods=["GET"], include_in_schema=False)
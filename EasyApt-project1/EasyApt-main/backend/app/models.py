@@ -1,6 +1,7 @@
 from datetime import datetime, date
 from typing import Optional
 
+from sqlalchemy import DDL, Index, UniqueConstraint, event
 from sqlmodel import SQLModel, Field, Relationship
 
 
@@ -40,6 +41,11 @@ class PatientProfile(SQLModel, table=True):
 
 
 class Provider(SQLModel, table=True):
+    __table_args__ = (
+        # Keyset pagination order for the provider listing
+        Index("ix_provider_created_at_id", "created_at", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: Optional[int] = Field(default=None, foreign_key="user.id", index=True)
     name: str
@@ -48,7 +54,56 @@ class Provider(SQLModel, table=True):
     consultation_fee: float = Field(default=75.0)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+
+# Provider search indexes over name, specialty and location (see provider_search.py)
+PROVIDER_SEARCH_EXPR = (
+    "lower(name || ' ' || coalesce(specialty, '') || ' ' || coalesce(location, ''))"
+)
+PROVIDER_TRGM_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS ix_provider_search_trgm ON provider "
+    f"USING gin (({PROVIDER_SEARCH_EXPR}) gin_trgm_ops)",
+)
+# SQLite: external-content FTS5 table kept in sync by triggers
+PROVIDER_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS provider_fts USING fts5("
+    "name, specialty, location, content='provider', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS provider_fts_ai AFTER INSERT ON provider BEGIN "
+    "INSERT INTO provider_fts(rowid, name, specialty, location) "
+    "VALUES (new.id, new.name, new.specialty, new.location); END",
+    "CREATE TRIGGER IF NOT EXISTS provider_fts_ad AFTER DELETE ON provider BEGIN "
+    "INSERT INTO provider_fts(provider_fts, rowid, name, specialty, location) "
+    "VALUES ('delete', old.id, old.name, old.specialty, old.location); END",
+    "CREATE TRIGGER IF NOT EXISTS provider_fts_au AFTER UPDATE ON provider BEGIN "
+    "INSERT INTO provider_fts(provider_fts, rowid, name, specialty, location) "
+    "VALUES ('delete', old.id, old.name, old.specialty, old.location); "
+    "INSERT INTO provider_fts(rowid, name, specialty, location) "
+    "VALUES (new.id, new.name, new.specialty, new.location); END",
+)
+
+for statement in PROVIDER_TRGM_DDL:
+    event.listen(Provider.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+for statement in PROVIDER_FTS_DDL:
+    event.listen(Provider.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(
+    Provider.__table__,
+    "after_drop",
+    DDL("DROP TABLE IF EXISTS provider_fts").execute_if(dialect="sqlite"),
+)
+
+
 class Appointment(SQLModel, table=True):
+    __table_args__ = (
+        # Overlap checks are a range probe on this index
+        Index("ix_appointment_provider_status_time", "provider_id", "status", "start_time", "end_time"),
+        # Reminder sweeps scan booked appointments by start_time
+        Index("ix_appointment_status_start_time", "status", "start_time"),
+        # Keyset pagination orders for patient and provider listings
+        Index("ix_appointment_patient_start_id", "patient_id", "start_time", "id"),
+        Index("ix_appointment_provider_start_id", "provider_id", "start_time", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     patient_id: int = Field(foreign_key="user.id", index=True)
     provider_id: int = Field(foreign_key="provider.id", index=True)
@@ -56,8 +111,36 @@ class Appointment(SQLModel, table=True):
     end_time: datetime
     status: str = Field(default="booked")  # booked, cancelled, completed, etc.
     reason: Optional[str] = Field(default=None, max_length=255)
+    reminder_sent_at: Optional[datetime] = Field(default=None)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+
+# PostgreSQL: the database itself rejects overlapping booked appointments
+APPOINTMENT_OVERLAP_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    "ALTER TABLE appointment ADD CONSTRAINT appointment_no_overlap "
+    "EXCLUDE USING gist (provider_id WITH =, tsrange(start_time, end_time) WITH &&) "
+    "WHERE (status = 'booked')",
+)
+
+for statement in APPOINTMENT_OVERLAP_DDL:
+    event.listen(Appointment.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
+
+class AppointmentSlotLock(SQLModel, table=True):
+    """
+    SQLite stand-in for the exclusion constraint: one row per provider time
+    bucket held by a booked appointment, guarded by a unique key.
+    """
+    __table_args__ = (
+        UniqueConstraint("provider_id", "slot_start", name="uq_slot_lock_provider_slot"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    provider_id: int = Field(foreign_key="provider.id")
+    slot_start: datetime
+    appointment_id: int = Field(foreign_key="appointment.id", index=True)
+
 class ProviderAppointment(SQLModel):
     id: int
     start_time: datetime
@@ -71,6 +154,10 @@ class ProviderAppointment(SQLModel):
 
 class Transaction(SQLModel, table=True):
     __tablename__ = "app_transaction"
+    __table_args__ = (
+        # Keyset pagination order for transaction history
+        Index("ix_transaction_user_created_id", "user_id", "created_at", "id"),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
@@ -82,3 +169,76 @@ class Transaction(SQLModel, table=True):
     status: str = Field(default="completed")
     
     created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class TransactionUserRollup(SQLModel, table=True):
+    """Per-user ledger totals by status and type, kept current by app/ledger.py"""
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    status: str = Field(primary_key=True)
+    transaction_type: str = Field(primary_key=True)
+    count: int = Field(default=0)
+    amount: float = Field(default=0.0)
+
+
+class TransactionDailyRollup(SQLModel, table=True):
+    """Ledger totals per UTC day by status and type, kept current by app/ledger.py"""
+    day: date = Field(primary_key=True)
+    status: str = Field(primary_key=True)
+    transaction_type: str = Field(primary_key=True)
+    count: int = Field(default=0)
+    amount: float = Field(default=0.0)
+
+
+class PendingPaymentIntent(SQLModel, table=True):
+    """
+    Stripe PaymentIntent created for a (patient, provider, slot, fee)
+    checkout, so a retried checkout gets the same intent back without
+    another call to Stripe. Removed when the slot is booked.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    idempotency_key: str = Field(index=True, unique=True)
+    patient_id: int = Field(foreign_key="user.id", index=True)
+    provider_id: int = Field(foreign_key="provider.id")
+    start_time: str  # isoformat of the checkout's start_time, as booked
+    stripe_intent_id: str
+    client_secret: str
+    amount: float
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class NotificationOutbox(SQLModel, table=True):
+    """
+    Outgoing email/SMS, written in the same transaction as the change that
+    triggers it and delivered by the background dispatcher.
+    """
+    __table_args__ = (
+        Index("ix_notificationoutbox_status_available", "status", "available_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    channel: str  # email, sms
+    kind: str  # booking_confirmation, appointment_reminder, rescheduling, cancellation, account_created
+    recipient: str
+    subject: Optional[str] = None
+    body: str
+    appointment_id: Optional[int] = Field(default=None, foreign_key="appointment.id", index=True)
+    batch_id: Optional[str] = Field(default=None, index=True)  # set for bulk operations
+
+    status: str = Field(default="pending")  # pending, sending, sent, failed
+    attempts: int = Field(default=0)
+    available_at: datetime = Field(default_factory=datetime.utcnow)
+    claim_token: Optional[str] = Field(default=None, index=True)
+    claimed_at: Optional[datetime] = None
+    sent_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class SchedulerLease(SQLModel, table=True):
+    """
+    Leader lease for background jobs: the holder runs the scheduler and
+    reminder sweeper until expires_at, renewing well before then.
+    """
+    name: str = Field(primary_key=True)
+    holder: str
+    expires_at: datetime
@@ -0,0 +1,372 @@
+"""
+Notification outbox for EasyApt
+Routers stage email/SMS rows in the same transaction as the booking change
+that triggers them; background workers claim pending rows, deliver them and
+retry failures with backoff. A request never waits on SMTP or Twilio.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import httpx
+from sqlalchemy import and_, func, or_, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .config import settings
+from .instrumentation import track_external
+from .models import Appointment, NotificationOutbox
+from .notification_service import NotificationService
+from .smtp_mailer import (
+    build_account_created_email,
+    build_cancellation_email,
+    build_rescheduled_email,
+    send_smtp_email,
+)
+
+logger = logging.getLogger(__name__)
+
+outbox = NotificationOutbox.__table__
+
+
+# --- Staging (caller commits) ---
+
+def enqueue_email(
+    session: AsyncSession,
+    to_email: str,
+    subject: str,
+    html: str,
+    kind: str,
+    appointment_id: Optional[int] = None,
+    batch_id: Optional[str] = None,
+) -> NotificationOutbox:
+    row = NotificationOutbox(
+        channel="email",
+        kind=kind,
+        recipient=to_email,
+        subject=subject,
+        body=html,
+        appointment_id=appointment_id,
+        batch_id=batch_id,
+    )
+    session.add(row)
+    return row
+
+
+def enqueue_sms(
+    session: AsyncSession,
+    to_phone: str,
+    message: str,
+    kind: str,
+    appointment_id: Optional[int] = None,
+    batch_id: Optional[str] = None,
+) -> NotificationOutbox:
+    row = NotificationOutbox(
+        channel="sms",
+        kind=kind,
+        recipient=to_phone,
+        body=message,
+        appointment_id=appointment_id,
+        batch_id=batch_id,
+    )
+    session.add(row)
+    return row
+
+
+def stage_booking_confirmation(
+    session: AsyncSession,
+    appt: Appointment,
+    patient_email: str,
+    patient_phone: str,
+    patient_name: str,
+    provider_name: str,
+) -> None:
+    sms_message, subject, html = NotificationService.build_booking_confirmation(
+        patient_name, appt.start_time, provider_name
+    )
+    if patient_phone:
+        enqueue_sms(session, patient_phone, sms_message, "booking_confirmation", appt.id)
+    enqueue_email(session, patient_email, subject, html, "booking_confirmation", appt.id)
+
+
+def stage_reschedule(
+    session: AsyncSession,
+    appt: Appointment,
+    patient_email: str,
+    patient_name: str,
+    old_date: datetime,
+    provider_name: str,
+    batch_id: Optional[str] = None,
+) -> None:
+    subject, html = build_rescheduled_email(
+        patient_name,
+        old_date.strftime("%B %d, %Y"),
+        old_date.strftime("%I:%M %p"),
+        appt.start_time.strftime("%B %d, %Y"),
+        appt.start_time.strftime("%I:%M %p"),
+        provider_name,
+    )
+    enqueue_email(session, patient_email, subject, html, "rescheduling", appt.id, batch_id)
+
+
+def stage_cancellation(
+    session: AsyncSession,
+    appt: Appointment,
+    patient_email: str,
+    patient_name: str,
+    provider_name: str,
+    batch_id: Optional[str] = None,
+) -> None:
+    subject, html = build_cancellation_email(
+        patient_name,
+        appt.start_time.strftime("%B %d, %Y"),
+        appt.start_time.strftime("%I:%M %p"),
+        provider_name,
+    )
+    enqueue_email(session, patient_email, subject, html, "cancellation", appt.id, batch_id)
+
+
+def stage_account_created(session: AsyncSession, to_email: str, name: str) -> None:
+    subject, html = build_account_created_email(name)
+    enqueue_email(session, to_email, subject, html, "account_created")
+
+
+async def batch_progress(session: AsyncSession, batch_id: str) -> dict:
+    """Delivery counts for the notifications of one bulk operation."""
+    stmt = (
+        select(outbox.c.status, func.count())
+        .where(outbox.c.batch_id == batch_id)
+        .group_by(outbox.c.status)
+    )
+    counts = {status: count for status, count in (await session.exec(stmt)).all()}
+    total = sum(counts.values())
+    sent = counts.get("sent", 0)
+    failed = counts.get("failed", 0)
+    return {
+        "batch_id": batch_id,
+        "total": total,
+        "pending": counts.get("pending", 0),
+        "sending": counts.get("sending", 0),
+        "sent": sent,
+        "failed": failed,
+        "complete": total > 0 and sent + failed == total,
+    }
+
+
+# --- Delivery ---
+
+class RateLimiter:
+    """Token bucket shared by all workers in this process (0 = unlimited)."""
+
+    def __init__(self, rate_per_second: float, burst: Optional[int] = None):
+        self.rate = rate_per_second
+        self.capacity = burst or max(int(rate_per_second), 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class NotificationDispatcher:
+    """
+    Drains the outbox with a few asyncio workers.
+
+    Rows are claimed with a single UPDATE (status pending -> sending plus a
+    claim token), so several workers or processes never deliver the same
+    row. Rows left in 'sending' by a crashed worker become claimable again
+    after NOTIFICATION_CLAIM_TIMEOUT_SECONDS.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        batch_size: int = 20,
+        poll_seconds: float = 2.0,
+        max_attempts: int = 5,
+        claim_timeout_seconds: int = 300,
+        rate_per_second: float = 0,
+    ):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.claim_timeout_seconds = claim_timeout_seconds
+        self.rate_limiter = RateLimiter(rate_per_second)
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._http: Optional[httpx.AsyncClient] = None
+
+    def _get_http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(base_url=settings.TWILIO_API_BASE, timeout=10.0)
+        return self._http
+
+    def _claimable(self, now: datetime):
+        return or_(
+            and_(outbox.c.status == "pending", outbox.c.available_at <= now),
+            and_(
+                outbox.c.status == "sending",
+                outbox.c.claimed_at < now - timedelta(seconds=self.claim_timeout_seconds),
+            ),
+        )
+
+    async def claim_batch(self, db_engine) -> list:
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+        candidates = (
+            select(outbox.c.id)
+            .where(self._claimable(now))
+            .order_by(outbox.c.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(outbox)
+            .where(outbox.c.id.in_(candidates.scalar_subquery()), self._claimable(now))
+            .values(
+                status="sending",
+                claim_token=token,
+                claimed_at=now,
+                attempts=outbox.c.attempts + 1,
+            )
+        )
+        async with db_engine.begin() as conn:
+            await conn.execute(stmt)
+            result = await conn.execute(select(outbox).where(outbox.c.claim_token == token))
+            return result.mappings().all()
+
+    async def send_sms(self, to_phone: str, message: str) -> None:
+        if settings.TWILIO_TEST_MODE.lower() == "true":
+            logger.info(f"[TEST MODE SMS] To: {to_phone} | Message: {message}")
+            return
+        if not (settings.TWILIO_ACCOUNT_SID and settings.TWILIO_AUTH_TOKEN):
+            raise RuntimeError("Twilio credentials not configured")
+
+        with track_external("twilio"):
+            response = await self._get_http().post(
+                f"/2010-04-01/Accounts/{settings.TWILIO_ACCOUNT_SID}/Messages.json",
+                auth=(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN),
+                data={"To": to_phone, "From": settings.TWILIO_PHONE_NUMBER, "Body": message},
+            )
+        response.raise_for_status()
+
+    async def send_email(self, to_email: str, subject: str, html: str) -> None:
+        # smtplib is blocking; keep it off the event loop
+        if not await asyncio.to_thread(send_smtp_email, to_email, subject, html):
+            raise RuntimeError("SMTP delivery failed")
+
+    async def _deliver(self, row) -> Optional[str]:
+        await self.rate_limiter.acquire()
+        try:
+            if row["channel"] == "sms":
+                await self.send_sms(row["recipient"], row["body"])
+            else:
+                await self.send_email(row["recipient"], row["subject"], row["body"])
+            return None
+        except Exception as e:
+            logger.error(f"Notification {row['id']} ({row['kind']}/{row['channel']}) failed: {e}")
+            return str(e)[:500]
+
+    def _backoff(self, attempts: int) -> timedelta:
+        return timedelta(seconds=min(30 * 2 ** (attempts - 1), 3600))
+
+    async def _finish(self, db_engine, rows: list, errors: list) -> None:
+        now = datetime.utcnow()
+        async with db_engine.begin() as conn:
+            for row, error in zip(rows, errors):
+                if error is None:
+                    values = {"status": "sent", "sent_at": now, "last_error": None}
+                elif row["attempts"] >= self.max_attempts:
+                    values = {"status": "failed", "last_error": error}
+                else:
+                    values = {
+                        "status": "pending",
+                        "available_at": now + self._backoff(row["attempts"]),
+                        "last_error": error,
+                    }
+                await conn.execute(
+                    update(outbox)
+                    .where(outbox.c.id == row["id"], outbox.c.claim_token == row["claim_token"])
+                    .values(claim_token=None, **values)
+                )
+
+    async def drain_once(self, db_engine=None) -> int:
+        """Claim and deliver one batch; returns the number of rows handled."""
+        if db_engine is None:
+            from .database import async_engine as db_engine
+
+        rows = await self.claim_batch(db_engine)
+        if not rows:
+            return 0
+        errors = await asyncio.gather(*(self._deliver(row) for row in rows))
+        await self._finish(db_engine, rows, errors)
+        return len(rows)
+
+    def wake(self) -> None:
+        """Nudge idle workers after committing new outbox rows."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                handled = await self.drain_once()
+            except Exception as e:
+                logger.error(f"Notification dispatcher error: {e}")
+                handled = 0
+            if handled:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self._wakeup = None
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+# Singleton instance
+notification_dispatcher = NotificationDispatcher(
+    workers=settings.NOTIFICATION_WORKERS,
+    batch_size=settings.NOTIFICATION_BATCH_SIZE,
+    poll_seconds=settings.NOTIFICATION_POLL_SECONDS,
+    max_attempts=settings.NOTIFICATION_MAX_ATTEMPTS,
+    claim_timeout_seconds=settings.NOTIFICATION_CLAIM_TIMEOUT_SECONDS,
+    rate_per_second=settings.NOTIFICATION_RATE_PER_SECOND,
+)
@@ -17,8 +17,6 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 import logging
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
@@ -63,7 +61,13 @@ class NotificationService:
         else:
             logger.warning("SendGrid API key not found. Email notifications disabled.")
 
-        # Initialize scheduler
+        # Job scheduler; started by the elected scheduler leader, not on import
+        self.scheduler = None
+
+    def start_scheduler(self):
+        """Start the APScheduler job store (one instance per deployment)"""
+        if self.scheduler is not None:
+            return
         jobstores = {
             'default': SQLAlchemyJobStore(url='sqlite:///jobs.sqlite')
         }
@@ -114,17 +118,14 @@ class NotificationService:
                 logger.error(f"Failed to send email: {str(e)}")
                 return False
 
-    async def send_booking_confirmation(
-        self,
-        patient_phone: str,
-        patient_email: str,
+    @staticmethod
+    def build_booking_confirmation(
         patient_name: str,
         appointment_date: datetime,
         provider_name: str
-    ) -> dict:
-        """Send booking confirmation via SMS and Email"""
+    ) -> tuple:
+        """(sms_message, email_subject, email_html) for a new booking"""
         date_str = appointment_date.strftime("%B %d, %Y at %I:%M %p")
-        masked_provider = provider_name.split()[0][0] + "***" if provider_name else "your provider"
 
         sms_message = (
             f"EasyAPT: Your appointment is confirmed for {date_str}. "
@@ -148,77 +149,49 @@ class NotificationService:
             </body>
         </html>
         """
+        return sms_message, email_subject, email_html
+
+    async def send_booking_confirmation(
+        self,
+        patient_phone: str,
+        patient_email: str,
+        patient_name: str,
+        appointment_date: datetime,
+        provider_name: str
+    ) -> dict:
+        """Send booking confirmation via SMS and Email"""
+        sms_message, email_subject, email_html = self.build_booking_confirmation(
+            patient_name, appointment_date, provider_name
+        )
 
         sms_sent = await self.send_sms(patient_phone, sms_message)
         email_sent = await self.send_email(patient_email, email_subject, email_html)
 
+        # The reminder itself is sent by the reminder sweeper
         reminder_time = appointment_date - timedelta(hours=24)
         reminder_scheduled_flag = reminder_time > datetime.now()
 
-        if reminder_scheduled_flag:
-            self.schedule_reminder(
-                patient_phone, patient_email, patient_name,
-                appointment_date, masked_provider, reminder_time
-            )
-
         return {
             "sms_sent": sms_sent,
             "email_sent": email_sent,
             "reminder_scheduled": reminder_scheduled_flag
         }
 
-    def schedule_reminder(self, patient_phone, patient_email, patient_name, appointment_date, provider_name, reminder_time):
-        """Schedule a reminder notification. Returns job_id (str) or None."""
-        job_id = f"reminder_{appointment_date.isoformat()}_{patient_email}"
-        try:
-            self.scheduler.add_job(
-                self.send_appointment_reminder,
-                'date',
-                run_date=reminder_time,
-                args=[patient_phone, patient_email, patient_name, appointment_date, provider_name],
-                id=job_id,
-                replace_existing=True
-            )
-            logger.info(f"Reminder scheduled for {reminder_time} | job_id={job_id}")
-            return job_id
-        except Exception as e:
-            logger.error(f"Failed to schedule reminder: {str(e)}")
-            return None
-
-    def cancel_reminder(self, job_id: str) -> bool:
-        """Cancel an existing scheduled reminder job by job_id."""
-        try:
-            self.scheduler.remove_job(job_id)
-            logger.info(f"Cancelled reminder job: {job_id}")
-            return True
-        except Exception as e:
-            logger.warning(f"Could not cancel reminder job (maybe not found): {job_id} | {e}")
-            return False
-
-    async def send_appointment_reminder(
-        self,
-        patient_phone,
-        patient_email,
-        patient_name,
-        appointment_date,
-        provider_name
-    ):
-
-        """Send appointment reminder via SMS and Email"""
-
+    @staticmethod
+    def build_appointment_reminder(
+        patient_name: str,
+        appointment_date: datetime,
+        provider_name: Optional[str]
+    ) -> tuple:
+        """(sms_message, email_subject, email_html) for a 24h reminder"""
         date_str = appointment_date.strftime("%B %d, %Y at %I:%M %p")
         provider_display = provider_name if provider_name else "your provider"
 
-        # --- SMS Logic ---
         sms_message = (
             f"EasyAPT Reminder: You have an appointment on {date_str} "
             f"with {provider_display}. Reply STOP to unsubscribe."
         )
-        sms_sent = False
-        if patient_phone:
-            sms_sent = await self.send_sms(patient_phone, sms_message)
 
-        # --- Email Logic ---
         email_subject = "Appointment Reminder - EasyAPT"
         email_html = f"""
         <html>
@@ -236,21 +209,38 @@ class NotificationService:
             </body>
         </html>
         """
+        return sms_message, email_subject, email_html
+
+    async def send_appointment_reminder(
+        self,
+        patient_phone,
+        patient_email,
+        patient_name,
+        appointment_date,
+        provider_name
+    ):
+
+        """Send appointment reminder via SMS and Email"""
+
+        sms_message, email_subject, email_html = self.build_appointment_reminder(
+            patient_name, appointment_date, provider_name
+        )
+
+        sms_sent = False
+        if patient_phone:
+            sms_sent = await self.send_sms(patient_phone, sms_message)
+
         email_sent = False
         if patient_email:
             email_sent = await self.send_email(patient_email, email_subject, email_html)
 
         logger.info(
             f"Reminder sent. SMS={sms_sent}, Email={email_sent}, "
-            f"User={patient_name}, Time={date_str}"
+            f"User={patient_name}, Time={appointment_date}"
         )
 
         return { "sms_sent": sms_sent, "email_sent": email_sent }
 
-    def shutdown(self):
-        """Gracefully shutdown the scheduler"""
-        self.scheduler.shutdown()
-
     async def send_cancellation_email(
         self,
         patient_email: str,
@@ -322,7 +312,9 @@ class NotificationService:
 
     def shutdown(self):
         """Gracefully shutdown the scheduler"""
-        self.scheduler.shutdown()
+        if self.scheduler is not None:
+            self.scheduler.shutdown(wait=False)
+            self.scheduler = None
 
 # Singleton instance
 notification_service = NotificationService()
@@ -0,0 +1,86 @@
+"""
+Keyset pagination for EasyApt listings
+Pages are addressed by an opaque cursor holding the sort key of the last row
+returned, so fetching page N costs the same index range scan as page 1.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Generic, List, Optional, Sequence, Tuple, TypeVar
+
+from fastapi import HTTPException, Query, status
+from pydantic import BaseModel
+from sqlalchemy import and_, or_
+
+T = TypeVar("T")
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
+class PageParams:
+    """Query parameters shared by every paginated listing (?limit=&after=)."""
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+        after: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    ):
+        self.limit = limit
+        self.after = after
+
+
+def encode_cursor(sort_value: datetime, row_id: int) -> str:
+    raw = json.dumps([sort_value.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor.",
+        )
+
+
+def paginate(stmt, sort_column, id_column, page: PageParams, descending: bool = False):
+    """
+    Order stmt by (sort_column, id_column), start after page.after and fetch
+    one extra row to learn whether another page exists.
+    """
+    if page.after:
+        sort_value, row_id = decode_cursor(page.after)
+        if descending:
+            stmt = stmt.where(or_(
+                sort_column < sort_value,
+                and_(sort_column == sort_value, id_column < row_id),
+            ))
+        else:
+            stmt = stmt.where(or_(
+                sort_column > sort_value,
+                and_(sort_column == sort_value, id_column > row_id),
+            ))
+    if descending:
+        stmt = stmt.order_by(sort_column.desc(), id_column.desc())
+    else:
+        stmt = stmt.order_by(sort_column, id_column)
+    return stmt.limit(page.limit + 1)
+
+
+def page_of(rows: Sequence, page: PageParams, key) -> Tuple[list, Optional[str]]:
+    """Trim the look-ahead row and build next_cursor from key(last_row)."""
+    rows = list(rows)
+    if len(rows) <= page.limit:
+        return rows, None
+    rows = rows[:page.limit]
+    return rows, encode_cursor(*key(rows[-1]))
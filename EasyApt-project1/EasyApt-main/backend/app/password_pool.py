@@ -0,0 +1,132 @@
+"""
+Password hashing worker pool for EasyApt
+Argon2 hashing and verification take tens of milliseconds of CPU each, so
+they run on a bounded thread pool instead of the event loop. When every
+worker is busy and the queue is full, callers are rejected immediately
+rather than piling up behind each other.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from .config import settings
+
+
+class PasswordHashPoolSaturated(Exception):
+    """All workers are busy and the wait queue is full."""
+    pass
+
+
+class PasswordHashMetrics:
+    """Counters for hash latency, queue wait and rejections."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.completed = 0
+            self.rejected = 0
+            self.run_seconds_total = 0.0
+            self.run_seconds_max = 0.0
+            self.queue_wait_seconds_total = 0.0
+            self.queue_wait_seconds_max = 0.0
+
+    def record(self, queue_wait: float, run: float):
+        with self._lock:
+            self.completed += 1
+            self.run_seconds_total += run
+            self.run_seconds_max = max(self.run_seconds_max, run)
+            self.queue_wait_seconds_total += queue_wait
+            self.queue_wait_seconds_max = max(self.queue_wait_seconds_max, queue_wait)
+
+    def record_rejection(self):
+        with self._lock:
+            self.rejected += 1
+
+
+class PasswordHashPool:
+    """
+    Runs password hash/verify calls on max_workers threads. At most
+    max_queue further calls may wait for a free worker; beyond that,
+    run() raises PasswordHashPoolSaturated.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 32):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.metrics = PasswordHashMetrics()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="password-hash",
+            )
+        return self._executor
+
+    async def run(self, fn: Callable, *args):
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.metrics.record_rejection()
+                raise PasswordHashPoolSaturated()
+            self._in_flight += 1
+            executor = self._get_executor()
+
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                self.metrics.record(started - submitted, time.perf_counter() - started)
+
+        try:
+            future = executor.submit(timed)
+        except Exception:
+            self._done()
+            raise
+        # Counted until the job itself finishes: a cancelled caller leaves
+        # its job queued or running, and it still occupies the pool
+        future.add_done_callback(self._done)
+        return await asyncio.wrap_future(future)
+
+    def _done(self, future=None) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        m = self.metrics
+        completed = max(m.completed, 1)
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "completed_total": m.completed,
+            "rejected_total": m.rejected,
+            "hash_seconds_avg": round(m.run_seconds_total / completed, 6),
+            "hash_seconds_max": round(m.run_seconds_max, 6),
+            "queue_wait_seconds_avg": round(m.queue_wait_seconds_total / completed, 6),
+            "queue_wait_seconds_max": round(m.queue_wait_seconds_max, 6),
+        }
+
+
+# Singleton instance
+password_hash_pool = PasswordHashPool(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+)
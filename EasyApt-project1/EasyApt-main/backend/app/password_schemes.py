@@ -0,0 +1,77 @@
+"""
+Password hash scheme registry for EasyApt
+Stored hashes carry their scheme in a modular-crypt prefix, so verification
+dispatches on the prefix instead of trying each scheme in turn. Argon2 is
+the current scheme; pbkdf2_sha256 hashes from the original CryptContext are
+verified and then upgraded on the next successful login.
+"""
+
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHash, VerificationError, VerifyMismatchError
+from passlib.hash import pbkdf2_sha256
+
+CURRENT_SCHEME = "argon2"
+
+ph = PasswordHasher()
+
+
+@dataclass(frozen=True)
+class HashScheme:
+    name: str
+    prefix: str
+    verify: Callable[[str, str], bool]
+
+
+def _verify_argon2(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return ph.verify(hashed_password, plain_password)
+    except (VerifyMismatchError, VerificationError, InvalidHash):
+        return False
+
+
+def _verify_pbkdf2_sha256(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return pbkdf2_sha256.verify(plain_password, hashed_password)
+    except ValueError:
+        return False
+
+
+SCHEMES = (
+    HashScheme("argon2", "$argon2", _verify_argon2),
+    HashScheme("pbkdf2_sha256", "$pbkdf2-sha256$", _verify_pbkdf2_sha256),
+)
+
+
+def identify_scheme(hashed_password: Optional[str]) -> Optional[HashScheme]:
+    if not hashed_password:
+        return None
+    for scheme in SCHEMES:
+        if hashed_password.startswith(scheme.prefix):
+            return scheme
+    return None
+
+
+def hash_password(password: str) -> str:
+    return ph.hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """One verification with the scheme named by the hash prefix."""
+    scheme = identify_scheme(hashed_password)
+    if scheme is None:
+        return False
+    return scheme.verify(plain_password, hashed_password)
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True for legacy schemes and Argon2 hashes with outdated parameters."""
+    scheme = identify_scheme(hashed_password)
+    if scheme is None or scheme.name != CURRENT_SCHEME:
+        return True
+    try:
+        return ph.check_needs_rehash(hashed_password)
+    except InvalidHash:
+        return True
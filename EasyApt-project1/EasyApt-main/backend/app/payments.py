@@ -2,68 +2,142 @@
 Stripe payment integration for EasyApt
 """
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from pydantic import BaseModel
-import stripe
 
 from .config import settings
-from .database import get_session
-from .auth import get_current_user
-from .models import User, Provider, Appointment
+from .database import get_async_session
+from .auth import get_current_principal
+from .principal import Principal
+from .response_cache import cached_json
+from .models import Provider, PendingPaymentIntent
+from .stripe_client import StripeError, idempotency_key, stripe_client
+
+# Stripe keeps idempotency keys for 24 hours; reuse our record for as long
+PENDING_INTENT_TTL = timedelta(hours=24)
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
+# Intents Stripe can replay for a key that can no longer be paid
+FINISHED_INTENT_STATUSES = ("succeeded", "canceled")
+MAX_FINISHED_REPLAYS = 5
 
 router = APIRouter(prefix="/payments", tags=["payments"])
 
 class CreatePaymentIntent(BaseModel):
     provider_id: int
-    start_time: str
-    end_time: str
+    start_time: datetime
+    end_time: datetime
 
 class PaymentIntentResponse(BaseModel):
     client_secret: str
     amount: float
     provider_name: str
 
+
+async def _pending_intent(session: AsyncSession, key: str):
+    stmt = select(PendingPaymentIntent).where(PendingPaymentIntent.idempotency_key == key)
+    pending = (await session.exec(stmt)).first()
+    if pending is not None and pending.created_at < datetime.utcnow() - PENDING_INTENT_TTL:
+        await session.delete(pending)
+        await session.commit()
+        return None
+    return pending
+
+
+async def clear_pending_intents(session: AsyncSession, patient_id: int, provider_id: int, start_time: datetime) -> None:
+    """Forget the checkout for a slot once it is booked (caller commits)."""
+    await session.exec(delete(PendingPaymentIntent).where(
+        PendingPaymentIntent.patient_id == patient_id,
+        PendingPaymentIntent.provider_id == provider_id,
+        PendingPaymentIntent.start_time == start_time.isoformat(),
+    ))
+
+
 @router.post("/create-payment-intent", response_model=PaymentIntentResponse)
-def create_payment_intent(
+async def create_payment_intent(
     payment_data: CreatePaymentIntent,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
-    Create a Stripe payment intent for appointment booking
+    Create a Stripe payment intent for appointment booking.
+    Retries for the same patient, provider, slot and fee return the
+    intent already created instead of making a new one, until the slot is
+    booked.
     """
     # Get provider and their fee
-    provider = session.get(Provider, payment_data.provider_id)
+    provider = await session.get(Provider, payment_data.provider_id)
     if not provider:
         raise HTTPException(status_code=404, detail="Provider not found")
     
     amount = provider.consultation_fee
+    amount_cents = int(amount * 100)  # Stripe uses cents
+    start_time = payment_data.start_time.isoformat()
+    end_time = payment_data.end_time.isoformat()
     
-    # Create Stripe payment intent
-    try:
-        intent = stripe.PaymentIntent.create(
-            amount=int(amount * 100),  # Stripe uses cents
-            currency="usd",
-            metadata={
-                "provider_id": str(provider.id),
-                "patient_id": str(current_user.id),
-                "start_time": payment_data.start_time,
-                "end_time": payment_data.end_time
-            }
-        )
-        
+    key = idempotency_key(current_user.id, provider.id, start_time, end_time, amount_cents)
+    pending = await _pending_intent(session, key)
+    if pending is not None:
         return PaymentIntentResponse(
-            client_secret=intent.client_secret,
-            amount=amount,
+            client_secret=pending.client_secret,
+            amount=pending.amount,
             provider_name=provider.name
         )
-    except Exception as e:
+    
+    # Create Stripe payment intent; the Idempotency-Key makes Stripe itself
+    # return the same intent if two retries race past the lookup above
+    try:
+        for _ in range(MAX_FINISHED_REPLAYS):
+            intent = await stripe_client.create_payment_intent(
+                amount_cents=amount_cents,
+                currency="usd",
+                metadata={
+                    "provider_id": str(provider.id),
+                    "patient_id": str(current_user.id),
+                    "start_time": start_time,
+                    "end_time": end_time
+                },
+                idempotency_key=key,
+            )
+            if intent.get("status") not in FINISHED_INTENT_STATUSES:
+                break
+            # Stripe replayed the intent of a checkout that was already
+            # paid (e.g. the slot was booked, cancelled and is paid again)
+            key = idempotency_key(current_user.id, provider.id, start_time, end_time, amount_cents, after=intent["id"])
+        else:
+            raise StripeError("Too many completed payments for this slot; please try again later.")
+    except StripeError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    
+    session.add(PendingPaymentIntent(
+        idempotency_key=key,
+        patient_id=current_user.id,
+        provider_id=provider.id,
+        start_time=start_time,
+        stripe_intent_id=intent["id"],
+        client_secret=intent["client_secret"],
+        amount=amount,
+    ))
+    try:
+        await session.commit()
+    except IntegrityError:
+        # A concurrent retry recorded the same intent first
+        await session.rollback()
+    
+    return PaymentIntentResponse(
+        client_secret=intent["client_secret"],
+        amount=amount,
+        provider_name=provider.name
+    )
 
 @router.get("/publishable-key")
-def get_publishable_key():
+async def get_publishable_key(request: Request):
     """Return Stripe publishable key for frontend"""
-    return {"publishable_key": settings.STRIPE_PUBLISHABLE_KEY}
+    async def build():
+        return {"publishable_key": settings.STRIPE_PUBLISHABLE_KEY}
+    return await cached_json(request, "payments", "publishable-key", build, max_age=3600)
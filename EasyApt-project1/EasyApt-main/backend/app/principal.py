@@ -0,0 +1,90 @@
+"""
+Authenticated principal cache for EasyApt
+Most routers only need the caller's id, email and role. Caching those per
+user id lets get_current_principal resolve a bearer token without loading
+the user row on every request.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from .config import settings
+from .models import User
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Read-only snapshot of the user fields routers depend on."""
+    id: int
+    email: str
+    role: str
+    two_factor_enabled: bool
+    # Stored last_active when the snapshot was taken; inactivity fallback only
+    last_active: Optional[datetime] = None
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            role=user.role,
+            two_factor_enabled=user.two_factor_enabled,
+            last_active=user.last_active,
+        )
+
+
+class PrincipalCache:
+    """
+    Bounded LRU of user id -> Principal with a per-entry TTL.
+
+    Entries are dropped explicitly when role, password or 2FA settings change;
+    the TTL bounds staleness for changes made by another worker.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: int = 60):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, tuple[float, Principal]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or time.monotonic() - entry[0] >= self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, principal: Principal) -> None:
+        with self._lock:
+            self._entries[principal.id] = (time.monotonic(), principal)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: Optional[int] = None) -> None:
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Singleton instance
+principal_cache = PrincipalCache(
+    max_size=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
@@ -1,12 +1,17 @@
+import logging
 from datetime import date
 from typing import Optional
 
 from fastapi import APIRouter, Depends
-from sqlmodel import SQLModel, Session, select
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from .database import get_session
-from .models import PatientProfile, User
-from .auth import get_current_user
+from .database import get_async_session
+from .models import PatientProfile
+from .auth import get_current_principal
+from .principal import Principal
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -40,30 +45,31 @@ class PatientProfileUpdate(SQLModel):
     emergency_contact_phone: Optional[str] = None
 
 @router.get("/me", response_model=Optional[PatientProfileRead])
-def get_my_profile(
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+async def get_my_profile(
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_principal),
 ):
     """
     Get the current logged-in patient's profile.
     Returns null if no profile exists yet.
     """
     statement = select(PatientProfile).where(PatientProfile.user_id == current_user.id)
-    return session.exec(statement).first()
+    return (await session.exec(statement)).first()
 
 
 @router.put("/me", response_model=PatientProfileRead)
-def upsert_my_profile(
+async def upsert_my_profile(
     profile_in: PatientProfileUpdate,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_principal),
 ):
     """
     Create or update the current patient's profile.
     """
     statement = select(PatientProfile).where(PatientProfile.user_id == current_user.id)
-    profile = session.exec(statement).first()
-    print(f" Received profile data: {profile_in.model_dump()}")
+    profile = (await session.exec(statement)).first()
+    # Field names only; the values are medical data
+    logger.debug("Profile update", extra={"user_id": current_user.id, "fields": sorted(profile_in.model_dump(exclude_unset=True))})
     if profile is None:
         # Create new profile with all fields
         profile = PatientProfile(
@@ -95,6 +101,6 @@ def upsert_my_profile(
         profile.emergency_contact_name = profile_in.emergency_contact_name
         profile.emergency_contact_phone = profile_in.emergency_contact_phone
     
-    session.commit()
-    session.refresh(profile)
+    await session.commit()
+    await session.refresh(profile)
     return profile
@@ -0,0 +1,104 @@
+"""
+Provider search for EasyApt
+Matches every typed word as a prefix against name, specialty and location
+and returns the best-ranked providers first. The heavy lifting is done by
+the database's own index (see PROVIDER_*_DDL in models.py):
+  - PostgreSQL: pg_trgm GIN index, ranked by trigram similarity
+  - SQLite: FTS5 table, ranked by bm25 with name weighted highest
+"""
+
+import re
+from typing import List
+
+from sqlalchemy import column, func, literal_column, or_, table, text
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .models import PROVIDER_SEARCH_EXPR, Provider
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 50
+
+# bm25 column weights for (name, specialty, location)
+FTS_WEIGHTS = (10.0, 3.0, 1.0)
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+provider_fts = table("provider_fts", column("rowid"))
+search_expr = literal_column(PROVIDER_SEARCH_EXPR)
+
+
+def tokenize(query: str) -> List[str]:
+    return _TOKEN.findall(query.lower())
+
+
+def fts_match_query(tokens: List[str]) -> str:
+    # Each word quoted (no FTS operators from user input), '*' for prefix match
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def _like_escape(token: str) -> str:
+    return token.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _sqlite_search(tokens: List[str], limit: int):
+    # Rank and limit inside the FTS table first; only the top rows join provider
+    score = literal_column(f"bm25(provider_fts, {', '.join(str(w) for w in FTS_WEIGHTS)})")
+    ranked = (
+        select(provider_fts.c.rowid.label("provider_id"), score.label("score"))
+        .select_from(provider_fts)
+        .where(text("provider_fts MATCH :match").bindparams(match=fts_match_query(tokens)))
+        .order_by(score)
+        .limit(limit)
+        .subquery()
+    )
+    return (
+        select(Provider)
+        .join(ranked, ranked.c.provider_id == Provider.id)
+        .order_by(ranked.c.score, Provider.name)
+    )
+
+
+def _postgres_search(tokens: List[str], limit: int):
+    # Same expression as the GIN index, so every match is an index probe.
+    # "\m" anchors at the start of a word: the same prefix match as FTS5.
+    query = " ".join(tokens)
+    stmt = select(Provider)
+    for token in tokens:
+        stmt = stmt.where(search_expr.op("~")(rf"\m{re.escape(token)}"))
+    return (
+        stmt.order_by(
+            func.lower(Provider.name).like(f"{_like_escape(tokens[0])}%", escape="\\").desc(),
+            func.similarity(search_expr, query).desc(),
+            Provider.name,
+        )
+        .limit(limit)
+    )
+
+
+def _fallback_search(tokens: List[str], limit: int):
+    stmt = select(Provider)
+    for token in tokens:
+        pattern = f"%{token}%"
+        stmt = stmt.where(or_(
+            Provider.name.ilike(pattern),
+            Provider.specialty.ilike(pattern),
+            Provider.location.ilike(pattern),
+        ))
+    return stmt.order_by(Provider.name).limit(limit)
+
+
+async def search_providers(session: AsyncSession, query: str, limit: int = DEFAULT_SEARCH_LIMIT) -> List[Provider]:
+    tokens = tokenize(query)
+    if not tokens:
+        stmt = select(Provider).order_by(Provider.name).limit(limit)
+        return (await session.exec(stmt)).all()
+
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        stmt = _sqlite_search(tokens, limit)
+    elif dialect == "postgresql":
+        stmt = _postgres_search(tokens, limit)
+    else:
+        stmt = _fallback_search(tokens, limit)
+    return (await session.exec(stmt)).all()
@@ -0,0 +1,157 @@
+"""
+Appointment reminder sweeper for EasyApt
+Instead of one scheduler job per booking, a single loop wakes on a fixed
+tick, finds booked appointments whose reminder window has opened and
+stages their reminders in the notification outbox in batches.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .config import settings
+from .models import Appointment, PatientProfile, Provider, User
+from .notification_outbox import enqueue_email, enqueue_sms, notification_dispatcher
+from .notification_service import NotificationService
+from .smtp_mailer import build_reminder_emails
+
+logger = logging.getLogger(__name__)
+
+
+class ReminderSweeper:
+    """
+    Every interval_seconds, marks due appointments with reminder_sent_at and
+    stages their reminder email/SMS, batch_size appointments per transaction.
+
+    Due means: booked, reminder_sent_at is NULL and start_time falls within
+    the next lead_hours. The marker is set with a conditional UPDATE, so
+    overlapping sweeps never remind the same appointment twice.
+    """
+
+    def __init__(self, lead_hours: int = 24, interval_seconds: int = 60, batch_size: int = 200):
+        self.lead_hours = lead_hours
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    async def _sweep_batch(self, session: AsyncSession, now: datetime) -> int:
+        due = (
+            select(Appointment.id)
+            .where(
+                Appointment.status == "booked",
+                Appointment.reminder_sent_at.is_(None),
+                Appointment.start_time > now,
+                Appointment.start_time <= now + timedelta(hours=self.lead_hours),
+            )
+            .order_by(Appointment.start_time)
+            .limit(self.batch_size)
+        )
+        due_ids = (await session.exec(due)).all()
+        if not due_ids:
+            return 0
+
+        claimed = await session.exec(
+            update(Appointment)
+            .where(Appointment.id.in_(due_ids), Appointment.reminder_sent_at.is_(None))
+            .values(reminder_sent_at=now)
+            .returning(Appointment.id)
+        )
+        claimed_ids = claimed.scalars().all()
+        if not claimed_ids:
+            await session.commit()
+            return len(due_ids)
+
+        stmt = (
+            select(
+                Appointment.id,
+                Appointment.start_time,
+                User.email,
+                PatientProfile.full_name,
+                PatientProfile.phone,
+                Provider.name,
+            )
+            .join(User, User.id == Appointment.patient_id)
+            .join(Provider, Provider.id == Appointment.provider_id)
+            .outerjoin(PatientProfile, PatientProfile.user_id == Appointment.patient_id)
+            .where(Appointment.id.in_(claimed_ids))
+        )
+        recipients = []
+        for appt_id, start_time, email, full_name, phone, provider_name in (await session.exec(stmt)).all():
+            masked_provider = provider_name.split()[0][0] + "***" if provider_name else "your provider"
+            recipients.append({
+                "appointment_id": appt_id,
+                "email": email,
+                "phone": phone,
+                "start_time": start_time,
+                "patient_name": full_name or email.split('@')[0],
+                "appointment_date": start_time.strftime("%B %d, %Y"),
+                "appointment_time": start_time.strftime("%I:%M %p"),
+                "provider_name": masked_provider,
+            })
+
+        emails = build_reminder_emails(
+            {field: r[field] for field in ("patient_name", "appointment_date", "appointment_time", "provider_name")}
+            for r in recipients
+        )
+        for r, (subject, html) in zip(recipients, emails):
+            if r["phone"]:
+                sms_message, _, _ = NotificationService.build_appointment_reminder(
+                    r["patient_name"], r["start_time"], r["provider_name"]
+                )
+                enqueue_sms(session, r["phone"], sms_message, "appointment_reminder", r["appointment_id"])
+            enqueue_email(session, r["email"], subject, html, "appointment_reminder", r["appointment_id"])
+
+        await session.commit()
+        return len(due_ids)
+
+    async def sweep_once(self, db_engine=None) -> int:
+        """Stage reminders for every due appointment; returns how many were scanned."""
+        if db_engine is None:
+            from .database import async_engine as db_engine
+
+        now = datetime.utcnow()
+        total = 0
+        async with AsyncSession(db_engine, expire_on_commit=False) as session:
+            while True:
+                found = await self._sweep_batch(session, now)
+                total += found
+                if found < self.batch_size:
+                    break
+        if total:
+            logger.info(f"Reminder sweep staged reminders for {total} appointments")
+            notification_dispatcher.wake()
+        return total
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sweep_once()
+            except Exception as e:
+                logger.error(f"Reminder sweep failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Singleton instance
+reminder_sweeper = ReminderSweeper(
+    lead_hours=settings.REMINDER_LEAD_HOURS,
+    interval_seconds=settings.REMINDER_SWEEP_INTERVAL_SECONDS,
+    batch_size=settings.REMINDER_BATCH_SIZE,
+)
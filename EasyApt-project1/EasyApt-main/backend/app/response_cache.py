@@ -0,0 +1,318 @@
+"""
+Response cache for EasyApt
+Read-mostly endpoints (provider list and search, chatbot health, Stripe
+publishable key) are serialized once and served from an in-process LRU until
+their TTL runs out or their namespace is invalidated. Responses carry an
+ETag, so browsers revalidate with If-None-Match and get a bodiless 304.
+
+Setting RESPONSE_CACHE_DIR shares entries and invalidations between the
+worker processes on one host through that directory.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from .config import settings
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+    expires_at: float  # time.time()
+
+
+class DirectoryBackend:
+    """
+    Entries and namespace generations as small files in a shared directory.
+    Writes go through a temp file and os.replace, so readers never see a
+    partial entry.
+
+    Expired entries are deleted when read, and every sweep_interval seconds
+    (or after max_entries writes) a sweep drops the expired and
+    old-generation ones, then the soonest-expiring past max_entries.
+    """
+
+    def __init__(self, directory: str, max_entries: int = 1024, sweep_interval: float = 60.0):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        os.makedirs(directory, exist_ok=True)
+        self._generations: Dict[str, Tuple[Tuple[int, int, int], int]] = {}  # namespace -> (stat, generation)
+        self._writes = 0
+        self._last_sweep = time.monotonic()
+        self._sweep_lock = threading.Lock()
+
+    def _path(self, prefix: str, name: str) -> str:
+        return os.path.join(self.directory, prefix + hashlib.sha256(name.encode()).hexdigest())
+
+    def _write(self, path: str, data: str) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        with os.fdopen(fd, "w") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        path = self._path("e-", key)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data["expires_at"] <= time.time():
+            self._remove(path)
+            return None
+        return CachedResponse(data["body"].encode(), data["etag"], data["expires_at"])
+
+    def set(self, key: str, entry: CachedResponse) -> None:
+        self._write(self._path("e-", key), json.dumps({
+            "key": key,
+            "body": entry.body.decode(),
+            "etag": entry.etag,
+            "expires_at": entry.expires_at,
+        }))
+        self._writes += 1
+        if self._writes >= self.max_entries or time.monotonic() - self._last_sweep >= self.sweep_interval:
+            self.sweep()
+
+    def generation(self, namespace: str) -> int:
+        # os.replace gives every bump a new inode, so an unchanged stat means
+        # the cached value is still current and the file need not be read
+        path = self._path("g-", namespace)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return 0
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        cached = self._generations.get(namespace)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        try:
+            with open(path) as f:
+                generation = int(f.read() or 0)
+        except (OSError, ValueError):
+            return 0
+        self._generations[namespace] = (stamp, generation)
+        return generation
+
+    def bump(self, namespace: str) -> int:
+        # A fresh timestamp instead of read-increment-write: two workers
+        # bumping at once each write a value no older entry was keyed with
+        generation = max(time.time_ns(), self.generation(namespace) + 1)
+        self._write(self._path("g-", namespace), str(generation))
+        return generation
+
+    def sweep(self) -> int:
+        """Delete expired and old-generation entries; returns how many were removed."""
+        if not self._sweep_lock.acquire(blocking=False):
+            return 0
+        try:
+            self._writes = 0
+            self._last_sweep = time.monotonic()
+            now = time.time()
+            removed = 0
+            live = []
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if name.startswith(".tmp-"):
+                    # Left behind by a writer that died mid-write
+                    try:
+                        stale = os.stat(path).st_mtime < now - self.sweep_interval
+                    except OSError:
+                        continue
+                    if stale:
+                        self._remove(path)
+                    continue
+                if not name.startswith("e-"):
+                    continue
+                try:
+                    with open(path) as f:
+                        data = json.load(f)
+                    namespace, generation, _ = data["key"].split(":", 2)
+                    current = int(generation) == self.generation(namespace)
+                    expires_at = data["expires_at"]
+                except (OSError, ValueError, KeyError):
+                    continue
+                if current and expires_at > now:
+                    live.append((expires_at, path))
+                else:
+                    self._remove(path)
+                    removed += 1
+            live.sort()
+            for _, path in live[:max(0, len(live) - self.max_entries)]:
+                self._remove(path)
+                removed += 1
+            return removed
+        finally:
+            self._sweep_lock.release()
+
+
+class ResponseCache:
+    """
+    Bounded LRU of serialized JSON responses with a per-entry TTL.
+
+    Keys are scoped by namespace and the namespace's generation; invalidate()
+    bumps the generation, which orphans every older entry at once (they age
+    out of the LRU).
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: int = 60, backend: Optional[DirectoryBackend] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    def _generation(self, namespace: str) -> int:
+        if self.backend is not None:
+            return self.backend.generation(namespace)
+        return self._generations.get(namespace, 0)
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{namespace}:{self._generation(namespace)}:{key}"
+
+    def get(self, namespace: str, key: str) -> Optional[CachedResponse]:
+        full_key = self._key(namespace, key)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is not None and entry.expires_at <= now:
+                del self._entries[full_key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(full_key)
+                self.hits += 1
+                return entry
+
+        if self.backend is not None:
+            entry = self.backend.get(full_key)
+            if entry is not None:
+                self._store(full_key, entry)
+                with self._lock:
+                    self.hits += 1
+                return entry
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _store(self, full_key: str, entry: CachedResponse) -> None:
+        with self._lock:
+            self._entries[full_key] = entry
+            self._entries.move_to_end(full_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def put(self, namespace: str, key: str, body: bytes, ttl_seconds: Optional[int] = None) -> CachedResponse:
+        entry = CachedResponse(
+            body=body,
+            etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+            expires_at=time.time() + (ttl_seconds or self.ttl_seconds),
+        )
+        full_key = self._key(namespace, key)
+        self._store(full_key, entry)
+        if self.backend is not None:
+            self.backend.set(full_key, entry)
+        return entry
+
+    def invalidate(self, namespace: str) -> None:
+        """Drop every cached response in a namespace (call after its data changes)."""
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            self.invalidations += 1
+        if self.backend is not None:
+            self.backend.bump(namespace)
+
+    def record_not_modified(self) -> None:
+        with self._lock:
+            self.not_modified += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+            self.hits = self.misses = self.not_modified = self.invalidations = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "not_modified": self.not_modified,
+                "invalidations": self.invalidations,
+                "shared_backend": self.backend.directory if self.backend else None,
+            }
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in (tag.strip() for tag in header.split(","))
+
+
+async def cached_json(
+    request: Request,
+    namespace: str,
+    key: str,
+    build: Callable[[], Awaitable],
+    max_age: int,
+    private: bool = False,
+) -> Response:
+    """
+    Serve build()'s JSON from the cache (or cache it), with ETag and
+    Cache-Control headers; answer 304 when the client's copy is current.
+    private=True keeps shared proxies from storing responses behind auth.
+    """
+    entry = response_cache.get(namespace, key)
+    if entry is None:
+        payload = jsonable_encoder(await build())
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        entry = response_cache.put(namespace, key, body)
+
+    headers = {
+        "ETag": entry.etag,
+        "Cache-Control": f"{'private' if private else 'public'}, max-age={max_age}",
+    }
+    if _etag_matches(request, entry.etag):
+        response_cache.record_not_modified()
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+# Singleton instance
+response_cache = ResponseCache(
+    max_size=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+    backend=(
+        DirectoryBackend(settings.RESPONSE_CACHE_DIR, max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES)
+        if settings.RESPONSE_CACHE_DIR else None
+    ),
+)
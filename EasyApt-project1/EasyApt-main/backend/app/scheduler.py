@@ -0,0 +1,166 @@
+"""
+Background scheduler leadership for EasyApt
+Every web worker (or a standalone `python -m app.scheduler` process) competes
+for a lease row in the database. Only the current holder runs the job
+scheduler and the reminder sweeper, so adding workers does not multiply
+background load or fire jobs twice.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import insert, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from .config import settings
+from .models import SchedulerLease
+from .notification_service import notification_service
+from .reminders import reminder_sweeper
+
+logger = logging.getLogger(__name__)
+
+lease_table = SchedulerLease.__table__
+
+
+class LeaderLease:
+    """
+    Time-bounded lease stored in the scheduler_lease table. A holder keeps
+    it by renewing before expires_at; anyone may take it once it lapses.
+    """
+
+    def __init__(self, name: str, ttl_seconds: int = 30, holder_id: Optional[str] = None):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.holder_id = holder_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    async def acquire_or_renew(self, db_engine) -> bool:
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl_seconds)
+        async with db_engine.begin() as conn:
+            result = await conn.execute(
+                update(lease_table)
+                .where(
+                    lease_table.c.name == self.name,
+                    or_(lease_table.c.holder == self.holder_id, lease_table.c.expires_at < now),
+                )
+                .values(holder=self.holder_id, expires_at=expires_at)
+            )
+            if result.rowcount:
+                return True
+        try:
+            async with db_engine.begin() as conn:
+                await conn.execute(
+                    insert(lease_table).values(name=self.name, holder=self.holder_id, expires_at=expires_at)
+                )
+            return True
+        except IntegrityError:
+            # Row exists and someone else holds an unexpired lease
+            return False
+
+    async def release(self, db_engine) -> None:
+        async with db_engine.begin() as conn:
+            await conn.execute(
+                update(lease_table)
+                .where(lease_table.c.name == self.name, lease_table.c.holder == self.holder_id)
+                .values(expires_at=datetime.utcnow())
+            )
+
+
+class SchedulerRunner:
+    """
+    Renews the lease every ttl/3 seconds and starts or stops the leader-only
+    jobs (APScheduler, reminder sweeper) as leadership changes hands.
+    """
+
+    def __init__(self, lease: LeaderLease):
+        self.lease = lease
+        self.is_leader = False
+        self._task: Optional[asyncio.Task] = None
+
+    def _elected(self) -> None:
+        logger.info(f"Scheduler leadership acquired by {self.lease.holder_id}")
+        notification_service.start_scheduler()
+        reminder_sweeper.start()
+
+    async def _demoted(self) -> None:
+        logger.info(f"Scheduler leadership released by {self.lease.holder_id}")
+        await reminder_sweeper.stop()
+        notification_service.shutdown()
+
+    async def tick(self, db_engine=None) -> bool:
+        if db_engine is None:
+            from .database import async_engine as db_engine
+
+        try:
+            leader = await self.lease.acquire_or_renew(db_engine)
+        except Exception as e:
+            # Can't prove we still hold the lease; stand down until we can
+            logger.error(f"Scheduler lease renewal failed: {e}")
+            leader = False
+
+        if leader and not self.is_leader:
+            self.is_leader = True
+            self._elected()
+        elif not leader and self.is_leader:
+            self.is_leader = False
+            await self._demoted()
+        return leader
+
+    async def _run(self) -> None:
+        while True:
+            await self.tick()
+            await asyncio.sleep(max(self.lease.ttl_seconds / 3, 1))
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self, db_engine=None) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.is_leader:
+            self.is_leader = False
+            await self._demoted()
+            if db_engine is None:
+                from .database import async_engine as db_engine
+            try:
+                await self.lease.release(db_engine)
+            except Exception as e:
+                logger.error(f"Failed to release scheduler lease: {e}")
+
+
+# Singleton instance
+scheduler_runner = SchedulerRunner(LeaderLease("background-scheduler", settings.SCHEDULER_LEASE_SECONDS))
+
+
+async def run_standalone() -> None:
+    """Dedicated scheduler process: leader-only jobs plus an outbox worker."""
+    from .database import init_db
+    from .notification_outbox import notification_dispatcher
+
+    init_db()
+    scheduler_runner.start()
+    notification_dispatcher.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await notification_dispatcher.stop()
+        await scheduler_runner.stop()
+
+
+if __name__ == "__main__":
+    # Run with RUN_SCHEDULER_IN_WEB=false on the web workers
+    try:
+        asyncio.run(run_standalone())
+    except KeyboardInterrupt:
+        pass
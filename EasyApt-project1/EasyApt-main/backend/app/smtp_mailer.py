@@ -1,5 +1,8 @@
+import logging
 import smtplib
 import os
+import threading
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
@@ -9,27 +12,207 @@ from .email_templates import (
     get_appointment_reminder_email,
     get_appointment_rescheduled_email,
     get_account_created_email,
+    render_batch,
 )
+from .instrumentation import track_external
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPPoolExhausted(Exception):
+    """No SMTP connection became free within the acquire timeout."""
+    pass
+
+
+class SMTPConnectionPool:
+    """
+    Thread-safe pool of logged-in SMTP connections.
+
+    At most max_connections sessions are open at once. Idle connections are
+    reused most-recent-first; ones idle longer than noop_after are probed
+    with NOOP before reuse. A reaper timer closes connections idle longer
+    than idle_timeout, so the server never has to drop them on us.
+    A send that hits a dropped or closing (421) session discards it,
+    reconnects once and retries.
+    """
+
+    def __init__(self, max_connections=4, idle_timeout=60.0, noop_after=10.0, acquire_timeout=30.0):
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.noop_after = noop_after
+        self.acquire_timeout = acquire_timeout
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._idle = []  # [(connection, last_used)]
+        self._lock = threading.Lock()
+        self._reaper = None  # threading.Timer while idle connections exist
+        self.connects = 0
+        self.reuses = 0
+        self.reaped = 0
+
+    def _connect(self):
+        from .config import settings
+
+        host = settings.MAILTRAP_HOST or 'sandbox.smtp.mailtrap.io'
+        port = int(settings.MAILTRAP_PORT) if settings.MAILTRAP_PORT else 2525
+        server = smtplib.SMTP(host, port, timeout=30)
+        try:
+            server.starttls()  # Enable TLS encryption
+            server.login(settings.MAILTRAP_USERNAME, settings.MAILTRAP_PASSWORD)
+        except Exception:
+            self._close(server)
+            raise
+        with self._lock:
+            self.connects += 1
+        return server
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _is_alive(server):
+        try:
+            return server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _checkout(self):
+        """Pop a usable idle connection, or open a new one."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                server, last_used = self._idle.pop()
+            idle_for = time.monotonic() - last_used
+            if idle_for > self.idle_timeout:
+                self._close(server)
+                continue
+            if idle_for > self.noop_after and not self._is_alive(server):
+                self._close(server)
+                continue
+            with self._lock:
+                self.reuses += 1
+            return server
+        return self._connect()
+
+    def _checkin(self, server):
+        with self._lock:
+            self._idle.append((server, time.monotonic()))
+            self._schedule_reaper()
+
+    def _schedule_reaper(self):
+        # Caller holds self._lock
+        if self._reaper is None and self._idle:
+            self._reaper = threading.Timer(max(self.idle_timeout / 2, 1.0), self._reap)
+            self._reaper.daemon = True
+            self._reaper.start()
+
+    def reap_idle(self):
+        """Close connections idle longer than idle_timeout; returns how many."""
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            expired = [server for server, last_used in self._idle if last_used < cutoff]
+            self._idle = [(server, last_used) for server, last_used in self._idle if last_used >= cutoff]
+            self.reaped += len(expired)
+        for server in expired:
+            self._close(server)
+        return len(expired)
+
+    def _reap(self):
+        self.reap_idle()
+        with self._lock:
+            self._reaper = None
+            self._schedule_reaper()
+
+    @staticmethod
+    def _session_lost(error):
+        # 421: the server is closing the transmission channel
+        if isinstance(error, smtplib.SMTPResponseException):
+            return error.smtp_code == 421
+        return isinstance(error, (smtplib.SMTPServerDisconnected, ConnectionError))
+
+    def sendmail(self, from_addr, to_addrs, msg):
+        with track_external("smtp"):
+            self._sendmail(from_addr, to_addrs, msg)
+
+    def _sendmail(self, from_addr, to_addrs, msg):
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise SMTPPoolExhausted(f"No SMTP connection free after {self.acquire_timeout}s")
+        try:
+            server = self._checkout()
+            try:
+                server.sendmail(from_addr, to_addrs, msg)
+            except Exception as e:
+                if not self._session_lost(e):
+                    if isinstance(e, (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException)):
+                        # Message-level rejection; the session itself is still good
+                        self._checkin(server)
+                    else:
+                        self._close(server)
+                    raise
+                # Server dropped or is closing a kept-alive session; reconnect once
+                self._close(server)
+                server = self._connect()
+                try:
+                    server.sendmail(from_addr, to_addrs, msg)
+                except Exception:
+                    self._close(server)
+                    raise
+            self._checkin(server)
+        finally:
+            self._slots.release()
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+            if self._reaper is not None:
+                self._reaper.cancel()
+                self._reaper = None
+        for server, _ in idle:
+            self._close(server)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_connections": self.max_connections,
+                "idle": len(self._idle),
+                "connects_total": self.connects,
+                "reuses_total": self.reuses,
+                "reaped_total": self.reaped,
+            }
+
+
+def _build_pool():
+    from .config import settings
+
+    return SMTPConnectionPool(
+        max_connections=settings.SMTP_POOL_MAX_CONNECTIONS,
+        idle_timeout=settings.SMTP_POOL_IDLE_TIMEOUT_SECONDS,
+        noop_after=settings.SMTP_POOL_NOOP_AFTER_SECONDS,
+        acquire_timeout=settings.SMTP_POOL_ACQUIRE_TIMEOUT_SECONDS,
+    )
+
+
+smtp_pool = _build_pool()
 
 
 def send_smtp_email(to_email, subject, html_content):
-    """Send email via SMTP (Gmail/Yahoo)"""
+    """Send email via SMTP (Gmail/Yahoo) over a pooled connection"""
     
     # === CHANGED: Use settings instead of os.getenv ===
     from .config import settings
     
     # DEMO MODE: simulate email sending (no SMTP)
     if settings.MAILTRAP_MODE.lower() == "true":
-        print("[DEMO MODE] Email simulated")
-        print("To:", to_email)
-        print("Subject:", subject)
+        logger.info("[DEMO MODE] Email simulated", extra={"to": to_email, "subject": subject})
         return True
     
-    # === CHANGED: Use settings for all SMTP config ===
-    host = settings.MAILTRAP_HOST or 'sandbox.smtp.mailtrap.io'
-    port = int(settings.MAILTRAP_PORT) if settings.MAILTRAP_PORT else 2525
-    username = settings.MAILTRAP_USERNAME
-    password = settings.MAILTRAP_PASSWORD
     from_email = settings.SENDGRID_FROM_EMAIL
     
     msg = MIMEMultipart('alternative')
@@ -41,15 +224,11 @@ def send_smtp_email(to_email, subject, html_content):
     msg.attach(html_part)
     
     try:
-        server = smtplib.SMTP(host, port)
-        server.starttls()  # Enable TLS encryption
-        server.login(username, password)
-        server.sendmail(from_email, to_email, msg.as_string())
-        server.quit()
-        print(f"✅ Email sent successfully to {to_email}")
+        smtp_pool.sendmail(from_email, to_email, msg.as_string())
+        logger.info("Email sent", extra={"to": to_email})
         return True
     except Exception as e:
-        print(f"❌ SMTP Error: {e}")
+        logger.error(f"SMTP error: {e}", extra={"to": to_email})
         return False
 
 
@@ -59,20 +238,35 @@ def send_confirmation_email(to_email, patient_name, appointment_date, appointmen
     return send_smtp_email(to_email, subject, html)
 
 
-def send_cancellation_email(to_email, patient_name, appointment_date, appointment_time, provider_name):
+def build_cancellation_email(patient_name, appointment_date, appointment_time, provider_name):
+    """(subject, html) for a cancellation notice."""
     html = get_appointment_cancellation_email(patient_name, appointment_date, appointment_time, provider_name)
     subject = f"❌ Appointment Cancelled - {appointment_date}"
+    return subject, html
+
+
+def send_cancellation_email(to_email, patient_name, appointment_date, appointment_time, provider_name):
+    subject, html = build_cancellation_email(patient_name, appointment_date, appointment_time, provider_name)
     return send_smtp_email(to_email, subject, html)
 
 
+def build_reminder_emails(rows):
+    """
+    [(subject, html)] for many reminders at once. Each row has patient_name,
+    appointment_date, appointment_time and provider_name.
+    """
+    rows = list(rows)
+    htmls = render_batch("appointment_reminder", rows)
+    return [(f"⏰ Appointment Reminder - {row['appointment_date']}", html) for row, html in zip(rows, htmls)]
+
+
 def send_reminder_email(to_email, patient_name, appointment_date, appointment_time, provider_name):
     html = get_appointment_reminder_email(patient_name, appointment_date, appointment_time, provider_name)
     subject = f"⏰ Appointment Reminder - {appointment_date}"
     return send_smtp_email(to_email, subject, html)
 
 
-def send_rescheduled_email(
-    to_email,
+def build_rescheduled_email(
     patient_name,
     old_date,
     old_time,
@@ -80,6 +274,7 @@ def send_rescheduled_email(
     new_time,
     provider_name
 ):
+    """(subject, html) for a reschedule notice."""
     html = get_appointment_rescheduled_email(
         patient_name,
         old_date,
@@ -89,10 +284,34 @@ def send_rescheduled_email(
         provider_name
     )
     subject = f"📅 Appointment Rescheduled - {new_date}"
+    return subject, html
+
+
+def send_rescheduled_email(
+    to_email,
+    patient_name,
+    old_date,
+    old_time,
+    new_date,
+    new_time,
+    provider_name
+):
+    subject, html = build_rescheduled_email(
+        patient_name,
+        old_date,
+        old_time,
+        new_date,
+        new_time,
+        provider_name
+    )
     return send_smtp_email(to_email, subject, html)
 
 
+def build_account_created_email(name):
+    """(subject, html) for the welcome email."""
+    return "🎉 Welcome to EasyAPT!", get_account_created_email(name)
+
+
 def send_account_created_email(to_email, name):
-    html = get_account_created_email(name)
-    subject = "🎉 Welcome to EasyAPT!"
+    subject, html = build_account_created_email(name)
     return send_smtp_email(to_email, subject, html)
@@ -0,0 +1,184 @@
+"""
+Static frontend pipeline for EasyApt
+The frontend is read once at startup: CSS/JS get content-hashed URLs under
+/assets/ (cached as immutable), HTML pages are rewritten to point at them,
+and every file is precompressed with gzip (and brotli when installed).
+Requests are answered from memory with ETags and 304s.
+
+`python -m app.static_assets build` writes the same hashed, precompressed
+files plus a manifest to frontend/dist for a front proxy to serve directly.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+ASSET_DIRS = ("css", "js")
+ASSETS_PREFIX = "/assets"
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# URL path -> HTML file in the frontend directory
+PAGES = {
+    "/": "index.html",
+    "/login.html": "login.html",
+    "/register.html": "register.html",
+    "/profile.html": "profile.html",
+    "/appointments.html": "appointments.html",
+    "/book-appointment.html": "book-appointment.html",
+    "/provider-dashboard.html": "provider-dashboard.html",
+    "/chatbot.html": "chatbot.html",
+    "/transactions.html": "transactions.html",
+    "/payment-checkout.html": "payment-checkout.html",
+}
+
+_COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+
+@dataclass(frozen=True)
+class StaticFile:
+    media_type: str
+    body: bytes
+    etag: str
+    cache_control: str
+    gzip: Optional[bytes] = None
+    br: Optional[bytes] = None
+
+
+def _media_type(name: str) -> str:
+    if name.endswith(".js"):
+        return "application/javascript"
+    return mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+def _digest(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+def _compile(name: str, body: bytes, cache_control: str) -> StaticFile:
+    media_type = _media_type(name)
+    compressed = {}
+    if media_type.startswith(_COMPRESSIBLE) and len(body) > 256:
+        compressed["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+        if brotli is not None:
+            compressed["br"] = brotli.compress(body, quality=11)
+    if media_type.startswith("text/"):
+        media_type += "; charset=utf-8"
+    return StaticFile(media_type, body, f'"{_digest(body)[:20]}"', cache_control, **compressed)
+
+
+def _hashed_name(rel_path: str, body: bytes) -> str:
+    path = Path(rel_path)
+    return str(path.with_name(f"{path.stem}.{_digest(body)[:10]}{path.suffix}"))
+
+
+def _rewrite_references(html: str, manifest: Dict[str, str]) -> str:
+    # "/css/styles.css", "css/styles.css" and "./js/api.js" all name the same file
+    for rel_path, url in manifest.items():
+        pattern = re.compile(r"""(["'])(?:\./|/)?""" + re.escape(rel_path) + r"\1")
+        html = pattern.sub(lambda m: f"{m.group(1)}{url}{m.group(1)}", html)
+    return html
+
+
+class StaticSite:
+    """In-memory, precompressed copy of the frontend directory."""
+
+    def __init__(self, frontend_dir: Path):
+        self.frontend_dir = Path(frontend_dir)
+        self.manifest: Dict[str, str] = {}  # "css/styles.css" -> "/assets/css/styles.<hash>.css"
+        self.assets: Dict[str, StaticFile] = {}  # hashed URL -> file
+        self.sources: Dict[str, StaticFile] = {}  # "css/styles.css" -> file (unhashed URL)
+        self.pages: Dict[str, StaticFile] = {}  # route path -> rewritten HTML
+        self.load()
+
+    def load(self) -> None:
+        manifest, assets, sources = {}, {}, {}
+        for directory in ASSET_DIRS:
+            for path in sorted((self.frontend_dir / directory).rglob("*")):
+                if not path.is_file() or "Zone.Identifier" in path.name:
+                    continue
+                rel_path = path.relative_to(self.frontend_dir).as_posix()
+                body = path.read_bytes()
+                url = f"{ASSETS_PREFIX}/{_hashed_name(rel_path, body)}"
+                manifest[rel_path] = url
+                assets[url] = _compile(rel_path, body, IMMUTABLE)
+                sources[rel_path] = _compile(rel_path, body, REVALIDATE)
+
+        pages = {}
+        for route, filename in PAGES.items():
+            html = (self.frontend_dir / filename).read_text(encoding="utf-8")
+            pages[route] = _compile(filename, _rewrite_references(html, manifest).encode(), REVALIDATE)
+
+        self.manifest, self.assets, self.sources, self.pages = manifest, assets, sources, pages
+
+    def build(self, out_dir: Path) -> None:
+        """Write hashed assets, their .gz/.br variants and manifest.json."""
+        out_dir = Path(out_dir)
+        for url, asset in self.assets.items():
+            # Same path as the URL the pages reference: dist/assets/css/...
+            target = out_dir / url.lstrip("/")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(asset.body)
+            if asset.gzip is not None:
+                target.with_name(target.name + ".gz").write_bytes(asset.gzip)
+            if asset.br is not None:
+                target.with_name(target.name + ".br").write_bytes(asset.br)
+        for route, page in self.pages.items():
+            target = out_dir / PAGES[route]
+            target.write_bytes(page.body)
+            if page.gzip is not None:
+                target.with_name(target.name + ".gz").write_bytes(page.gzip)
+        (out_dir / "manifest.json").write_text(json.dumps(self.manifest, indent=2))
+
+
+def _accepted_encodings(request: Request) -> set:
+    accepted = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+def file_response(request: Request, file: StaticFile) -> Response:
+    """Pick the best precompressed variant and answer 304 on a matching ETag."""
+    accepted = _accepted_encodings(request)
+    body, encoding, etag = file.body, None, file.etag
+    if file.br is not None and "br" in accepted:
+        body, encoding, etag = file.br, "br", f'{file.etag[:-1]}-br"'
+    elif file.gzip is not None and "gzip" in accepted:
+        body, encoding, etag = file.gzip, "gzip", f'{file.etag[:-1]}-gz"'
+
+    headers = {"ETag": etag, "Cache-Control": file.cache_control}
+    if file.gzip is not None:
+        headers["Vary"] = "Accept-Encoding"
+    if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=file.media_type, headers=headers)
+
+
+if __name__ == "__main__":
+    # python -m app.static_assets build [out_dir]
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        sys.exit("usage: python -m app.static_assets build [out_dir]")
+    frontend = Path(__file__).parent.parent.parent / "frontend"
+    out = Path(sys.argv[2]) if len(sys.argv) > 2 else frontend / "dist"
+    site = StaticSite(frontend)
+    site.build(out)
+    print(f"Built {len(site.assets)} assets and {len(site.pages)} pages into {out}")
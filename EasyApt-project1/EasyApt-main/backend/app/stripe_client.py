@@ -0,0 +1,153 @@
+"""
+Async Stripe API client for EasyApt
+Talks to the Stripe REST API over one shared httpx.AsyncClient, so
+PaymentIntent calls reuse pooled keep-alive connections instead of going
+through the blocking stripe-python SDK on the threadpool.
+STRIPE_API_BASE can point at stripe_stub.py for local load tests.
+"""
+
+import hashlib
+import threading
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from .config import settings
+from .instrumentation import track_external
+
+API_VERSION = "2024-06-20"
+
+
+class StripeError(Exception):
+    """Stripe rejected the request or could not be reached."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def idempotency_key(
+    patient_id: int,
+    provider_id: int,
+    start_time: str,
+    end_time: str,
+    amount_cents: int,
+    after: Optional[str] = None,
+) -> str:
+    """
+    One key per checkout: the same patient paying the same amount for the
+    same slot. after is the id of an intent the key already produced that
+    is finished (paid or cancelled), which yields the key for the next one.
+    """
+    raw = f"{patient_id}:{provider_id}:{start_time}:{end_time}:{amount_cents}"
+    if after:
+        raw += f":{after}"
+    return "easyapt-" + hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _form_fields(prefix: str, values: Dict[str, str]) -> Dict[str, str]:
+    # Stripe takes nested parameters as metadata[key]=value form fields
+    return {f"{prefix}[{key}]": str(value) for key, value in values.items()}
+
+
+class StripeClient:
+    """
+    Shared connection pool to the Stripe API. The httpx client is created on
+    first use and closed on shutdown.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        api_base: str,
+        timeout: float = 20.0,
+        max_connections: int = 20,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.api_key = api_key
+        self.api_base = api_base.rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.seconds_total = 0.0
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.api_base,
+                auth=(self.api_key or "", ""),
+                headers={"Stripe-Version": API_VERSION},
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                transport=self.transport,
+            )
+        return self._client
+
+    async def _post(self, path: str, data: Dict[str, str], idempotency_key: Optional[str] = None) -> dict:
+        headers = {"Idempotency-Key": idempotency_key} if idempotency_key else {}
+        started = time.perf_counter()
+        try:
+            with track_external("stripe"):
+                response = await self._http().post(path, data=data, headers=headers)
+        except httpx.HTTPError as e:
+            self._record(started, error=True)
+            raise StripeError(f"Could not reach Stripe: {e}") from e
+
+        self._record(started, error=response.status_code >= 400)
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        if response.status_code >= 400:
+            message = body.get("error", {}).get("message") or f"Stripe returned {response.status_code}"
+            raise StripeError(message, status_code=response.status_code)
+        return body
+
+    def _record(self, started: float, error: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            self.seconds_total += time.perf_counter() - started
+            if error:
+                self.errors += 1
+
+    async def create_payment_intent(
+        self,
+        amount_cents: int,
+        currency: str,
+        metadata: Dict[str, str],
+        idempotency_key: Optional[str] = None,
+    ) -> dict:
+        data = {"amount": str(amount_cents), "currency": currency, **_form_fields("metadata", metadata)}
+        return await self._post("/v1/payment_intents", data, idempotency_key=idempotency_key)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "api_base": self.api_base,
+                "max_connections": self.max_connections,
+                "requests": self.requests,
+                "errors": self.errors,
+                "avg_seconds": round(self.seconds_total / self.requests, 4) if self.requests else None,
+            }
+
+
+# Singleton instance
+stripe_client = StripeClient(
+    api_key=settings.STRIPE_SECRET_KEY,
+    api_base=settings.STRIPE_API_BASE,
+    timeout=settings.STRIPE_TIMEOUT_SECONDS,
+    max_connections=settings.STRIPE_MAX_CONNECTIONS,
+)
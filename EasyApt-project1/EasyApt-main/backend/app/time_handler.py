@@ -51,21 +51,33 @@ class TimeHandler:
             return False, "Cannot schedule appointments more than 1 year in advance"
         return True, None
     
+    @staticmethod
+    def merge_intervals(intervals: List[Tuple[datetime, datetime]]) -> List[Tuple[datetime, datetime]]:
+        merged: List[Tuple[datetime, datetime]] = []
+        for start, end in sorted(intervals):
+            if merged and start <= merged[-1][1]:
+                if end > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+        return merged
+    
     @staticmethod
     def generate_available_slots(start_time: datetime, end_time: datetime, slot_duration_minutes: int = 30, break_times: Optional[List[Tuple[datetime, datetime]]] = None) -> List[datetime]:
+        # Single sweep over merged breaks: O(n + m) instead of checking every
+        # slot against every break.
         slots = []
+        busy = TimeHandler.merge_intervals(break_times) if break_times else []
         current_time = start_time
         slot_delta = timedelta(minutes=slot_duration_minutes)
+        i = 0
         while current_time + slot_delta <= end_time:
-            is_available = True
-            if break_times:
-                for break_start, break_end in break_times:
-                    if current_time < break_end and current_time + slot_delta > break_start:
-                        is_available = False
-                        break
-            if is_available:
+            slot_end = current_time + slot_delta
+            while i < len(busy) and busy[i][1] <= current_time:
+                i += 1
+            if i == len(busy) or busy[i][0] >= slot_end:
                 slots.append(current_time)
-            current_time += slot_delta
+            current_time = slot_end
         return slots
     
     @staticmethod
@@ -2,25 +2,35 @@
 Transaction routes for EasyApt
 """
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from typing import List
-from .database import get_session
-from .auth import get_current_user
-from .models import User, Transaction
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from .database import get_async_session
+from .auth import get_current_principal
+from .principal import Principal
+from .models import Transaction
+from .pagination import Page, PageParams, page_of, paginate
+from .ledger import daily_summary, user_summary
 
 router = APIRouter(prefix="/transactions", tags=["transactions"])
 
-@router.get("/my", response_model=List[dict])
-def get_my_transactions(
-    current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+@router.get("/my", response_model=Page[dict])
+async def get_my_transactions(
+    page: PageParams = Depends(),
+    current_user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_async_session)
 ):
-    """Get all transactions for current user"""
-    stmt = select(Transaction).where(Transaction.user_id == current_user.id).order_by(Transaction.created_at.desc())
-    transactions = session.exec(stmt).all()
+    """Get the current user's transactions, newest first, one page at a time"""
+    stmt = select(Transaction).where(Transaction.user_id == current_user.id)
+    stmt = paginate(stmt, Transaction.created_at, Transaction.id, page, descending=True)
+    transactions, next_cursor = page_of(
+        (await session.exec(stmt)).all(), page, lambda t: (t.created_at, t.id)
+    )
     
-    return [
+    items = [
         {
             "id": t.id,
             "amount": t.amount,
@@ -31,3 +41,31 @@ def get_my_transactions(
         }
         for t in transactions
     ]
+    return Page(items=items, next_cursor=next_cursor)
+
+@router.get("/summary")
+async def get_transaction_summary(
+    scope: str = Query("mine", pattern="^(mine|all)$"),
+    start: Optional[date] = Query(None, description="First UTC day (scope=all)"),
+    end: Optional[date] = Query(None, description="Last UTC day (scope=all)"),
+    current_user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Totals by status and type, read from the ledger rollups.
+    scope=mine (default) covers the current user's transactions; staff and
+    admins can ask for scope=all, broken down per day (last 30 days unless
+    start/end are given).
+    """
+    if scope == "mine":
+        return await user_summary(session, current_user.id)
+    
+    if current_user.role not in ("staff", "admin"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only staff can view ledger-wide totals.",
+        )
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=29)
+    summary = await daily_summary(session, start, end)
+    return {"start": start, "end": end, **summary}
@@ -0,0 +1,177 @@
+"""
+Microbenchmark: compiled email templates vs the previous f-string builders
+
+Renders the appointment reminder for N recipients both ways and reports
+per-email time and output size.
+
+Usage:
+    python benchmark_email_templates.py --recipients 5000
+"""
+
+import argparse
+import time
+
+from app.email_templates import get_appointment_reminder_email, render_batch
+
+
+def legacy_reminder_email(patient_name, appointment_date, appointment_time, provider_name):
+    """Baseline f-string builder, as it was before compiled templates"""
+    
+    html = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0;">
+    </head>
+    <body style="margin: 0; padding: 0; font-family: 'Segoe UI', Arial, sans-serif; background-color: #f4f7fa;">
+        <table width="100%" cellpadding="0" cellspacing="0" border="0" style="background-color: #f4f7fa; padding: 40px 0;">
+            <tr>
+                <td align="center">
+                    <table width="600" cellpadding="0" cellspacing="0" border="0" style="background-color: #ffffff; border-radius: 12px; overflow: hidden; box-shadow: 0 4px 12px rgba(0,0,0,0.1);">
+                        
+                        <!-- Header -->
+                        <tr>
+                            <td style="background: linear-gradient(135deg, #f6ad55 0%, #ed8936 100%); padding: 40px 30px; text-align: center;">
+                                <h1 style="margin: 0; color: #ffffff; font-size: 32px; font-weight: 700;">
+                                    🏥 EasyAPT
+                                </h1>
+                                <p style="margin: 10px 0 0 0; color: #ffffff; font-size: 16px; opacity: 0.9;">
+                                    Healthcare Appointment Scheduling
+                                </p>
+                            </td>
+                        </tr>
+                        
+                        <!-- Content -->
+                        <tr>
+                            <td style="padding: 40px 30px;">
+                                <h2 style="margin: 0 0 20px 0; color: #2d3748; font-size: 24px; font-weight: 600;">
+                                    ⏰ Appointment Reminder
+                                </h2>
+                                
+                                <p style="margin: 0 0 25px 0; color: #4a5568; font-size: 16px; line-height: 1.6;">
+                                    Dear <strong>{patient_name}</strong>,
+                                </p>
+                                
+                                <p style="margin: 0 0 30px 0; color: #4a5568; font-size: 16px; line-height: 1.6;">
+                                    This is a friendly reminder about your upcoming appointment:
+                                </p>
+                                
+                                <!-- Appointment Details Box -->
+                                <table width="100%" cellpadding="0" cellspacing="0" border="0" style="background-color: #fffaf0; border-radius: 8px; border-left: 4px solid #f6ad55; margin-bottom: 30px;">
+                                    <tr>
+                                        <td style="padding: 25px;">
+                                            <table width="100%" cellpadding="8" cellspacing="0" border="0">
+                                                <tr>
+                                                    <td style="color: #718096; font-size: 14px; width: 140px;">
+                                                        <strong>📅 Date:</strong>
+                                                    </td>
+                                                    <td style="color: #2d3748; font-size: 16px; font-weight: 600;">
+                                                        {appointment_date}
+                                                    </td>
+                                                </tr>
+                                                <tr>
+                                                    <td style="color: #718096; font-size: 14px;">
+                                                        <strong>⏰ Time:</strong>
+                                                    </td>
+                                                    <td style="color: #2d3748; font-size: 16px; font-weight: 600;">
+                                                        {appointment_time}
+                                                    </td>
+                                                </tr>
+                                                <tr>
+                                                    <td style="color: #718096; font-size: 14px;">
+                                                        <strong>👨‍⚕️ Provider:</strong>
+                                                    </td>
+                                                    <td style="color: #2d3748; font-size: 16px; font-weight: 600;">
+                                                        {provider_name}
+                                                    </td>
+                                                </tr>
+                                            </table>
+                                        </td>
+                                    </tr>
+                                </table>
+                                
+                                <!-- Important Notice -->
+                                <table width="100%" cellpadding="0" cellspacing="0" border="0" style="background-color: #edf2f7; border-radius: 8px; margin-bottom: 25px;">
+                                    <tr>
+                                        <td style="padding: 20px;">
+                                            <p style="margin: 0; color: #2d3748; font-size: 14px; line-height: 1.6;">
+                                                <strong>📌 Pre-Appointment Checklist:</strong><br>
+                                                • Arrive 15 minutes early<br>
+                                                • Bring insurance card and photo ID<br>
+                                                • List any medications you're currently taking<br>
+                                                • Prepare questions for your provider
+                                            </p>
+                                        </td>
+                                    </tr>
+                                </table>
+                                
+                                <p style="margin: 0 0 20px 0; color: #4a5568; font-size: 14px; line-height: 1.6;">
+                                    Need to reschedule? Contact us at <strong>(555) 123-4567</strong> or reply to this email.
+                                </p>
+                            </td>
+                        </tr>
+                        
+                        <!-- Footer -->
+                        <tr>
+                            <td style="background-color: #2d3748; padding: 30px; text-align: center;">
+                                <p style="margin: 0 0 10px 0; color: #a0aec0; font-size: 14px;">
+                                    EasyAPT Healthcare Scheduling Platform
+                                </p>
+                                <p style="margin: 0; color: #718096; font-size: 12px;">
+                                    This is an automated message. Please do not reply directly to this email.
+                                </p>
+                            </td>
+                        </tr>
+                    </table>
+                </td>
+            </tr>
+        </table>
+    </body>
+    </html>
+    """
+    return html
+
+
+def make_rows(count):
+    return [
+        {
+            "patient_name": f"Patient {i}",
+            "appointment_date": "March 14, 2026",
+            "appointment_time": f"{9 + i % 8:02d}:00 AM",
+            "provider_name": "D***",
+        }
+        for i in range(count)
+    ]
+
+
+def timed(label, fn, rows, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(rows)
+        best = min(best, time.perf_counter() - start)
+    per_email = best / len(rows) * 1e6
+    avg_size = sum(len(html.encode()) for html in out) / len(out)
+    print(f"{label:<28} {per_email:8.2f} us/email   {avg_size:8.0f} bytes/email")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark email template rendering")
+    parser.add_argument("--recipients", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.recipients)
+    print(f"Rendering {args.recipients} reminder emails (best of {args.repeat})\n")
+
+    baseline = timed("f-string builder", lambda rs: [legacy_reminder_email(**r) for r in rs], rows, args.repeat)
+    single = timed("compiled, one at a time", lambda rs: [get_appointment_reminder_email(**r) for r in rs], rows, args.repeat)
+    batch = timed("compiled, render_batch", lambda rs: render_batch("appointment_reminder", rs), rows, args.repeat)
+
+    print(f"\nrender_batch vs f-string: {baseline / batch:.2f}x time ratio")
+
+
+if __name__ == "__main__":
+    main()
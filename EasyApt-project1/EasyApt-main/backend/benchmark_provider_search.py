@@ -0,0 +1,97 @@
+"""
+Benchmark: indexed provider search vs the previous ILIKE '%q%' scan
+
+Fills a scratch SQLite database with N providers (the FTS5 index is built by
+the same DDL the app uses), then times typeahead-style queries both ways.
+
+Usage:
+    python benchmark_provider_search.py --providers 100000
+    python benchmark_provider_search.py --database-url postgresql://... --providers 100000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.database import create_async_db_engine, create_db_engine
+from app.models import Provider
+from app.provider_search import search_providers
+
+FIRST = ["Ann", "Ben", "Carla", "David", "Elena", "Farid", "Grace", "Hiro", "Imani", "Jonas", "Kira", "Luis"]
+LAST = ["Diaz", "Lee", "Smith", "Nguyen", "Okafor", "Patel", "Rossi", "Schmidt", "Tanaka", "Walker"]
+SPECIALTIES = ["Cardiology", "Dermatology", "Family Medicine", "Neurology", "Oncology", "Pediatrics", "Psychiatry"]
+CITIES = ["Springfield", "Shelbyville", "Riverside", "Fairview", "Georgetown", "Madison", "Franklin"]
+
+QUERIES = ["c", "car", "carla", "carla di", "smi", "cardio spring", "neuro", "tanaka riv"]
+
+
+def populate(sync_engine, count):
+    SQLModel.metadata.create_all(sync_engine)
+    rng = random.Random(42)
+    rows = [
+        {
+            "name": f"Dr. {rng.choice(FIRST)} {rng.choice(LAST)}{i}",
+            "specialty": rng.choice(SPECIALTIES),
+            "location": rng.choice(CITIES),
+        }
+        for i in range(count)
+    ]
+    with sync_engine.begin() as conn:
+        conn.execute(Provider.__table__.insert(), rows)
+
+
+def legacy_search(q, limit):
+    return select(Provider).where(Provider.name.ilike(f"%{q}%")).order_by(Provider.name).limit(limit)
+
+
+async def timed(label, fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = await fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"  {label:<10} {best * 1000:9.2f} ms   {len(rows):3d} rows")
+    return best
+
+
+async def run(database_url, limit, repeat):
+    engine = create_async_db_engine(database_url)
+    async with AsyncSession(engine) as session:
+        for q in QUERIES:
+            print(f"q={q!r}")
+            await timed("ILIKE", lambda: _all(session, legacy_search(q, limit)), repeat)
+            await timed("indexed", lambda: search_providers(session, q, limit), repeat)
+    await engine.dispose()
+
+
+async def _all(session, stmt):
+    return (await session.exec(stmt)).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark provider search")
+    parser.add_argument("--providers", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database-url", help="Empty database to fill (default: scratch SQLite file)")
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if database_url is None:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'search_bench.db')}"
+
+    start = time.perf_counter()
+    populate(create_db_engine(database_url), args.providers)
+    print(f"Inserted {args.providers} providers in {time.perf_counter() - start:.1f}s (best of {args.repeat})\n")
+
+    asyncio.run(run(database_url, args.limit, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
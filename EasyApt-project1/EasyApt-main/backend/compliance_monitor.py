@@ -24,6 +24,28 @@ def check_password_requirements():
         "compliant": weak_passwords == 0
     }
 
+def check_password_hash_schemes():
+    """Share of users still on the legacy pbkdf2_sha256 hash (upgraded at login)"""
+    conn = sqlite3.connect('easyapt.db')
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT COUNT(*) FROM user")
+    total_users = cursor.fetchone()[0]
+    
+    cursor.execute("SELECT COUNT(*) FROM user WHERE password_hash LIKE '$pbkdf2-sha256$%'")
+    legacy_users = cursor.fetchone()[0]
+    
+    conn.close()
+    
+    legacy_rate = (legacy_users / total_users * 100) if total_users > 0 else 0
+    
+    return {
+        "check": "Password Hash Scheme",
+        "status": "PASS" if legacy_users == 0 else "WARNING",
+        "details": f"{legacy_users}/{total_users} users ({legacy_rate:.1f}%) still on legacy pbkdf2_sha256 hashes",
+        "compliant": legacy_users == 0
+    }
+
 def check_2fa_adoption():
     """Monitor two-factor authentication adoption rate"""
     conn = sqlite3.connect('easyapt.db')
@@ -205,6 +227,7 @@ def run_compliance_checks():
     
     checks = [
         check_password_requirements(),
+        check_password_hash_schemes(),
         check_2fa_adoption(),
         check_data_integrity(),
         check_backup_compliance(),
@@ -3,15 +3,12 @@ sys.path.insert(0, '/home/mjr0315@students.ad.unt.edu/EasyApt/backend')
 
 from app.database import engine
 from app.models import User
-from passlib.context import CryptContext
+from app.auth import get_password_hash
 from sqlmodel import Session, select
 
-# Use the SAME password context as auth.py
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
-
 def fix_provider_password(email: str, new_password: str):
     """Fix the provider's password with correct hash"""
-    hashed_password = pwd_context.hash(new_password)
+    hashed_password = get_password_hash(new_password)
     
     with Session(engine) as session:
         statement = select(User).where(User.email == email)
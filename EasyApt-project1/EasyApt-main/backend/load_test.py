@@ -0,0 +1,77 @@
+"""
+Load testing script for EasyApt
+Fires concurrent requests at one endpoint and reports throughput and latency.
+
+Usage:
+    python load_test.py --url http://localhost:8000/appointments/my --token <JWT> \
+        --concurrency 50 --requests 2000
+
+Run it against a single uvicorn worker (uvicorn app.main:app --workers 1)
+to compare concurrency before and after a change.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def worker(client, url, method, headers, remaining, latencies, errors):
+    while True:
+        try:
+            remaining.pop()
+        except IndexError:
+            return
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, headers=headers)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_load_test(url, method, token, concurrency, total_requests):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    remaining = list(range(total_requests))
+    latencies = []
+    errors = []
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30.0, verify=False) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            worker(client, url, method, headers, remaining, latencies, errors)
+            for _ in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print("=" * 60)
+    print(f" Load test: {method} {url}")
+    print("=" * 60)
+    print(f" Requests:     {len(latencies)} ({len(errors)} errors)")
+    print(f" Concurrency:  {concurrency}")
+    print(f" Duration:     {elapsed:.2f}s")
+    print(f" Throughput:   {len(latencies) / elapsed:.1f} req/s")
+    if latencies:
+        print(f" Latency p50:  {statistics.median(latencies) * 1000:.1f} ms")
+        print(f" Latency p95:  {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms")
+        print(f" Latency p99:  {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms")
+        print(f" Latency max:  {latencies[-1] * 1000:.1f} ms")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="EasyApt load test")
+    parser.add_argument("--url", default="http://localhost:8000/health")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--token", default=None, help="Bearer token for authenticated endpoints")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+
+    asyncio.run(run_load_test(args.url, args.method.upper(), args.token, args.concurrency, args.requests))
@@ -0,0 +1,86 @@
+"""
+Migration script to add the booking overlap index and slot-lock table
+"""
+
+import sqlite3
+from datetime import datetime, timedelta
+
+SLOT_LOCK_MINUTES = 5
+
+def is_full_bucket(slot_start, start_time, end_time):
+    start = datetime.fromisoformat(start_time)
+    end = datetime.fromisoformat(end_time)
+    return start <= slot_start and slot_start + timedelta(minutes=SLOT_LOCK_MINUTES) <= end
+
+def migrate_database():
+    conn = sqlite3.connect('easyapt.db')
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS ix_appointment_provider_status_time
+        ON appointment (provider_id, status, start_time, end_time)
+    ''')
+    print(' Created index: ix_appointment_provider_status_time')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS appointmentslotlock (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            provider_id INTEGER NOT NULL,
+            slot_start DATETIME NOT NULL,
+            appointment_id INTEGER NOT NULL,
+            FOREIGN KEY (provider_id) REFERENCES provider(id),
+            FOREIGN KEY (appointment_id) REFERENCES appointment(id),
+            CONSTRAINT uq_slot_lock_provider_slot UNIQUE (provider_id, slot_start)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS ix_appointmentslotlock_appointment_id
+        ON appointmentslotlock (appointment_id)
+    ''')
+    print(' Created table: appointmentslotlock')
+    
+    # Only fully covered buckets are locked; drop partial-bucket locks left
+    # by earlier versions so back-to-back off-grid bookings don't collide
+    cursor.execute('''
+        SELECT l.id, l.slot_start, a.start_time, a.end_time
+        FROM appointmentslotlock l JOIN appointment a ON a.id = l.appointment_id
+    ''')
+    partial = [
+        (lock_id,)
+        for lock_id, slot_start, start_time, end_time in cursor.fetchall()
+        if not is_full_bucket(datetime.fromisoformat(slot_start), start_time, end_time)
+    ]
+    cursor.executemany('DELETE FROM appointmentslotlock WHERE id = ?', partial)
+    print(f' Removed {len(partial)} partial-bucket slot locks')
+    
+    # Backfill locks for upcoming booked appointments
+    cursor.execute('''
+        SELECT id, provider_id, start_time, end_time FROM appointment
+        WHERE status = 'booked' AND end_time > ?
+    ''', (datetime.utcnow().isoformat(sep=' '),))
+    
+    locked = 0
+    for appt_id, provider_id, start_time, end_time in cursor.fetchall():
+        start = datetime.fromisoformat(start_time)
+        end = datetime.fromisoformat(end_time)
+        current = start.replace(minute=start.minute - start.minute % SLOT_LOCK_MINUTES, second=0, microsecond=0)
+        if current < start:
+            current += timedelta(minutes=SLOT_LOCK_MINUTES)
+        while current + timedelta(minutes=SLOT_LOCK_MINUTES) <= end:
+            try:
+                cursor.execute(
+                    'INSERT INTO appointmentslotlock (provider_id, slot_start, appointment_id) VALUES (?, ?, ?)',
+                    (provider_id, current.isoformat(sep=' ', timespec='microseconds'), appt_id)
+                )
+                locked += 1
+            except sqlite3.IntegrityError:
+                print(f'⚠️ Appointment {appt_id} overlaps an existing booking at {current}')
+            current += timedelta(minutes=SLOT_LOCK_MINUTES)
+    
+    conn.commit()
+    conn.close()
+    print(f' Backfilled {locked} slot locks')
+    print('\n Database migration completed!')
+
+if __name__ == '__main__':
+    migrate_database()
@@ -0,0 +1,32 @@
+"""
+Migration script for bulk appointment changes: adds notificationoutbox.batch_id
+so the notifications of one bulk cancel/reschedule can be tracked together
+"""
+
+import sqlite3
+
+def migrate_database():
+    conn = sqlite3.connect('easyapt.db')
+    cursor = conn.cursor()
+    
+    cursor.execute("PRAGMA table_info(notificationoutbox)")
+    columns = [col[1] for col in cursor.fetchall()]
+    
+    if not columns:
+        print('⏭️  No notificationoutbox table yet (created on next startup)')
+    elif 'batch_id' not in columns:
+        cursor.execute('ALTER TABLE notificationoutbox ADD COLUMN batch_id VARCHAR')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS ix_notificationoutbox_batch_id
+            ON notificationoutbox (batch_id)
+        ''')
+        print(' Added column: batch_id')
+    else:
+        print('⏭️  Column batch_id already exists')
+    
+    conn.commit()
+    conn.close()
+    print('\n Database migration completed!')
+
+if __name__ == '__main__':
+    migrate_database()
@@ -0,0 +1,52 @@
+"""
+Migration script for existing PostgreSQL databases: creates the pg_trgm
+provider search index and the btree_gist exclusion constraint that stops
+overlapping booked appointments (new databases get both from create_all)
+"""
+
+import sys
+
+from sqlalchemy import text
+
+from app.database import engine
+from app.models import APPOINTMENT_OVERLAP_DDL, PROVIDER_TRGM_DDL
+
+def migrate_database():
+    if engine.dialect.name != "postgresql":
+        sys.exit(' DATABASE_URL is not PostgreSQL; use migrate_booking_constraints.py and migrate_provider_search.py')
+
+    with engine.begin() as conn:
+        for statement in PROVIDER_TRGM_DDL:
+            conn.execute(text(statement))
+        print(' Created index: ix_provider_search_trgm')
+
+    with engine.begin() as conn:
+        exists = conn.execute(text(
+            "SELECT 1 FROM pg_constraint WHERE conname = 'appointment_no_overlap'"
+        )).first()
+        if exists:
+            print(' Constraint appointment_no_overlap already exists')
+            print('\n Database migration completed!')
+            return
+
+        # The constraint cannot be added while overlapping bookings exist
+        overlaps = conn.execute(text('''
+            SELECT a.id, b.id, a.provider_id, a.start_time
+            FROM appointment a JOIN appointment b
+              ON a.provider_id = b.provider_id AND a.id < b.id
+             AND a.start_time < b.end_time AND b.start_time < a.end_time
+            WHERE a.status = 'booked' AND b.status = 'booked'
+        ''')).all()
+        if overlaps:
+            for first_id, second_id, provider_id, start_time in overlaps:
+                print(f'⚠️ Appointments {first_id} and {second_id} overlap for provider {provider_id} at {start_time}')
+            raise SystemExit(' Resolve the overlapping bookings above, then run this migration again')
+
+        for statement in APPOINTMENT_OVERLAP_DDL:
+            conn.execute(text(statement))
+        print(' Created constraint: appointment_no_overlap')
+
+    print('\n Database migration completed!')
+
+if __name__ == '__main__':
+    migrate_database()
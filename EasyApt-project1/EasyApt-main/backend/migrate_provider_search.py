@@ -0,0 +1,28 @@
+"""
+Migration script for provider search: creates the FTS5 index and its sync
+triggers on an existing SQLite database and fills it from the provider table
+"""
+
+import sqlite3
+
+from app.models import PROVIDER_FTS_DDL
+
+def migrate_database():
+    conn = sqlite3.connect('easyapt.db')
+    cursor = conn.cursor()
+    
+    for statement in PROVIDER_FTS_DDL:
+        cursor.execute(statement)
+    print(' Created provider_fts table and triggers')
+    
+    # Index the providers that existed before the triggers did
+    cursor.execute("INSERT INTO provider_fts(provider_fts) VALUES ('rebuild')")
+    count = cursor.execute("SELECT COUNT(*) FROM provider").fetchone()[0]
+    print(f' Indexed {count} providers')
+    
+    conn.commit()
+    conn.close()
+    print('\n Database migration completed!')
+
+if __name__ == '__main__':
+    migrate_database()
@@ -0,0 +1,56 @@
+"""
+Migration script for the reminder sweeper: adds appointment.reminder_sent_at,
+the (status, start_time) index, and drops the old per-appointment reminder
+jobs from the APScheduler job store
+"""
+
+import os
+import sqlite3
+from datetime import datetime
+
+def migrate_database():
+    conn = sqlite3.connect('easyapt.db')
+    cursor = conn.cursor()
+    
+    cursor.execute("PRAGMA table_info(appointment)")
+    columns = [col[1] for col in cursor.fetchall()]
+    
+    if 'reminder_sent_at' not in columns:
+        cursor.execute('ALTER TABLE appointment ADD COLUMN reminder_sent_at DATETIME')
+        print(' Added column: reminder_sent_at')
+    else:
+        print('⏭️  Column reminder_sent_at already exists')
+    
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS ix_appointment_status_start_time
+        ON appointment (status, start_time)
+    ''')
+    print(' Created index: ix_appointment_status_start_time')
+    
+    # Appointments already in the past need no reminder
+    cursor.execute('''
+        UPDATE appointment SET reminder_sent_at = start_time
+        WHERE reminder_sent_at IS NULL AND start_time <= ?
+    ''', (datetime.utcnow().isoformat(sep=' '),))
+    print(f' Marked {cursor.rowcount} past appointments as reminded')
+    
+    conn.commit()
+    conn.close()
+    
+    # Upcoming reminders now come from the sweeper; remove the old jobs so
+    # they are not sent twice
+    if os.path.exists('jobs.sqlite'):
+        jobs = sqlite3.connect('jobs.sqlite')
+        try:
+            removed = jobs.execute("DELETE FROM apscheduler_jobs WHERE id LIKE 'reminder_%'").rowcount
+            jobs.commit()
+            print(f' Removed {removed} scheduled reminder jobs')
+        except sqlite3.OperationalError:
+            print('⏭️  No apscheduler_jobs table found')
+        finally:
+            jobs.close()
+    
+    print('\n Database migration completed!')
+
+if __name__ == '__main__':
+    migrate_database()
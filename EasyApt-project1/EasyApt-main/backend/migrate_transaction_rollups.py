@@ -0,0 +1,60 @@
+"""
+Migration script for ledger rollups: creates the per-user and per-day
+transaction rollup tables and fills them from the existing app_transaction
+rows. Safe to re-run; the rollups are rebuilt from scratch each time.
+"""
+
+import sqlite3
+
+def migrate_database():
+    conn = sqlite3.connect('easyapt.db')
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transactionuserrollup (
+            user_id INTEGER NOT NULL REFERENCES user (id),
+            status VARCHAR NOT NULL,
+            transaction_type VARCHAR NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            amount FLOAT NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, status, transaction_type)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transactiondailyrollup (
+            day DATE NOT NULL,
+            status VARCHAR NOT NULL,
+            transaction_type VARCHAR NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            amount FLOAT NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, status, transaction_type)
+        )
+    ''')
+    print(' Rollup tables ready')
+    
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='app_transaction'")
+    if cursor.fetchone() is None:
+        print('⏭️  No app_transaction table yet (nothing to backfill)')
+    else:
+        cursor.execute('DELETE FROM transactionuserrollup')
+        cursor.execute('''
+            INSERT INTO transactionuserrollup (user_id, status, transaction_type, count, amount)
+            SELECT user_id, status, transaction_type, COUNT(*), COALESCE(SUM(amount), 0)
+            FROM app_transaction
+            GROUP BY user_id, status, transaction_type
+        ''')
+        cursor.execute('DELETE FROM transactiondailyrollup')
+        cursor.execute('''
+            INSERT INTO transactiondailyrollup (day, status, transaction_type, count, amount)
+            SELECT date(created_at), status, transaction_type, COUNT(*), COALESCE(SUM(amount), 0)
+            FROM app_transaction
+            GROUP BY date(created_at), status, transaction_type
+        ''')
+        print(f' Backfilled rollups from {cursor.execute("SELECT COUNT(*) FROM app_transaction").fetchone()[0]} transactions')
+    
+    conn.commit()
+    conn.close()
+    print('\n Database migration completed!')
+
+if __name__ == '__main__':
+    migrate_database()
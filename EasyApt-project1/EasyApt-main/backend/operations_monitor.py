@@ -45,7 +45,8 @@ def check_database_performance():
     cursor.execute("SELECT COUNT(*) FROM provider")
     provider_count = cursor.fetchone()[0]
     
-    cursor.execute("SELECT COUNT(*) FROM app_transaction")
+    # Ledger size from the rollup table rather than a full scan
+    cursor.execute("SELECT COALESCE(SUM(count), 0) FROM transactiondailyrollup")
     transaction_count = cursor.fetchone()[0]
     
     conn.close()
@@ -166,13 +167,14 @@ def check_transaction_health():
     conn = sqlite3.connect('easyapt.db')
     cursor = conn.cursor()
     
-    cursor.execute("SELECT COUNT(*), SUM(amount) FROM app_transaction")
-    result = cursor.fetchone()
-    transaction_count = result[0]
-    total_amount = result[1] if result[1] else 0
-    
-    cursor.execute("SELECT COUNT(*) FROM app_transaction WHERE status = 'completed'")
-    completed = cursor.fetchone()[0]
+    # One row per day/status/type, maintained on every ledger write
+    cursor.execute("""
+        SELECT COALESCE(SUM(count), 0),
+               COALESCE(SUM(amount), 0),
+               COALESCE(SUM(CASE WHEN status = 'completed' THEN count ELSE 0 END), 0)
+        FROM transactiondailyrollup
+    """)
+    transaction_count, total_amount, completed = cursor.fetchone()
     
     conn.close()
     
@@ -0,0 +1,80 @@
+"""
+Local stand-in for the Stripe API, for load tests of the payment flow
+Implements POST /v1/payment_intents with Idempotency-Key replay and a
+configurable response delay, so checkout can be load-tested without
+touching Stripe or its rate limits.
+
+Usage:
+    python stripe_stub.py --port 12111 --latency-ms 300
+    STRIPE_API_BASE=http://127.0.0.1:12111 uvicorn app.main:app --workers 1
+"""
+
+import argparse
+import asyncio
+import secrets
+import time
+from urllib.parse import parse_qsl
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="Stripe stub")
+app.state.latency_seconds = 0.0
+
+_intents_by_key = {}
+_stats = {"created": 0, "replayed": 0}
+
+
+@app.post("/v1/payment_intents")
+async def create_payment_intent(request: Request):
+    await asyncio.sleep(app.state.latency_seconds)
+
+    key = request.headers.get("idempotency-key")
+    if key and key in _intents_by_key:
+        _stats["replayed"] += 1
+        return JSONResponse(_intents_by_key[key], headers={"Idempotent-Replayed": "true"})
+
+    form = dict(parse_qsl((await request.body()).decode()))
+    if not form.get("amount", "").isdigit():
+        return JSONResponse(
+            {"error": {"type": "invalid_request_error", "message": "Invalid integer: amount"}},
+            status_code=400,
+        )
+
+    intent_id = f"pi_stub_{secrets.token_hex(12)}"
+    intent = {
+        "id": intent_id,
+        "object": "payment_intent",
+        "amount": int(form["amount"]),
+        "currency": form.get("currency", "usd"),
+        "client_secret": f"{intent_id}_secret_{secrets.token_hex(12)}",
+        "status": "requires_payment_method",
+        "created": int(time.time()),
+        "metadata": {
+            name[len("metadata["):-1]: value
+            for name, value in form.items()
+            if name.startswith("metadata[")
+        },
+    }
+    if key:
+        _intents_by_key[key] = intent
+    _stats["created"] += 1
+    return JSONResponse(intent)
+
+
+@app.get("/stats")
+def stats():
+    return _stats
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local Stripe API stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=12111)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every response")
+    args = parser.parse_args()
+
+    app.state.latency_seconds = args.latency_ms / 1000
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
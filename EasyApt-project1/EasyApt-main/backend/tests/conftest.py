@@ -1,37 +1,66 @@
 import pytest
 from fastapi.testclient import TestClient
-from sqlmodel import Session, create_engine, SQLModel
-from sqlmodel.pool import StaticPool
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import Session, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 import sys
 import os
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Keep notifications offline during tests
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("MAILTRAP_MODE", "true")
+os.environ.setdefault("TWILIO_TEST_MODE", "true")
+
 from app.main import app
-from app.database import get_session
+from app.database import get_async_session, create_db_engine, async_database_url, enable_sqlite_transactions
 from app.models import User, Provider, Appointment
-from app.auth import get_password_hash
+from app.auth import get_password_hash, create_access_token
+from app.availability import availability_index
+from app.activity import activity_tracker
+from app.principal import principal_cache
+from app.response_cache import response_cache
+from app.chat_cache import chat_response_cache
+from app.instrumentation import metrics
 
-# Test database engine (in-memory SQLite)
-@pytest.fixture(name="session")
-def session_fixture():
-    engine = create_engine(
-        "sqlite:///:memory:",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
+# Test database engine (temporary SQLite file shared by the sync fixtures
+# and the app's async sessions)
+@pytest.fixture(name="engine")
+def engine_fixture(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'test.db'}")
     SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture(name="session")
+def session_fixture(engine):
     with Session(engine) as session:
         yield session
 
 @pytest.fixture(name="client")
-def client_fixture(session: Session):
-    def get_session_override():
-        return session
+def client_fixture(engine, session: Session):
+    # NullPool: TestClient may run each request on a different event loop
+    async_engine = create_async_engine(async_database_url(str(engine.url)), poolclass=NullPool)
+    enable_sqlite_transactions(async_engine.sync_engine)
+    
+    async def get_async_session_override():
+        async with AsyncSession(async_engine, expire_on_commit=False) as async_session:
+            yield async_session
     
-    app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_async_session] = get_async_session_override
+    availability_index.invalidate()
+    activity_tracker.reset()
+    principal_cache.invalidate()
+    response_cache.reset()
+    chat_response_cache.reset()
+    metrics.reset()
     client = TestClient(app)
+    client.async_engine = async_engine
     yield client
     app.dependency_overrides.clear()
 
@@ -72,3 +101,43 @@ def test_provider_fixture(session: Session):
     session.refresh(provider)
     
     return {"user": user, "provider": provider}
+
+@pytest.fixture(name="patient_headers")
+def patient_headers_fixture(test_patient: User):
+    """Bearer headers for the test patient (skips the CAPTCHA login flow)"""
+    token = create_access_token({"sub": str(test_patient.id), "role": test_patient.role})
+    return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture(name="provider_headers")
+def provider_headers_fixture(test_provider):
+    """Bearer headers for the test provider's user"""
+    user = test_provider["user"]
+    token = create_access_token({"sub": str(user.id), "role": user.role})
+    return {"Authorization": f"Bearer {token}"}
+
+class QueryCounter:
+    """SQL statements and commits seen on an engine, for query budgets"""
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        self.statements = []
+        self.commits = 0
+    
+    def on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+    
+    def on_commit(self, conn):
+        self.commits += 1
+
+@pytest.fixture(name="query_counter")
+def query_counter_fixture(client):
+    """Counts what the app sends to the database through the test client"""
+    counter = QueryCounter()
+    engine = client.async_engine.sync_engine
+    event.listen(engine, "before_cursor_execute", counter.on_execute)
+    event.listen(engine, "commit", counter.on_commit)
+    yield counter
+    event.remove(engine, "before_cursor_execute", counter.on_execute)
+    event.remove(engine, "commit", counter.on_commit)
@@ -1,6 +1,7 @@
 import pytest
 from datetime import datetime, timedelta
 from app.models import Appointment
+from app.time_handler import TimeHandler
 
 class TestAuthenticationAndDatabase:
     """Test 1: Authentication system integrates with database"""
@@ -93,7 +94,7 @@ class TestAppointmentBookingFlow:
             response = client.get("/provider-dashboard-list", headers=headers)
             
             if response.status_code == 200:
-                appointments = response.json()
+                appointments = response.json()["items"]
                 assert len(appointments) > 0
                 assert any(appt["id"] == appointment.id for appt in appointments)
 
@@ -114,6 +115,33 @@ class TestProviderSearch:
         
         # Should require authentication
         assert response.status_code in [200, 401]
+    
+    def test_search_ranks_prefix_matches(self, client, session, test_provider, patient_headers):
+        """Typed prefixes match name, specialty and location; name matches rank first"""
+        from sqlmodel import select
+        from app.models import Provider
+        
+        session.add(Provider(name="Dr. Carla Diaz", specialty="Cardiology", location="Springfield"))
+        session.add(Provider(name="Dr. Ann Lee", specialty="Pediatric Cardiology", location="Shelbyville"))
+        session.add(Provider(name="Dr. Cardon Smith", specialty="Dermatology", location="Springfield"))
+        session.commit()
+        
+        names = [p["name"] for p in client.get("/providers/search?q=card", headers=patient_headers).json()]
+        assert names[0] == "Dr. Cardon Smith"
+        assert set(names) == {"Dr. Cardon Smith", "Dr. Carla Diaz", "Dr. Ann Lee"}
+        
+        names = [p["name"] for p in client.get("/providers/search?q=cardio spring", headers=patient_headers).json()]
+        assert names == ["Dr. Carla Diaz"]
+        
+        assert len(client.get("/providers/search?q=dr&limit=2", headers=patient_headers).json()) == 2
+        
+        # The index follows provider edits
+        provider = session.exec(select(Provider).where(Provider.name == "Dr. Ann Lee")).one()
+        provider.specialty = "Oncology"
+        session.add(provider)
+        session.commit()
+        names = [p["name"] for p in client.get("/providers/search?q=cardio", headers=patient_headers).json()]
+        assert "Dr. Ann Lee" not in names
 
 
 class TestAppointmentManagement:
@@ -207,7 +235,7 @@ class TestDatabaseConstraints:
             )
             
             # Should fail due to overlap
-            assert response.status_code == 400
+            assert response.status_code == 409
             assert "already booked" in response.json()["detail"].lower()
 
 
@@ -227,3 +255,1529 @@ class TestEmailNotificationIntegration:
         # This would require mocking the notification service
         # For now, just verify the integration point exists
         pass
+
+
+class TestProviderAvailability:
+    """Test 8: Server-side availability engine"""
+    
+    def test_availability_excludes_booked_slots(self, client, session, test_patient, test_provider, patient_headers):
+        """Booked intervals are removed from the returned free slots"""
+        day = (datetime.utcnow() + timedelta(days=2)).replace(hour=0, minute=0, second=0, microsecond=0)
+        appointment = Appointment(
+            patient_id=test_patient.id,
+            provider_id=test_provider["provider"].id,
+            start_time=day.replace(hour=10),
+            end_time=day.replace(hour=11),
+            status="booked",
+        )
+        session.add(appointment)
+        session.commit()
+        
+        response = client.get(
+            f"/providers/{test_provider['provider'].id}/availability",
+            params={
+                "from": day.replace(hour=9).isoformat(),
+                "to": day.replace(hour=12).isoformat(),
+                "duration": 30,
+            },
+            headers=patient_headers,
+        )
+        
+        assert response.status_code == 200
+        slots = response.json()["slots"]
+        assert len(slots) == 4
+        assert day.replace(hour=10).isoformat() not in slots
+        assert day.replace(hour=11).isoformat() in slots
+    
+    def test_availability_tracks_cancellation(self, client, session, test_patient, test_provider, patient_headers):
+        """Cancelling updates the index without waiting for a rebuild"""
+        day = (datetime.utcnow() + timedelta(days=2)).replace(hour=0, minute=0, second=0, microsecond=0)
+        appointment = Appointment(
+            patient_id=test_patient.id,
+            provider_id=test_provider["provider"].id,
+            start_time=day.replace(hour=10),
+            end_time=day.replace(hour=10, minute=30),
+            status="booked",
+        )
+        session.add(appointment)
+        session.commit()
+        session.refresh(appointment)
+        params = {
+            "from": day.replace(hour=10).isoformat(),
+            "to": day.replace(hour=10, minute=30).isoformat(),
+        }
+        url = f"/providers/{test_provider['provider'].id}/availability"
+        
+        assert client.get(url, params=params, headers=patient_headers).json()["slots"] == []
+        
+        response = client.delete(f"/appointments/{appointment.id}", headers=patient_headers)
+        assert response.status_code == 200
+        
+        assert client.get(url, params=params, headers=patient_headers).json()["slots"] == [params["from"]]
+    
+    def test_booking_during_load_is_not_lost(self, client, session, test_patient, test_provider, patient_headers, monkeypatch):
+        """A booking recorded while the schedule is being read is picked up by a reload"""
+        from app.availability import availability_index
+        
+        provider_id = test_provider["provider"].id
+        day = (datetime.utcnow() + timedelta(days=2)).replace(hour=0, minute=0, second=0, microsecond=0)
+        appointment = Appointment(
+            patient_id=test_patient.id,
+            provider_id=provider_id,
+            start_time=day.replace(hour=10),
+            end_time=day.replace(hour=10, minute=30),
+            status="booked",
+        )
+        
+        load = availability_index._load
+        loads = []
+        
+        async def racing_load(async_session, pid):
+            schedule = await load(async_session, pid)
+            if not loads:
+                # The booking commits and is recorded after this read
+                session.add(appointment)
+                session.commit()
+                session.refresh(appointment)
+                availability_index.record_booking(appointment)
+            loads.append(len(schedule))
+            return schedule
+        
+        monkeypatch.setattr(availability_index, "_load", racing_load)
+        params = {
+            "from": day.replace(hour=10).isoformat(),
+            "to": day.replace(hour=10, minute=30).isoformat(),
+        }
+        response = client.get(f"/providers/{provider_id}/availability", params=params, headers=patient_headers)
+        assert response.json()["slots"] == []
+        assert loads == [0, 1]
+    
+    def test_generate_slots_with_unsorted_overlapping_breaks(self):
+        """Slot sweep handles unsorted, overlapping break intervals"""
+        day = datetime(2030, 1, 7)
+        breaks = [
+            (day.replace(hour=11), day.replace(hour=12)),
+            (day.replace(hour=9, minute=15), day.replace(hour=9, minute=45)),
+            (day.replace(hour=9, minute=30), day.replace(hour=10)),
+        ]
+        slots = TimeHandler.generate_available_slots(day.replace(hour=9), day.replace(hour=12), 30, breaks)
+        assert slots == [day.replace(hour=10), day.replace(hour=10, minute=30)]
+
+
+class TestBookingOverlapExclusion:
+    """Test 9: Database-level double-booking protection"""
+    
+    def _booking(self, provider_id, day, hour, minute=0):
+        start = day.replace(hour=hour, minute=minute)
+        return {
+            "provider_id": provider_id,
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(minutes=30)).isoformat(),
+            "reason": "Checkup",
+        }
+    
+    def test_concurrent_booking_rejected_by_slot_locks(self, client, session, test_patient, test_provider, patient_headers, monkeypatch):
+        """A booking that slips past the read check still conflicts in the database"""
+        import app.appointments as appointments_module
+        from app.models import AppointmentSlotLock
+        from sqlmodel import select
+        
+        provider_id = test_provider["provider"].id
+        day = (datetime.utcnow() + timedelta(days=3)).replace(second=0, microsecond=0)
+        
+        first = client.post("/appointments/book", json=self._booking(provider_id, day, 10), headers=patient_headers)
+        assert first.status_code == 200
+        assert len(session.exec(select(AppointmentSlotLock)).all()) == 6
+        
+        # Simulate a racing request that passed the overlap check
+        async def no_overlap(*args, **kwargs):
+            return False
+        monkeypatch.setattr(appointments_module, "has_overlap", no_overlap)
+        second = client.post("/appointments/book", json=self._booking(provider_id, day, 10, 15), headers=patient_headers)
+        assert second.status_code == 409
+        
+        booked = session.exec(select(Appointment).where(Appointment.status == "booked")).all()
+        assert len(booked) == 1
+    
+    def test_off_grid_bookings_lock_full_buckets_only(self, client, session, test_patient, test_provider, patient_headers, monkeypatch):
+        """Back-to-back off-grid bookings fit; an overlap inside a partial bucket still conflicts"""
+        import app.appointments as appointments_module
+        from app.models import AppointmentSlotLock
+        from sqlmodel import select
+        
+        provider_id = test_provider["provider"].id
+        day = (datetime.utcnow() + timedelta(days=4)).replace(second=0, microsecond=0)
+        
+        first = client.post("/appointments/book", json=self._booking(provider_id, day, 10, 2), headers=patient_headers)
+        assert first.status_code == 200
+        second = client.post("/appointments/book", json=self._booking(provider_id, day, 10, 32), headers=patient_headers)
+        assert second.status_code == 200
+        assert len(session.exec(select(AppointmentSlotLock)).all()) == 10
+        
+        # Racing past the read check into a bucket neither booking locked
+        async def no_overlap(*args, **kwargs):
+            return False
+        monkeypatch.setattr(appointments_module, "has_overlap", no_overlap)
+        start = day.replace(hour=10, minute=28)
+        third = client.post("/appointments/book", json={
+            "provider_id": provider_id,
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(minutes=5)).isoformat(),
+        }, headers=patient_headers)
+        assert third.status_code == 409
+        assert len(session.exec(select(Appointment).where(Appointment.status == "booked")).all()) == 2
+    
+    def test_cancel_releases_slot_locks(self, client, session, test_patient, test_provider, patient_headers):
+        """Cancelling frees the slot for the next booking"""
+        provider_id = test_provider["provider"].id
+        day = (datetime.utcnow() + timedelta(days=3)).replace(second=0, microsecond=0)
+        
+        first = client.post("/appointments/book", json=self._booking(provider_id, day, 14), headers=patient_headers)
+        assert first.status_code == 200
+        
+        response = client.delete(f"/appointments/{first.json()['id']}", headers=patient_headers)
+        assert response.status_code == 200
+        
+        again = client.post("/appointments/book", json=self._booking(provider_id, day, 14), headers=patient_headers)
+        assert again.status_code == 200
+    
+    def test_cancelled_appointment_cannot_be_rescheduled(self, client, session, test_patient, test_provider, patient_headers):
+        """A cancelled appointment is not relocked by a reschedule, so its slot stays free"""
+        from app.models import AppointmentSlotLock
+        from sqlmodel import select
+        
+        provider_id = test_provider["provider"].id
+        day = (datetime.utcnow() + timedelta(days=3)).replace(second=0, microsecond=0)
+        
+        first = client.post("/appointments/book", json=self._booking(provider_id, day, 15), headers=patient_headers)
+        assert first.status_code == 200
+        appt_id = first.json()["id"]
+        assert client.delete(f"/appointments/{appt_id}", headers=patient_headers).status_code == 200
+        
+        moved = self._booking(provider_id, day, 16)
+        response = client.put(f"/appointments/{appt_id}/reschedule", json={
+            "start_time": moved["start_time"], "end_time": moved["end_time"],
+        }, headers=patient_headers)
+        assert response.status_code == 409
+        assert session.exec(select(AppointmentSlotLock)).all() == []
+        
+        again = client.post("/appointments/book", json=moved, headers=patient_headers)
+        assert again.status_code == 200
+
+
+class TestDatabaseEngine:
+    """Test 10: Engine factory and pool metrics"""
+    
+    def test_sqlite_file_engine_uses_wal_and_pool(self, tmp_path):
+        """File-backed SQLite gets WAL pragmas, a tuned pool and no SQL echo"""
+        from sqlalchemy import text
+        from app.database import create_db_engine, pool_status, InstrumentedQueuePool
+        
+        engine = create_db_engine(f"sqlite:///{tmp_path / 'pool.db'}")
+        with engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        
+        assert engine.echo is False
+        assert isinstance(engine.pool, InstrumentedQueuePool)
+        status = pool_status(engine)
+        assert status["checked_out"] == 0
+        assert status["checkouts_total"] >= 1
+        engine.dispose()
+    
+    def test_db_health_endpoint(self, client):
+        """Pool metrics are exposed over HTTP"""
+        response = client.get("/health/db")
+        assert response.status_code == 200
+        assert "checkout_wait_seconds_total" in response.json()
+
+
+class TestSessionActivity:
+    """Test 11: Session activity is tracked in memory and flushed in batches"""
+    
+    def test_authenticated_request_does_not_write_user_row(self, client, session, test_patient, patient_headers):
+        """last_active only reaches the database on flush"""
+        import asyncio
+        from app.activity import activity_tracker
+        
+        response = client.get("/auth/me", headers=patient_headers)
+        assert response.status_code == 200
+        session.refresh(test_patient)
+        assert test_patient.last_active is None
+        
+        assert asyncio.run(activity_tracker.flush(client.async_engine)) == 1
+        session.refresh(test_patient)
+        assert test_patient.last_active is not None
+        assert asyncio.run(activity_tracker.flush(client.async_engine)) == 0
+    
+    def test_inactive_session_expires(self, client, test_patient, patient_headers):
+        """The inactivity timeout is enforced from the in-memory timestamp"""
+        from app.activity import activity_tracker
+        
+        activity_tracker.touch(test_patient.id, datetime.utcnow() - timedelta(minutes=10))
+        response = client.get("/auth/me", headers=patient_headers)
+        assert response.status_code == 401
+
+    
+    def test_flush_drops_stale_entries(self, client, session, test_patient):
+        """Flushed entries past the inactivity timeout leave the in-memory map"""
+        import asyncio
+        from app.activity import activity_tracker
+        
+        long_ago = datetime.utcnow() - timedelta(minutes=10)
+        activity_tracker.touch(test_patient.id, long_ago)
+        activity_tracker.touch(test_patient.id + 1000)
+        assert activity_tracker.tracked() == 2
+        
+        assert asyncio.run(activity_tracker.flush(client.async_engine)) == 2
+        assert activity_tracker.tracked() == 1
+        session.refresh(test_patient)
+        assert activity_tracker.last_active(test_patient.id, test_patient.last_active) == long_ago
+
+class TestPrincipalCache:
+    """Test 12: Authenticated requests resolve the caller from the principal cache"""
+    
+    def test_cached_principal_skips_user_lookup(self, client, test_patient, patient_headers):
+        """Only the first request loads the user row"""
+        from sqlalchemy import event
+        from app.principal import principal_cache
+        
+        user_selects = []
+        def count_user_selects(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT") and "FROM user" in statement:
+                user_selects.append(statement)
+        event.listen(client.async_engine.sync_engine, "before_cursor_execute", count_user_selects)
+        
+        for _ in range(3):
+            response = client.get("/transactions/my", headers=patient_headers)
+            assert response.status_code == 200
+        
+        assert len(user_selects) == 1
+        assert principal_cache.get(test_patient.id).role == "patient"
+    
+    def test_invalidate_reloads_changed_role(self, client, session, test_patient, patient_headers):
+        """Invalidation picks up account changes on the next request"""
+        from app.principal import principal_cache
+        
+        client.get("/transactions/my", headers=patient_headers)
+        test_patient.role = "provider"
+        session.add(test_patient)
+        session.commit()
+        
+        principal_cache.invalidate(test_patient.id)
+        client.get("/transactions/my", headers=patient_headers)
+        assert principal_cache.get(test_patient.id).role == "provider"
+
+
+class TestPasswordHashPool:
+    """Test 13: Password hashing runs on a bounded worker pool"""
+    
+    def test_register_hashes_on_pool(self, client):
+        """Registration goes through the pool and is counted in its metrics"""
+        from app.password_pool import password_hash_pool
+        
+        before = password_hash_pool.metrics.completed
+        response = client.post("/auth/register", json={
+            "email": "pooled@example.com",
+            "password": "SecurePass123!",
+            "role": "patient"
+        })
+        assert response.status_code == 200
+        assert password_hash_pool.metrics.completed == before + 1
+        assert client.get("/health/auth").json()["in_flight"] == 0
+    
+    def test_cancelled_caller_keeps_its_slot_until_the_job_ends(self):
+        """A hash job outliving its cancelled caller still counts against the cap"""
+        import asyncio
+        import threading
+        import pytest
+        from app.password_pool import PasswordHashPool, PasswordHashPoolSaturated
+        
+        pool = PasswordHashPool(max_workers=1, max_queue=0)
+        release = threading.Event()
+        
+        async def scenario():
+            task = asyncio.ensure_future(pool.run(release.wait))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            assert pool.stats()["in_flight"] == 1
+            with pytest.raises(PasswordHashPoolSaturated):
+                await pool.run(len, "x")
+            
+            release.set()
+            for _ in range(100):
+                if pool.stats()["in_flight"] == 0:
+                    break
+                await asyncio.sleep(0.01)
+            assert await pool.run(len, "x") == 1
+        
+        asyncio.run(scenario())
+        pool.shutdown()
+    
+    def test_saturated_pool_returns_429(self, client, monkeypatch):
+        """With no free worker or queue slot the request is rejected"""
+        from app.password_pool import password_hash_pool
+        
+        monkeypatch.setattr(password_hash_pool, "max_workers", 0)
+        monkeypatch.setattr(password_hash_pool, "max_queue", 0)
+        response = client.post("/auth/register", json={
+            "email": "saturated@example.com",
+            "password": "SecurePass123!",
+            "role": "patient"
+        })
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "1"
+
+
+class TestPasswordHashUpgrade:
+    """Test 14: Legacy password hashes are verified by prefix and upgraded at login"""
+    
+    def test_scheme_dispatch(self):
+        """Each hash is verified once, by the scheme its prefix names"""
+        from passlib.hash import pbkdf2_sha256
+        from app import password_schemes
+        
+        legacy = pbkdf2_sha256.hash("LegacyPass123!")
+        current = password_schemes.hash_password("LegacyPass123!")
+        assert password_schemes.identify_scheme(legacy).name == "pbkdf2_sha256"
+        assert password_schemes.identify_scheme(current).name == "argon2"
+        assert password_schemes.verify_password("LegacyPass123!", legacy)
+        assert not password_schemes.verify_password("WrongPass123!", legacy)
+        assert not password_schemes.verify_password("LegacyPass123!", "not-a-hash")
+        assert password_schemes.needs_rehash(legacy)
+        assert not password_schemes.needs_rehash(current)
+    
+    def test_login_rehashes_legacy_password(self, client, session, monkeypatch):
+        """A successful login replaces a pbkdf2 hash with Argon2"""
+        from passlib.hash import pbkdf2_sha256
+        from app.models import User
+        from app.captcha_service import captcha_service
+        
+        user = User(email="legacy@example.com", password_hash=pbkdf2_sha256.hash("LegacyPass123!"), role="patient")
+        session.add(user)
+        session.commit()
+        
+        async def captcha_ok(*args, **kwargs):
+            return True
+        monkeypatch.setattr(captcha_service, "verify_login", captcha_ok)
+        
+        response = client.post("/auth/login", data={
+            "username": "legacy@example.com",
+            "password": "LegacyPass123!",
+            "recaptcha_token": "test"
+        })
+        assert response.status_code == 200
+        session.refresh(user)
+        assert user.password_hash.startswith("$argon2")
+
+
+class TestNotificationOutbox:
+    """Test 15: Notifications are staged in the outbox and drained by workers"""
+    
+    def _book(self, client, provider_id, headers):
+        start = (datetime.utcnow() + timedelta(days=5)).replace(hour=11, minute=0, second=0, microsecond=0)
+        return client.post("/appointments/book", json={
+            "provider_id": provider_id,
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(minutes=30)).isoformat(),
+            "reason": "Outbox test"
+        }, headers=headers)
+    
+    def test_booking_stages_and_dispatches(self, client, session, test_patient, test_provider, patient_headers):
+        """The booking commits its notification rows; a drain delivers them"""
+        import asyncio
+        from sqlmodel import select
+        from app.models import NotificationOutbox
+        from app.notification_outbox import notification_dispatcher
+        
+        response = self._book(client, test_provider["provider"].id, patient_headers)
+        assert response.status_code == 200
+        
+        rows = session.exec(select(NotificationOutbox)).all()
+        assert [(r.channel, r.kind, r.status) for r in rows] == [("email", "booking_confirmation", "pending")]
+        assert rows[0].appointment_id == response.json()["id"]
+        
+        assert asyncio.run(notification_dispatcher.drain_once(client.async_engine)) == 1
+        session.refresh(rows[0])
+        assert rows[0].status == "sent"
+        assert rows[0].sent_at is not None
+        assert asyncio.run(notification_dispatcher.drain_once(client.async_engine)) == 0
+    
+    def test_failed_delivery_is_retried_later(self, client, session, test_patient, test_provider, patient_headers, monkeypatch):
+        """A failed send goes back to pending with a backoff delay"""
+        import asyncio
+        from sqlmodel import select
+        from app.models import NotificationOutbox
+        from app.notification_outbox import notification_dispatcher
+        
+        async def smtp_down(*args, **kwargs):
+            raise RuntimeError("SMTP delivery failed")
+        monkeypatch.setattr(notification_dispatcher, "send_email", smtp_down)
+        
+        assert self._book(client, test_provider["provider"].id, patient_headers).status_code == 200
+        assert asyncio.run(notification_dispatcher.drain_once(client.async_engine)) == 1
+        
+        row = session.exec(select(NotificationOutbox)).one()
+        assert row.status == "pending"
+        assert row.attempts == 1
+        assert row.last_error == "SMTP delivery failed"
+        assert row.available_at > datetime.utcnow()
+        # Not yet due, so nothing is claimed
+        assert asyncio.run(notification_dispatcher.drain_once(client.async_engine)) == 0
+
+
+class TestSMTPConnectionPool:
+    """Test 16: Outgoing mail reuses pooled SMTP connections"""
+    
+    class FakeSMTP:
+        opened = []
+        
+        def __init__(self, host, port, timeout=None):
+            self.sent = []
+            self.alive = True
+            self.quit_called = False
+            type(self).opened.append(self)
+        
+        def starttls(self):
+            pass
+        
+        def login(self, username, password):
+            pass
+        
+        def noop(self):
+            return (250, b"OK") if self.alive else (421, b"closed")
+        
+        def sendmail(self, from_addr, to_addrs, msg):
+            import smtplib
+            if not self.alive:
+                raise smtplib.SMTPServerDisconnected("gone")
+            self.sent.append(to_addrs)
+        
+        def quit(self):
+            self.quit_called = True
+        
+        def close(self):
+            pass
+    
+    def _pool(self, monkeypatch, **kwargs):
+        import smtplib
+        from app.smtp_mailer import SMTPConnectionPool
+        
+        self.FakeSMTP.opened = []
+        monkeypatch.setattr(smtplib, "SMTP", self.FakeSMTP)
+        return SMTPConnectionPool(**kwargs)
+    
+    def test_connection_is_reused(self, monkeypatch):
+        """Sequential sends share one logged-in session"""
+        pool = self._pool(monkeypatch, max_connections=2)
+        for i in range(5):
+            pool.sendmail("noreply@easyapt.com", f"user{i}@example.com", "body")
+        
+        assert len(self.FakeSMTP.opened) == 1
+        assert len(self.FakeSMTP.opened[0].sent) == 5
+        assert pool.stats()["reuses_total"] == 4
+        pool.close_all()
+        assert self.FakeSMTP.opened[0].quit_called
+    
+    def test_dropped_connection_reconnects(self, monkeypatch):
+        """A session closed by the server is replaced transparently"""
+        pool = self._pool(monkeypatch, max_connections=1)
+        pool.sendmail("noreply@easyapt.com", "a@example.com", "body")
+        self.FakeSMTP.opened[0].alive = False
+        
+        pool.sendmail("noreply@easyapt.com", "b@example.com", "body")
+        assert len(self.FakeSMTP.opened) == 2
+        assert self.FakeSMTP.opened[1].sent == ["b@example.com"]
+    
+    def test_idle_connections_expire(self, monkeypatch):
+        """Connections idle past the timeout are closed instead of reused"""
+        pool = self._pool(monkeypatch, idle_timeout=0)
+        pool.sendmail("noreply@easyapt.com", "a@example.com", "body")
+        pool.sendmail("noreply@easyapt.com", "b@example.com", "body")
+        
+        assert len(self.FakeSMTP.opened) == 2
+        assert self.FakeSMTP.opened[0].quit_called
+
+    
+    def test_closing_session_is_discarded(self, monkeypatch):
+        """A 421 reply drops the session and the message goes out on a new one"""
+        import smtplib
+        pool = self._pool(monkeypatch, max_connections=1)
+        pool.sendmail("noreply@easyapt.com", "a@example.com", "body")
+        
+        def closing(*args):
+            raise smtplib.SMTPDataError(421, b"Service closing transmission channel")
+        self.FakeSMTP.opened[0].sendmail = closing
+        
+        pool.sendmail("noreply@easyapt.com", "b@example.com", "body")
+        assert len(self.FakeSMTP.opened) == 2
+        assert self.FakeSMTP.opened[0].quit_called
+        assert self.FakeSMTP.opened[1].sent == ["b@example.com"]
+        assert pool.stats()["idle"] == 1
+    
+    def test_reaper_closes_idle_connections(self, monkeypatch):
+        """Idle sessions are closed by the reaper without waiting for a checkout"""
+        pool = self._pool(monkeypatch, idle_timeout=60)
+        pool.sendmail("noreply@easyapt.com", "a@example.com", "body")
+        assert pool.reap_idle() == 0
+        
+        pool.idle_timeout = 0
+        assert pool.reap_idle() == 1
+        assert self.FakeSMTP.opened[0].quit_called
+        assert pool.stats()["idle"] == 0
+        assert pool.stats()["reaped_total"] == 1
+        pool.close_all()
+
+class TestReminderSweeper:
+    """Test 17: Reminders are staged by the batched sweeper"""
+    
+    def _appointment(self, session, patient, provider, hours_ahead, status="booked"):
+        start = datetime.utcnow() + timedelta(hours=hours_ahead)
+        appt = Appointment(
+            patient_id=patient.id,
+            provider_id=provider.id,
+            start_time=start,
+            end_time=start + timedelta(minutes=30),
+            status=status,
+        )
+        session.add(appt)
+        session.commit()
+        session.refresh(appt)
+        return appt
+    
+    def test_sweep_stages_due_reminders_once(self, client, session, test_patient, test_provider, monkeypatch):
+        """Only booked appointments inside the window are reminded, and only once"""
+        import asyncio
+        from sqlmodel import select
+        from app.models import NotificationOutbox
+        from app.reminders import reminder_sweeper
+        
+        monkeypatch.setattr(reminder_sweeper, "batch_size", 2)
+        provider = test_provider["provider"]
+        due = [self._appointment(session, test_patient, provider, h) for h in (2, 5, 20)]
+        later = self._appointment(session, test_patient, provider, 48)
+        cancelled = self._appointment(session, test_patient, provider, 3, status="cancelled")
+        
+        assert asyncio.run(reminder_sweeper.sweep_once(client.async_engine)) == 3
+        assert asyncio.run(reminder_sweeper.sweep_once(client.async_engine)) == 0
+        
+        rows = session.exec(select(NotificationOutbox).where(NotificationOutbox.kind == "appointment_reminder")).all()
+        assert sorted(r.appointment_id for r in rows) == sorted(a.id for a in due)
+        for appt in due:
+            session.refresh(appt)
+            assert appt.reminder_sent_at is not None
+        session.refresh(later)
+        session.refresh(cancelled)
+        assert later.reminder_sent_at is None
+        assert cancelled.reminder_sent_at is None
+
+
+class TestSchedulerLeaderElection:
+    """Test 18: Only one instance holds the background scheduler lease"""
+    
+    def test_lease_is_exclusive_until_released(self, client):
+        """A second holder is refused until the first releases"""
+        import asyncio
+        from app.scheduler import LeaderLease
+        
+        first = LeaderLease("test-lease", ttl_seconds=30, holder_id="worker-1")
+        second = LeaderLease("test-lease", ttl_seconds=30, holder_id="worker-2")
+        
+        async def scenario():
+            engine = client.async_engine
+            assert await first.acquire_or_renew(engine)
+            assert not await second.acquire_or_renew(engine)
+            assert await first.acquire_or_renew(engine)  # renewal
+            await first.release(engine)
+            assert await second.acquire_or_renew(engine)
+            assert not await first.acquire_or_renew(engine)
+        asyncio.run(scenario())
+    
+    def test_expired_lease_can_be_taken_over(self, client):
+        """A holder that stops renewing loses the lease after its TTL"""
+        import asyncio
+        from app.scheduler import LeaderLease
+        
+        crashed = LeaderLease("test-lease", ttl_seconds=-1, holder_id="crashed")
+        standby = LeaderLease("test-lease", ttl_seconds=30, holder_id="standby")
+        
+        async def scenario():
+            assert await crashed.acquire_or_renew(client.async_engine)
+            assert await standby.acquire_or_renew(client.async_engine)
+        asyncio.run(scenario())
+
+
+class TestEmailTemplates:
+    """Test 19: Compiled email templates"""
+    
+    def test_every_email_renders(self):
+        """All builders return HTML, including the confirmation action links"""
+        from app import email_templates
+        
+        confirmation = email_templates.get_appointment_confirmation_email(
+            "Ann", "March 14, 2026", "09:00 AM", "Dr. Test", cancel_url="https://x/cancel?t=1&u=2"
+        )
+        assert "Cancel Appointment" in confirmation
+        assert 'href="https://x/cancel?t=1&amp;u=2"' in confirmation
+        assert "Reschedule Appointment" not in confirmation
+        
+        for html in (
+            email_templates.get_appointment_cancellation_email("Ann", "March 14, 2026", "09:00 AM", "Dr. Test"),
+            email_templates.get_appointment_reminder_email("Ann", "March 14, 2026", "09:00 AM", "Dr. Test"),
+            email_templates.get_appointment_rescheduled_email("Ann", "March 1", "9 AM", "March 2", "10 AM", "Dr. Test"),
+            email_templates.get_account_created_email("Ann"),
+        ):
+            assert html.startswith("<!DOCTYPE html>")
+            assert "Ann" in html
+    
+    def test_fields_are_escaped(self):
+        """Per-recipient values cannot inject markup"""
+        from app.email_templates import get_appointment_reminder_email
+        
+        html = get_appointment_reminder_email("<script>x</script>", "March 14, 2026", "09:00 AM", "Dr. Test")
+        assert "<script>" not in html
+        assert "&lt;script&gt;" in html
+    
+    def test_batch_matches_single_render(self):
+        """render_batch produces the same output as individual renders"""
+        from app.email_templates import render_batch, get_appointment_reminder_email
+        
+        rows = [
+            {"patient_name": f"Patient {i}", "appointment_date": "March 14, 2026",
+             "appointment_time": "09:00 AM", "provider_name": "D***"}
+            for i in range(3)
+        ]
+        assert render_batch("appointment_reminder", rows) == [get_appointment_reminder_email(**r) for r in rows]
+
+
+class TestBulkAppointmentChanges:
+    """Test 20: Provider-wide cancellations and shifts run as one batch"""
+    
+    def _appointment(self, session, patient, provider, day, hour):
+        start = (datetime.utcnow() + timedelta(days=day)).replace(hour=hour, minute=0, second=0, microsecond=0)
+        appt = Appointment(
+            patient_id=patient.id,
+            provider_id=provider.id,
+            start_time=start,
+            end_time=start + timedelta(hours=1),
+            status="booked",
+        )
+        session.add(appt)
+        session.commit()
+        session.refresh(appt)
+        return appt
+    
+    def _window(self, day):
+        start = (datetime.utcnow() + timedelta(days=day)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return start.isoformat(), (start + timedelta(days=1)).isoformat()
+    
+    def test_bulk_cancel_notifies_every_patient(self, client, session, test_patient, test_provider, provider_headers):
+        """Every booked appointment in the range is cancelled with one notification each"""
+        import asyncio
+        from app.notification_outbox import notification_dispatcher
+        
+        provider = test_provider["provider"]
+        in_range = [self._appointment(session, test_patient, provider, 6, h) for h in (9, 10)]
+        other_day = self._appointment(session, test_patient, provider, 7, 9)
+        start, end = self._window(6)
+        
+        response = client.post(f"/providers/{provider.id}/appointments/bulk", json={
+            "action": "cancel", "start": start, "end": end,
+        }, headers=provider_headers)
+        assert response.status_code == 200
+        result = response.json()
+        assert result["succeeded"] == 2
+        assert [o["appointment_id"] for o in result["outcomes"]] == [a.id for a in in_range]
+        assert {o["status"] for o in result["outcomes"]} == {"cancelled"}
+        
+        for appt in in_range:
+            session.refresh(appt)
+            assert appt.status == "cancelled"
+        session.refresh(other_day)
+        assert other_day.status == "booked"
+        
+        progress = client.get(f"/appointments/bulk/{result['batch_id']}", headers=provider_headers).json()
+        assert (progress["total"], progress["pending"], progress["complete"]) == (2, 2, False)
+        asyncio.run(notification_dispatcher.drain_once(client.async_engine))
+        progress = client.get(f"/appointments/bulk/{result['batch_id']}", headers=provider_headers).json()
+        assert (progress["sent"], progress["complete"]) == (2, True)
+    
+    def test_bulk_reschedule_reports_conflicts(self, client, session, test_patient, test_provider, provider_headers):
+        """Back-to-back appointments shift together; one blocked by a booking outside the range is kept"""
+        provider = test_provider["provider"]
+        nine, ten = (self._appointment(session, test_patient, provider, 8, h) for h in (9, 10))
+        blocker = self._appointment(session, test_patient, provider, 9, 10)
+        start, end = self._window(8)
+        
+        response = client.post(f"/providers/{provider.id}/appointments/bulk", json={
+            "action": "reschedule", "start": start, "end": end, "shift_minutes": 60,
+        }, headers=provider_headers)
+        assert response.status_code == 200
+        outcomes = {o["appointment_id"]: o for o in response.json()["outcomes"]}
+        assert outcomes[nine.id]["status"] == "rescheduled"
+        assert outcomes[ten.id]["status"] == "rescheduled"
+        session.refresh(nine)
+        assert nine.start_time.hour == 10
+        
+        # Shifting a full day runs into the appointment already booked then
+        start, end = self._window(9)
+        response = client.post(f"/providers/{provider.id}/appointments/bulk", json={
+            "action": "reschedule", "start": start, "end": end, "shift_minutes": -24 * 60,
+        }, headers=provider_headers)
+        assert response.json()["outcomes"] == [{
+            "appointment_id": blocker.id, "status": "conflict",
+            "start_time": blocker.start_time.isoformat(), "end_time": blocker.end_time.isoformat(),
+            "detail": "This time slot is already booked for this provider.",
+        }]
+    
+    def test_bulk_reschedule_skips_cancelled_appointment(self, client, session, test_patient, test_provider, provider_headers, monkeypatch):
+        """A row cancelled after the batch read it is reported as a failure, not moved"""
+        from app import appointments
+        from app.models import AppointmentSlotLock
+        from sqlalchemy import update
+        from sqlmodel import select
+        
+        provider = test_provider["provider"]
+        appt = self._appointment(session, test_patient, provider, 11, 9)
+        start, end = self._window(11)
+        
+        # The patient cancels while the batch is between its read and the move
+        async def cancelled_meanwhile(session, provider_id, start, end, exclude_id=None):
+            await session.exec(update(Appointment).where(Appointment.id == exclude_id).values(status="cancelled"))
+            return False
+        monkeypatch.setattr(appointments, "has_overlap", cancelled_meanwhile)
+        
+        response = client.post(f"/providers/{provider.id}/appointments/bulk", json={
+            "action": "reschedule", "start": start, "end": end, "shift_minutes": 60,
+        }, headers=provider_headers)
+        assert response.status_code == 200
+        result = response.json()
+        assert (result["succeeded"], result["failed"]) == (0, 1)
+        assert result["outcomes"][0]["status"] == "not_booked"
+        assert result["outcomes"][0]["start_time"] == appt.start_time.isoformat()
+        assert session.exec(select(AppointmentSlotLock)).all() == []
+    
+    def test_failure_rolls_back_whole_batch(self, client, session, test_patient, test_provider, provider_headers, monkeypatch):
+        """An error on a later item undoes the earlier moves and their outbox rows"""
+        import pytest
+        from sqlmodel import select
+        from app import appointments
+        from app.models import NotificationOutbox
+        
+        provider = test_provider["provider"]
+        booked = [self._appointment(session, test_patient, provider, 10, h) for h in (9, 11, 13)]
+        originals = [a.start_time for a in booked]
+        start, end = self._window(10)
+        
+        staged = []
+        stage_reschedule = appointments.stage_reschedule
+        
+        def failing_stage(*args, **kwargs):
+            if len(staged) == 2:
+                raise RuntimeError("outbox unavailable")
+            staged.append(args[1].id)
+            return stage_reschedule(*args, **kwargs)
+        
+        monkeypatch.setattr(appointments, "stage_reschedule", failing_stage)
+        with pytest.raises(RuntimeError):
+            client.post(f"/providers/{provider.id}/appointments/bulk", json={
+                "action": "reschedule", "start": start, "end": end, "shift_minutes": 30,
+            }, headers=provider_headers)
+        assert len(staged) == 2
+        
+        session.expire_all()
+        assert [session.get(Appointment, a.id).start_time for a in booked] == originals
+        assert session.exec(select(NotificationOutbox)).all() == []
+    
+    def test_patients_cannot_bulk_change(self, client, test_patient, test_provider, patient_headers):
+        """Only staff or the provider may run a bulk change"""
+        start, end = self._window(6)
+        response = client.post(f"/providers/{test_provider['provider'].id}/appointments/bulk", json={
+            "action": "cancel", "start": start, "end": end,
+        }, headers=patient_headers)
+        assert response.status_code == 403
+
+
+class TestCursorPagination:
+    """Test 21: Listings are keyset-paginated with an opaque cursor"""
+    
+    def test_my_appointments_pages_latest_first(self, client, session, test_patient, test_provider, patient_headers):
+        """Pages walk (start_time, id) newest first without gaps or repeats"""
+        provider = test_provider["provider"]
+        start = (datetime.utcnow() + timedelta(days=3)).replace(hour=9, minute=0, second=0, microsecond=0)
+        appts = []
+        # Two appointments share a start time to exercise the id tie-break
+        for offset in (0, 1, 1, 2, 3):
+            appt = Appointment(
+                patient_id=test_patient.id,
+                provider_id=provider.id,
+                start_time=start + timedelta(hours=offset),
+                end_time=start + timedelta(hours=offset, minutes=30),
+                status="cancelled",
+            )
+            session.add(appt)
+            session.commit()
+            session.refresh(appt)
+            appts.append(appt)
+        
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["after"] = cursor
+            page = client.get("/appointments/my", params=params, headers=patient_headers).json()
+            assert len(page["items"]) <= 2
+            seen.extend(item["id"] for item in page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        
+        expected = sorted(appts, key=lambda a: (a.start_time, a.id), reverse=True)
+        assert seen == [a.id for a in expected]
+    
+    def test_transactions_page_and_bad_cursor(self, client, session, test_patient, patient_headers):
+        """The last page has no cursor; a garbled cursor is a 400"""
+        from app.models import Transaction
+        
+        for i in range(3):
+            session.add(Transaction(user_id=test_patient.id, amount=float(i), created_at=datetime(2025, 1, 1 + i)))
+        session.commit()
+        
+        first = client.get("/transactions/my?limit=2", headers=patient_headers).json()
+        assert [t["amount"] for t in first["items"]] == [2.0, 1.0]
+        second = client.get(f"/transactions/my?limit=2&after={first['next_cursor']}", headers=patient_headers).json()
+        assert [t["amount"] for t in second["items"]] == [0.0]
+        assert second["next_cursor"] is None
+        
+        response = client.get("/transactions/my?after=not-a-cursor", headers=patient_headers)
+        assert response.status_code == 400
+
+
+class TestResponseCache:
+    """Test 22: Read-mostly endpoints are cached with ETag revalidation"""
+    
+    def test_provider_list_cached_until_provider_created(self, client, test_provider, patient_headers):
+        """Repeat reads hit the cache and 304 on a matching ETag; create_provider invalidates"""
+        from app.response_cache import response_cache
+        
+        first = client.get("/providers", headers=patient_headers)
+        assert first.status_code == 200
+        assert first.headers["cache-control"] == "private, max-age=30"
+        etag = first.headers["etag"]
+        
+        second = client.get("/providers", headers=patient_headers)
+        assert second.json() == first.json()
+        assert (response_cache.hits, response_cache.misses) == (1, 1)
+        
+        revalidated = client.get("/providers", headers={**patient_headers, "If-None-Match": etag})
+        assert revalidated.status_code == 304
+        assert revalidated.content == b""
+        
+        client.post("/providers", json={"name": "Dr. New Provider"}, headers=patient_headers)
+        fresh = client.get("/providers", headers={**patient_headers, "If-None-Match": etag})
+        assert fresh.status_code == 200
+        assert fresh.headers["etag"] != etag
+        assert [p["name"] for p in fresh.json()["items"]] == ["Dr. Test Provider", "Dr. New Provider"]
+        
+        stats = client.get("/health/cache").json()
+        assert stats["not_modified"] == 1
+        assert stats["invalidations"] == 1
+    
+    def test_shared_directory_backend(self, tmp_path):
+        """Entries and invalidations written by one worker are seen by another"""
+        from app.response_cache import DirectoryBackend, ResponseCache
+        
+        worker_a = ResponseCache(backend=DirectoryBackend(str(tmp_path)))
+        worker_b = ResponseCache(backend=DirectoryBackend(str(tmp_path)))
+        
+        entry = worker_a.put("providers", "list", b'{"items":[]}')
+        assert worker_b.get("providers", "list") == entry
+        
+        worker_a.invalidate("providers")
+        assert worker_b.get("providers", "list") is None
+    
+    def test_directory_backend_sweeps_dead_entries(self, tmp_path, monkeypatch):
+        """Expired entries are deleted on read; a sweep drops old generations and caps the count"""
+        import os
+        import time
+        from app.response_cache import DirectoryBackend, ResponseCache
+        
+        backend = DirectoryBackend(str(tmp_path), max_entries=2, sweep_interval=3600)
+        cache = ResponseCache(backend=backend)
+        
+        cache.put("providers", "short", b"[]", ttl_seconds=1)
+        monkeypatch.setattr(time, "time", lambda real=time.time: real() + 5)
+        assert backend.get(cache._key("providers", "short")) is None
+        assert [n for n in os.listdir(tmp_path) if n.startswith("e-")] == []
+        monkeypatch.undo()
+        
+        cache.put("providers", "old", b"[]")
+        before = backend.bump("providers")
+        assert backend.bump("providers") > before
+        cache.put("providers", "new", b"[]")
+        assert backend.sweep() == 1
+        assert cache.get("providers", "new") is not None
+        
+        # The second write past max_entries triggers a sweep that trims to the cap
+        for key in ("a", "b"):
+            cache.put("providers", key, b"[]")
+        assert len([n for n in os.listdir(tmp_path) if n.startswith("e-")]) == 2
+
+
+class TestStaticFrontend:
+    """Test 23: Pages and assets are served precompressed with cache validators"""
+    
+    def test_pages_reference_immutable_hashed_assets(self, client):
+        """HTML links hashed CSS/JS that are cached as immutable"""
+        import re
+        
+        page = client.get("/book-appointment.html")
+        assert page.status_code == 200
+        assert page.headers["cache-control"] == "no-cache"
+        css = re.search(r'href="(/assets/css/styles\.[0-9a-f]{10}\.css)"', page.text).group(1)
+        js = re.search(r"from '(/assets/js/api\.[0-9a-f]{10}\.js)'", page.text).group(1)
+        
+        for url in (css, js):
+            asset = client.get(url)
+            assert asset.status_code == 200
+            assert asset.headers["cache-control"] == "public, max-age=31536000, immutable"
+        assert client.get("/assets/js/api.0000000000.js").status_code == 404
+    
+    def test_gzip_variant_and_etag_revalidation(self, client):
+        """gzip is chosen when accepted, and a matching ETag returns 304"""
+        plain = client.get("/", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in plain.headers
+        
+        zipped = client.get("/", headers={"Accept-Encoding": "gzip"})
+        assert zipped.headers["content-encoding"] == "gzip"
+        assert zipped.headers["vary"] == "Accept-Encoding"
+        assert zipped.text == plain.text
+        
+        cached = client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": zipped.headers["etag"]})
+        assert cached.status_code == 304
+        
+        # Unhashed URLs still work for anything linking them directly
+        assert client.get("/css/styles.css").status_code == 200
+    
+    def test_build_writes_assets_where_pages_point(self, tmp_path):
+        """Every /assets/ URL in the built pages exists under the output directory"""
+        import re
+        from pathlib import Path
+        from app.static_assets import StaticSite
+        
+        site = StaticSite(Path(__file__).parent.parent.parent / "frontend")
+        site.build(tmp_path)
+        
+        html = (tmp_path / "index.html").read_text()
+        urls = re.findall(r"""["'](/assets/[^"']+)["']""", html)
+        assert urls
+        for url in urls:
+            assert (tmp_path / url.lstrip("/")).is_file()
+
+
+class TestChatbotStreaming:
+    """Test 24: Chatbot streams over SSE through the async gateway limiter"""
+    
+    @staticmethod
+    def fake_groq(deltas):
+        from types import SimpleNamespace
+        
+        class FakeStream:
+            def __init__(self):
+                self.closed = False
+            
+            async def __aiter__(self):
+                for delta in deltas:
+                    yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))])
+            
+            async def close(self):
+                self.closed = True
+        
+        async def create(**kwargs):
+            assert kwargs["stream"] is True
+            return FakeStream()
+        
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    
+    def test_stream_and_plain_chat(self, client, patient_headers, monkeypatch):
+        """Deltas arrive as SSE events, /chat still returns the joined text"""
+        import json
+        from app.chat_gateway import ChatLimiter, ChatMetrics, chat_gateway
+        
+        monkeypatch.setattr(chat_gateway, "client", self.fake_groq(["Drink ", None, "water", "."]))
+        monkeypatch.setattr(chat_gateway, "limiter", ChatLimiter(max_concurrent=2, max_queue=2))
+        monkeypatch.setattr(chat_gateway, "metrics", ChatMetrics())
+        
+        response = client.post("/chatbot/chat/stream", json={"message": "Tips for a cold?"}, headers=patient_headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [block for block in response.text.split("\n\n") if block]
+        deltas = [json.loads(block[len("data: "):])["delta"] for block in events[:-1]]
+        assert deltas == ["Drink ", "water", "."]
+        assert events[-1].startswith("event: done\n")
+        
+        plain = client.post("/chatbot/chat", json={"message": "Tips for a sore throat?"}, headers=patient_headers)
+        assert plain.status_code == 200
+        assert plain.json()["response"] == "Drink water."
+        
+        stats = client.get("/health/chatbot").json()
+        assert stats["completed_total"] == 2
+        assert stats["active"] == 0
+        assert stats["ttft_seconds_p50"] is not None
+    
+    def test_unconsumed_stream_frees_its_slot(self, monkeypatch):
+        """A stream dropped before its first chunk is sent still releases the slot"""
+        import asyncio
+        from types import SimpleNamespace
+        import pytest
+        from app import chatbot
+        from app.chat_gateway import ChatLimiter, ChatMetrics, chat_gateway
+        
+        limiter = ChatLimiter(max_concurrent=1, max_queue=0)
+        monkeypatch.setattr(chat_gateway, "client", self.fake_groq(["Rest."]))
+        monkeypatch.setattr(chat_gateway, "limiter", limiter)
+        monkeypatch.setattr(chat_gateway, "metrics", ChatMetrics())
+        
+        async def scenario():
+            stream = await chat_gateway.open_stream([{"role": "user", "content": "Hi"}])
+            assert limiter.active == 1
+            await stream.aclose()
+            await stream.aclose()
+            assert limiter.active == 0
+            
+            response = await chatbot.chat_stream(chatbot.ChatMessage(message="Tips for sleep?"), SimpleNamespace(id=1))
+            assert limiter.active == 1
+            
+            async def receive():
+                return {"type": "http.disconnect"}
+            
+            async def send(message):
+                raise OSError("client went away")
+            
+            with pytest.raises(Exception):
+                await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+            assert limiter.active == 0
+        
+        asyncio.run(scenario())
+    
+    def test_full_queue_is_rejected(self, client, patient_headers, monkeypatch):
+        """With every slot taken and no queue room, callers get 429 at once"""
+        import asyncio
+        from app.chat_gateway import ChatLimiter, ChatMetrics, chat_gateway
+        
+        limiter = ChatLimiter(max_concurrent=1, max_queue=0)
+        asyncio.run(limiter.acquire())
+        monkeypatch.setattr(chat_gateway, "client", self.fake_groq(["unused"]))
+        monkeypatch.setattr(chat_gateway, "limiter", limiter)
+        monkeypatch.setattr(chat_gateway, "metrics", ChatMetrics())
+        
+        response = client.post("/chatbot/chat/stream", json={"message": "Hello"}, headers=patient_headers)
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "5"
+        assert client.get("/health/chatbot").json()["rejected_total"] == 1
+
+
+class TestChatbotFaqCache:
+    """Test 25: Repeated general questions are answered from the FAQ cache"""
+    
+    def test_repeat_skips_groq(self, client, patient_headers, monkeypatch):
+        """Only the first wording reaches Groq; personal questions always do"""
+        from types import SimpleNamespace
+        from app.chat_gateway import ChatLimiter, chat_gateway
+        
+        calls = []
+        
+        async def create(**kwargs):
+            calls.append(kwargs["messages"][-1]["content"])
+            
+            async def stream():
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="Use the Appointments page."))])
+            return stream()
+        
+        monkeypatch.setattr(chat_gateway, "client", SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+        monkeypatch.setattr(chat_gateway, "limiter", ChatLimiter())
+        
+        for question in ("How do I reschedule an appointment?", "how do i reschedule the appointment", "HOW DO I RESCHEDULE AN APPOINTMENT"):
+            response = client.post("/chatbot/chat", json={"message": question}, headers=patient_headers)
+            assert response.json()["response"] == "Use the Appointments page."
+        assert len(calls) == 1
+        
+        streamed = client.post("/chatbot/chat/stream", json={"message": "How do I reschedule an appointment"}, headers=patient_headers)
+        assert '"delta": "Use the Appointments page."' in streamed.text
+        assert len(calls) == 1
+        
+        # Near-duplicate wording is not matched by default
+        client.post("/chatbot/chat", json={"message": "how do i reschedule appointments"}, headers=patient_headers)
+        assert len(calls) == 2
+        
+        for question in ("How do I reschedule my appointment on 12/03?", "Can you reschedule me?"):
+            client.post("/chatbot/chat", json={"message": question}, headers=patient_headers)
+        assert len(calls) == 4
+        
+        stats = client.get("/health/chatbot").json()["cache"]
+        assert stats["exact_hits"] == 3
+        assert stats["similar_hits"] == 0
+        assert stats["bypassed"] == 2
+        assert "top_questions" not in stats
+    
+    def test_near_match_respects_negation_and_qualifiers(self):
+        """With fuzzy matching on, a differing negation, number or qualifier is never a match"""
+        from app.chat_cache import ChatResponseCache
+        
+        cache = ChatResponseCache(similarity=0.8)
+        cache.put("Should you take aspirin during a heart attack?", "yes")
+        cache.put("Can you take ibuprofen while pregnant?", "avoid")
+        
+        assert cache.get("Should you take aspirin during heart attacks?") == "yes"
+        assert cache.get("Should you not take aspirin during a heart attack?") is None
+        assert cache.get("Shouldn't you take aspirin during a heart attack?") is None
+        assert cache.get("Can you take ibuprofen while not pregnant?") is None
+        assert cache.get("Can you take ibuprofen dose while pregnant?") is None
+        assert cache.stats()["similar_hits"] == 1
+    
+    def test_ttl_and_size_bound(self, monkeypatch):
+        """Entries expire after the TTL and the least recently used is evicted"""
+        from app import chat_cache
+        
+        cache = chat_cache.ChatResponseCache(max_size=2, ttl_seconds=60)
+        cache.put("What is the flu?", "flu")
+        cache.put("What is a cold?", "cold")
+        assert cache.get("what is the flu") == "flu"
+        cache.put("What is asthma?", "asthma")
+        assert cache.get("What is a cold?") is None
+        assert cache.get("What is the flu?") == "flu"
+        
+        now = chat_cache.time.time()
+        monkeypatch.setattr(chat_cache.time, "time", lambda: now + 61)
+        assert cache.get("What is the flu?") is None
+        assert cache.stats()["entries"] == 1
+
+
+class TestPaymentIntents:
+    """Test 26: Payment intents are created once per checkout via the async client"""
+    
+    def test_retry_reuses_pending_intent(self, client, patient_headers, test_provider, monkeypatch):
+        """Same patient, provider and start time get the same intent back"""
+        import httpx
+        import stripe_stub
+        from app import payments
+        from app.stripe_client import StripeClient
+        
+        stub_stats = {"created": 0, "replayed": 0}
+        monkeypatch.setattr(stripe_stub, "_stats", stub_stats)
+        monkeypatch.setattr(stripe_stub, "_intents_by_key", {})
+        stripe = StripeClient("sk_test", "http://stripe.test", transport=httpx.ASGITransport(app=stripe_stub.app))
+        monkeypatch.setattr(payments, "stripe_client", stripe)
+        
+        checkout = {
+            "provider_id": test_provider["provider"].id,
+            "start_time": "2030-01-07T09:00:00",
+            "end_time": "2030-01-07T09:30:00",
+        }
+        first = client.post("/payments/create-payment-intent", json=checkout, headers=patient_headers)
+        assert first.status_code == 200
+        retry = client.post("/payments/create-payment-intent", json=checkout, headers=patient_headers)
+        assert retry.json() == first.json()
+        assert stub_stats["created"] == 1
+        assert stripe.requests == 1
+        
+        other_slot = client.post(
+            "/payments/create-payment-intent",
+            json={**checkout, "start_time": "2030-01-07T10:00:00"},
+            headers=patient_headers,
+        )
+        assert other_slot.json()["client_secret"] != first.json()["client_secret"]
+        assert stub_stats["created"] == 2
+    
+    def test_booking_retires_pending_intent(self, client, session, patient_headers, test_provider, monkeypatch):
+        """Once the slot is booked, or the fee changes, checkout gets a fresh intent"""
+        import httpx
+        import stripe_stub
+        from sqlmodel import select
+        from app import payments
+        from app.models import PendingPaymentIntent
+        from app.stripe_client import StripeClient
+        
+        stub_stats = {"created": 0, "replayed": 0}
+        intents = {}
+        monkeypatch.setattr(stripe_stub, "_stats", stub_stats)
+        monkeypatch.setattr(stripe_stub, "_intents_by_key", intents)
+        stripe = StripeClient("sk_test", "http://stripe.test", transport=httpx.ASGITransport(app=stripe_stub.app))
+        monkeypatch.setattr(payments, "stripe_client", stripe)
+        
+        provider = test_provider["provider"]
+        checkout = {"provider_id": provider.id, "start_time": "2030-01-08T09:00:00", "end_time": "2030-01-08T09:30:00"}
+        paid = client.post("/payments/create-payment-intent", json=checkout, headers=patient_headers).json()
+        for intent in intents.values():
+            intent["status"] = "succeeded"
+        
+        booked = client.post("/appointments/book", json=checkout, headers=patient_headers)
+        assert booked.status_code == 200
+        assert session.exec(select(PendingPaymentIntent)).all() == []
+        client.delete(f"/appointments/{booked.json()['id']}", headers=patient_headers)
+        
+        # Stripe replays the paid intent for the old key; a follow-up key is used
+        again = client.post("/payments/create-payment-intent", json=checkout, headers=patient_headers).json()
+        assert again["client_secret"] != paid["client_secret"]
+        assert (stub_stats["created"], stub_stats["replayed"]) == (2, 1)
+        
+        provider.consultation_fee += 25
+        session.add(provider)
+        session.commit()
+        repriced = client.post("/payments/create-payment-intent", json=checkout, headers=patient_headers).json()
+        assert repriced["amount"] == again["amount"] + 25
+        assert repriced["client_secret"] != again["client_secret"]
+        assert stub_stats["created"] == 3
+    
+    def test_stripe_error_is_reported(self, client, patient_headers, test_provider, monkeypatch):
+        """Stripe's error message comes back as a 400 and nothing is recorded"""
+        import httpx
+        from app import payments
+        from app.stripe_client import StripeClient
+        
+        def reject(request):
+            return httpx.Response(402, json={"error": {"message": "Your card was declined."}})
+        
+        stripe = StripeClient("sk_test", "http://stripe.test", transport=httpx.MockTransport(reject))
+        monkeypatch.setattr(payments, "stripe_client", stripe)
+        
+        checkout = {"provider_id": test_provider["provider"].id, "start_time": "2030-01-07T09:00:00", "end_time": "2030-01-07T09:30:00"}
+        for _ in range(2):
+            response = client.post("/payments/create-payment-intent", json=checkout, headers=patient_headers)
+            assert response.status_code == 400
+            assert response.json()["detail"] == "Your card was declined."
+        assert stripe.requests == 2
+        assert stripe.errors == 2
+
+
+class TestTransactionSummary:
+    """Test 27: Ledger summaries come from rollups kept current on every write"""
+    
+    def test_rollups_track_inserts_updates_and_deletes(self, client, session, test_patient, patient_headers):
+        """Summary matches the ledger after inserts, a status change and a delete"""
+        from datetime import datetime
+        from app.auth import create_access_token, get_password_hash
+        from app.models import Transaction, User
+        
+        staff = User(email="staff@example.com", password_hash=get_password_hash("StaffPass123!"), role="staff")
+        session.add(staff)
+        session.commit()
+        
+        ledger = [
+            Transaction(user_id=test_patient.id, amount=50.0, created_at=datetime(2030, 1, 6, 9)),
+            Transaction(user_id=test_patient.id, amount=75.0, created_at=datetime(2030, 1, 7, 9)),
+            Transaction(user_id=test_patient.id, amount=75.0, transaction_type="refund", status="pending",
+                        created_at=datetime(2030, 1, 7, 10)),
+            Transaction(user_id=staff.id, amount=20.0, created_at=datetime(2030, 1, 7, 11)),
+        ]
+        session.add_all(ledger)
+        session.commit()
+        ledger[2].status = "completed"
+        session.add(ledger[2])
+        session.delete(ledger[0])
+        session.commit()
+        
+        mine = client.get("/transactions/summary", headers=patient_headers).json()
+        assert mine == {
+            "count": 2,
+            "amount": 150.0,
+            "by_status": {"completed": {"count": 2, "amount": 150.0}},
+            "by_type": {"booking": {"count": 1, "amount": 75.0}, "refund": {"count": 1, "amount": 75.0}},
+        }
+        
+        assert client.get("/transactions/summary?scope=all", headers=patient_headers).status_code == 403
+        staff_headers = {"Authorization": f"Bearer {create_access_token({'sub': str(staff.id), 'role': 'staff'})}"}
+        everyone = client.get(
+            "/transactions/summary?scope=all&start=2030-01-01&end=2030-01-31", headers=staff_headers
+        ).json()
+        assert everyone["count"] == 3
+        assert everyone["amount"] == 170.0
+        assert everyone["by_day"] == [{"day": "2030-01-07", "count": 3, "amount": 170.0}]
+
+
+class TestBookingQueryBudget:
+    """Test 28: Booking writes stay within a fixed number of queries and one commit"""
+    
+    def test_book_reschedule_cancel_budgets(self, client, session, patient_headers, test_provider, query_counter):
+        """Each write path uses one joined prefetch and a single commit"""
+        # Warm the principal cache so the budgets cover the endpoint alone
+        client.get("/appointments/my", headers=patient_headers)
+        slot = {
+            "provider_id": test_provider["provider"].id,
+            "start_time": "2030-01-07T09:00:00",
+            "end_time": "2030-01-07T09:30:00",
+        }
+        
+        query_counter.reset()
+        booked = client.post("/appointments/book", json=slot, headers=patient_headers)
+        assert booked.status_code == 200
+        # prefetch, overlap probe, appointment, slot locks, outbox, ledger entry + 2 rollups
+        assert len(query_counter.statements) <= 8
+        assert query_counter.commits == 1
+        appointment_id = booked.json()["id"]
+        
+        query_counter.reset()
+        moved = client.put(
+            f"/appointments/{appointment_id}/reschedule",
+            json={"start_time": "2030-01-07T10:00:00", "end_time": "2030-01-07T10:30:00"},
+            headers=patient_headers,
+        )
+        assert moved.status_code == 200
+        assert len(query_counter.statements) <= 6
+        assert query_counter.commits == 1
+        
+        query_counter.reset()
+        assert client.delete(f"/appointments/{appointment_id}", headers=patient_headers).status_code == 200
+        assert len(query_counter.statements) <= 4
+        assert query_counter.commits == 1
+    
+    def test_ledger_entry_commits_with_booking(self, client, session, patient_headers, test_provider, monkeypatch):
+        """A booking rolled back by the database leaves no ledger entry behind"""
+        from sqlmodel import select
+        from app import appointments
+        from app.models import Transaction
+        
+        # Skip the fast-path probe so the second booking fails at commit
+        async def no_overlap(*args, **kwargs):
+            return False
+        monkeypatch.setattr(appointments, "has_overlap", no_overlap)
+        
+        slot = {
+            "provider_id": test_provider["provider"].id,
+            "start_time": "2030-01-07T09:00:00",
+            "end_time": "2030-01-07T09:30:00",
+        }
+        assert client.post("/appointments/book", json=slot, headers=patient_headers).status_code == 200
+        assert client.post("/appointments/book", json=slot, headers=patient_headers).status_code == 409
+        
+        ledger = session.exec(select(Transaction)).all()
+        assert len(ledger) == 1
+        assert ledger[0].appointment_id is not None
+        assert ledger[0].amount == test_provider["provider"].consultation_fee
+
+
+class TestRequestInstrumentation:
+    """Test 29: Per-route SQL, DB time and external-call metrics are exported"""
+    
+    def test_metrics_endpoint_reports_route_histograms(self, client, patient_headers, test_provider, monkeypatch):
+        """Booking shows up by route template with its statement count; Stripe time is attributed"""
+        import httpx
+        import stripe_stub
+        from app import payments
+        from app.stripe_client import StripeClient
+        
+        client.get("/appointments/my", headers=patient_headers)
+        slot = {
+            "provider_id": test_provider["provider"].id,
+            "start_time": "2030-01-07T09:00:00",
+            "end_time": "2030-01-07T09:30:00",
+        }
+        appointment_id = client.post("/appointments/book", json=slot, headers=patient_headers).json()["id"]
+        client.delete(f"/appointments/{appointment_id}", headers=patient_headers)
+        
+        monkeypatch.setattr(stripe_stub, "_intents_by_key", {})
+        stripe = StripeClient("sk_test", "http://stripe.test", transport=httpx.ASGITransport(app=stripe_stub.app))
+        monkeypatch.setattr(payments, "stripe_client", stripe)
+        client.post("/payments/create-payment-intent", json=slot, headers=patient_headers)
+        
+        response = client.get("/metrics")
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        lines = response.text.splitlines()
+        
+        def sample(line_prefix):
+            return float(next(line for line in lines if line.startswith(line_prefix)).rsplit(" ", 1)[1])
+        
+        book = 'method="POST",route="/appointments/book"'
+        assert sample(f"easyapt_http_request_sql_statements_sum{{{book}}}") == 8
+        assert sample(f"easyapt_http_request_db_seconds_sum{{{book}}}") > 0
+        assert sample(f'easyapt_http_request_duration_seconds_count{{{book},status="200"}}') == 1
+        # Path parameters are folded into the route template
+        assert 'route="/appointments/{appointment_id}"' in response.text
+        assert sample('easyapt_external_call_seconds_count{service="stripe"}') == 1
+        assert sample('easyapt_http_request_external_seconds_sum{method="POST",route="/payments/create-payment-intent"}') > 0
+    
+    def test_slow_request_log_includes_sql(self, client, patient_headers, monkeypatch, caplog):
+        """Requests over the threshold are logged with their SQL, never parameters"""
+        import logging
+        from app.config import settings
+        
+        monkeypatch.setattr(settings, "SLOW_REQUEST_SECONDS", 0.0)
+        with caplog.at_level(logging.WARNING, logger="app.slow_requests"):
+            client.get("/appointments/my", headers=patient_headers)
+        
+        [record] = [r for r in caplog.records if r.name == "app.slow_requests"]
+        message = record.getMessage()
+        assert "GET /appointments/my" in message
+        assert "FROM appointment" in message
+        assert "testpatient@example.com" not in message
+        assert "easyapt_slow_requests_total 1" in client.get("/metrics").text
+
+
+class TestStructuredLogging:
+    """Test 30: Logs are queued, written as JSON lines and stripped of PHI"""
+    
+    def test_json_lines_with_redaction_and_module_levels(self, client, patient_headers, monkeypatch, capsys):
+        """Profile updates log field names only; per-module levels apply"""
+        import json
+        import logging
+        from app.config import settings
+        from app.logging_config import configure_logging, shutdown_logging
+        
+        monkeypatch.setattr(settings, "LOG_LEVELS", "app.profile=DEBUG,app.noisy=ERROR")
+        configure_logging()
+        try:
+            response = client.put("/profile/me", json={
+                "full_name": "Jane Doe",
+                "date_of_birth": "1990-04-01",
+                "phone": "+15551234567",
+                "allergies": "Penicillin",
+            }, headers=patient_headers)
+            assert response.status_code == 200
+            logging.getLogger("app.noisy").warning("suppressed")
+            logging.getLogger("app.contact").info(
+                "Reminder sent to jane.doe@example.com at (555) 123-4567",
+                extra={"phone": "+15551234567", "appointment_id": 7},
+            )
+        finally:
+            shutdown_logging()
+            logging.getLogger("app.profile").setLevel(logging.NOTSET)
+            logging.getLogger("app.noisy").setLevel(logging.NOTSET)
+        
+        output = capsys.readouterr().out
+        entries = [json.loads(line) for line in output.splitlines() if line.startswith("{")]
+        profile = next(e for e in entries if e["logger"] == "app.profile")
+        assert profile["level"] == "DEBUG"
+        assert profile["fields"] == ["allergies", "date_of_birth", "full_name", "phone"]
+        
+        contact = next(e for e in entries if e["logger"] == "app.contact")
+        assert contact["message"] == "Reminder sent to j***@example.com at [REDACTED]"
+        assert contact["phone"] == "[REDACTED]"
+        assert contact["appointment_id"] == 7
+        
+        assert not any(e["logger"] == "app.noisy" for e in entries)
+        for secret in ("Jane Doe", "Penicillin", "5551234567", "jane.doe@"):
+            assert secret not in output
+    
+    def test_exception_text_is_redacted(self, capsys):
+        """Tracebacks are logged as their own field with PHI masked"""
+        import json
+        import logging
+        from app.logging_config import configure_logging, shutdown_logging
+        
+        configure_logging()
+        try:
+            try:
+                raise RuntimeError("SMTP rejected jane.doe@example.com +15551234567")
+            except RuntimeError:
+                logging.getLogger("app.smtp_mailer").exception("send failed for bob@example.com")
+        finally:
+            shutdown_logging()
+        
+        output = capsys.readouterr().out
+        entry = next(json.loads(line) for line in output.splitlines() if '"app.smtp_mailer"' in line)
+        assert entry["message"] == "send failed for b***@example.com"
+        assert "RuntimeError: SMTP rejected j***@example.com [REDACTED]" in entry["exc_info"]
+        for secret in ("jane.doe@", "bob@", "5551234567"):
+            assert secret not in output
@@ -216,12 +216,26 @@ export const profile = {
   },
 };
 
+/**
+ * Listings are paginated: each call returns { items, next_cursor } and the
+ * next page is requested with after=next_cursor.
+ */
+const PAGE_SIZE = 50;
+
+function pageParams(after) {
+  const params = new URLSearchParams({ limit: PAGE_SIZE });
+  if (after) {
+    params.set('after', after);
+  }
+  return params.toString();
+}
+
 /**
  * Appointments API calls
  */
 export const appointments = {
-  async getMyAppointments() {
-    return apiRequest('/appointments/my');
+  async getMyAppointments(after = null) {
+    return apiRequest(`/appointments/my?${pageParams(after)}`);
   },
 
   async book(providerId, startTime, endTime, reason) {
@@ -257,16 +271,22 @@ export const appointments = {
  * Providers API calls
  */
 export const providers = {
-  async search(query) {
-    return apiRequest(`/providers/search?q=${encodeURIComponent(query)}`);
+  async search(query, limit = 20) {
+    const params = new URLSearchParams({ q: query, limit });
+    return apiRequest(`/providers/search?${params.toString()}`);
+  },
+
+  async getAppointments(providerId, after = null) {
+    return apiRequest(`/providers/${providerId}/appointments?${pageParams(after)}`);
   },
 
-  async getAppointments(providerId) {
-    return apiRequest(`/providers/${providerId}/appointments`);
+  async getAvailability(providerId, from, to, duration = 30) {
+    const params = new URLSearchParams({ from, to, duration });
+    return apiRequest(`/providers/${providerId}/availability?${params.toString()}`);
   },
 
-  async getDashboard() {
-    return apiRequest('/provider-dashboard-list');
+  async getDashboard(after = null) {
+    return apiRequest(`/provider-dashboard-list?${pageParams(after)}`);
   },
 };
 